@@ -0,0 +1,188 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+import metrics
+
+
+# === Endpoint Classes ===
+# Expensive routes share a fixed number of slots. Each class has its own cap
+# and a bounded queue; when a slot frees up the highest-priority class with
+# room goes first (lower number = higher priority). Routes not listed here
+# (notes, job details, schedule, admin) are never queued.
+endpoint_classes = {
+    "interactive": {"priority": 0, "max_concurrent": 16, "max_queue": 64, "queue_timeout_sec": 2.0},
+    "document": {"priority": 1, "max_concurrent": 4, "max_queue": 16, "queue_timeout_sec": 10.0},
+    "bulk": {"priority": 2, "max_concurrent": 1, "max_queue": 2, "queue_timeout_sec": 30.0},
+}
+TOTAL_SLOTS = 20  # under AnyIO's 40 worker threads so unmanaged calls always find one
+MAX_RETRY_AFTER_SEC = 60
+
+route_classes = (
+    ("/new_bid/cost_estimation", "interactive"),
+    ("/new_bid/material_costs", "interactive"),
+    ("/new_bid/fence_details", "interactive"),
+    ("/new_bid/price_solver", "interactive"),
+    ("/new_bid/labor_plan", "interactive"),
+    ("/instant_quote", "interactive"),
+    ("/generate_", "document"),
+    ("/bulk/", "bulk"),
+)
+
+
+def classify(path):
+    for prefix, endpoint_class in route_classes:
+        if path.startswith(prefix):
+            return endpoint_class
+    return None
+
+
+class Rejected(Exception):
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# === Scheduler ===
+# Only touched from the event loop, so plain counters need no locking.
+class AdmissionController:
+    def __init__(self, classes=endpoint_classes, total_slots=TOTAL_SLOTS):
+        self.classes = classes
+        self.total_slots = total_slots
+        self.running_total = 0
+        self.running = {name: 0 for name in classes}
+        self.waiting = {name: deque() for name in classes}
+        self.stats = {
+            name: {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_deadline": 0,
+                   "avg_wait_ms": 0.0, "avg_service_ms": 0.0}
+            for name in classes
+        }
+        self._by_priority = sorted(classes, key=lambda name: classes[name]["priority"])
+
+    def _has_room(self, name):
+        return self.running_total < self.total_slots and self.running[name] < self.classes[name]["max_concurrent"]
+
+    def _start(self, name):
+        self.running_total += 1
+        self.running[name] += 1
+        self.stats[name]["admitted"] += 1
+
+    def _dispatch(self):
+        for name in self._by_priority:
+            queue = self.waiting[name]
+            while queue and self._has_room(name):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self._start(name)
+                    waiter.set_result(None)
+            if self.running_total >= self.total_slots:
+                return
+
+    def retry_after(self, name):
+        # Rough time for the backlog ahead of a new request to drain
+        config, stats = self.classes[name], self.stats[name]
+        service_sec = (stats["avg_service_ms"] or 1000.0) / 1000.0
+        backlog = len(self.waiting[name]) + self.running[name]
+        estimate = service_sec * backlog / config["max_concurrent"]
+        return max(1, min(MAX_RETRY_AFTER_SEC, math.ceil(estimate)))
+
+    async def acquire(self, name):
+        config, stats = self.classes[name], self.stats[name]
+        # Nothing of higher priority may be waiting, or it would be overtaken
+        if self._has_room(name) and not any(
+            self.waiting[other] for other in self._by_priority
+            if self.classes[other]["priority"] <= config["priority"]
+        ):
+            self._start(name)
+            return 0.0
+
+        if len(self.waiting[name]) >= config["max_queue"]:
+            stats["rejected_queue_full"] += 1
+            raise Rejected(429, "Too many queued requests", self.retry_after(name))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiting[name].append(waiter)
+        stats["queued"] += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, config["queue_timeout_sec"])
+        except asyncio.TimeoutError:
+            if waiter in self.waiting[name]:
+                self.waiting[name].remove(waiter)
+            stats["rejected_deadline"] += 1
+            raise Rejected(503, "Queue deadline exceeded", self.retry_after(name))
+        except asyncio.CancelledError:
+            # Client went away while queued; hand the slot on if it was granted
+            if waiter in self.waiting[name]:
+                self.waiting[name].remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.release(name, 0.0)
+            raise
+        wait_ms = (time.perf_counter() - started) * 1000
+        stats["avg_wait_ms"] += 0.1 * (wait_ms - stats["avg_wait_ms"])
+        return wait_ms
+
+    def release(self, name, service_ms):
+        self.running_total -= 1
+        self.running[name] -= 1
+        stats = self.stats[name]
+        stats["avg_service_ms"] += 0.1 * (service_ms - stats["avg_service_ms"])
+        self._dispatch()
+
+    def report(self):
+        return {
+            "total_slots": self.total_slots,
+            "running": self.running_total,
+            "classes": {
+                name: {
+                    **self.classes[name],
+                    "running": self.running[name],
+                    "waiting": len(self.waiting[name]),
+                    **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.stats[name].items()},
+                }
+                for name in self._by_priority
+            },
+        }
+
+
+controller = AdmissionController()
+
+
+# === ASGI Middleware ===
+class AdmissionMiddleware:
+    def __init__(self, app, controller=controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = classify(scope["path"]) if scope["type"] == "http" else None
+        if name is None or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            wait_ms = await self.controller.acquire(name)
+            metrics.observe_stage("queue", wait_ms / 1000)
+        except Rejected as e:
+            body = json.dumps({"detail": e.reason, "endpoint_class": name}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": e.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(e.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name, (time.perf_counter() - started) * 1000)
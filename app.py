@@ -1,23 +1,35 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import Paragraph, Frame
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.enums import TA_LEFT
-from reportlab.lib import colors
-from io import BytesIO
-from pypdf import PdfReader, PdfWriter
+from fastapi.responses import FileResponse, Response, PlainTextResponse
+from fastapi.routing import APIRoute
+import logging
 from typing import Union
-import os
+from contextlib import asynccontextmanager
+import threading
 from fastapi import Body
 from models import ChainLinkDetails, VinylDetails, WoodDetails, SPWroughtIronDetails
 
 import util
+import takeoff
+import price_curves
+import pricing_solver
+import labor_planner
+import risk
+import scheduler
+import capacity
+import calibration
+import bulk_import
+import repricing
+import speculation
+import coalescing
+import admission
+import estimate_cache
+import structured_logging
+import metrics
+import profiling
+import tracing
+import capture
+import memory
 from models import (
     ChainLinkDetails,
     VinylDetails,
@@ -29,10 +41,53 @@ from models import (
     ProposalRequest,
     JobIDRequest,
     InternalSummaryRequest,
+    CatalogPriceUpdate,
+    TakeoffDefinition,
+    RepriceRequest,
+    LogLevelUpdate,
+    PriceSolverRequest,
+    LaborPlanRequest,
+    JobActuals,
+    ScheduleAcceptRequest,
+    ScheduleConfig,
 )
 
-app = FastAPI()
 
+memory.configure()
+structured_logging.configure()
+tracing.configure_file_export()
+capture.configure()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm the instant-quote price curves without holding up the first request
+    # (already built when the gunicorn master preloaded them)
+    if not price_curves.curves_ready():
+        threading.Thread(target=price_curves.rebuild_price_curves, daemon=True).start()
+    # Likewise load the PDF stack once the server is taking requests
+    threading.Thread(target=load_documents, daemon=True).start()
+    yield
+
+
+class InstrumentedRoute(APIRoute):
+    # Handler start/end marks for Server-Timing, and opt-in profiling
+    # (X-Profile + X-Admin-Token) of a single request
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, metrics.timed(profiling.profiled(endpoint)), **kwargs)
+
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = InstrumentedRoute
+
+app.add_middleware(profiling.ProfilingMiddleware)
+# Added before CORS so CORS stays outermost and 429/503 replies keep its headers
+app.add_middleware(admission.AdmissionMiddleware)
+# Outside admission so 429/503 rejections are counted too
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(capture.CaptureMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -41,6 +96,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+def require_admin(request: Request):
+    # Every /admin route and catalog write; all refused unless AFC_ADMIN_TOKEN is set
+    if not profiling.admin_token_ok(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
 @app.get("/")
 def hello_world():
     return {"message": "AFC Fencing API is running!"}
@@ -62,25 +124,16 @@ def submit_job_details(details: JobDetails):
 
 @app.post("/new_bid/fence_details")
 def submit_fence_details(details: dict = Body(...)):
-
-    print("\n=== /new_bid/fence_details called ===")
-    print("RAW details payload:", details)
-
     try:
         fence_type = details.get("fence_type", "").lower()
         job_id = details.get("job_id")
-        print("Normalized fence_type:", fence_type)
-        print("Job ID:", job_id)
-
-
+        logger.debug("fence details payload: %s", details, extra={"job_id": job_id, "fence_type": fence_type})
 
         if not job_id:
             raise HTTPException(status_code=400, detail="Missing job_id")
 
         if fence_type == "chain link":
-            print("CHAIN LINK DEBUG: height =", details.get("height"), "top_rail =", details.get("top_rail"))
             validated = ChainLinkDetails(**details)
-            print("CHAIN LINK DEBUG: validated =", validated)
             materials = util.calculate_materials_chain_link(
                 lf=validated.linear_feet,
                 cp=validated.corner_posts,
@@ -100,10 +153,7 @@ def submit_fence_details(details: dict = Body(...)):
             )
 
         elif fence_type == "wood":
-            print("WOOD DEBUG: style =", details.get("style"), "bob =", details.get("bob"), "height =",
-                  details.get("height"))
             validated = WoodDetails(**details)
-            print("WOOD DEBUG: validated =", validated)
             materials = util.calculate_materials_wood(
                 lf=validated.linear_feet,
                 style=validated.style,
@@ -117,15 +167,16 @@ def submit_fence_details(details: dict = Body(...)):
                 lf=validated.linear_feet,
                 height=validated.height
             )
-            print("WOOD DEBUG: calculated materials:", materials)
 
         else:
             raise HTTPException(status_code=400, detail=f"Unsupported fence type: {fence_type}")
 
-        util.job_database[job_id]["fence_details"] = {
-            **details,
-            "materials_needed": materials
-        }
+        with metrics.stage("job_store"):
+            util.job_database[job_id]["fence_details"] = {
+                **details,
+                "materials_needed": materials
+            }
+        speculation.speculate(job_id)
 
         return {
             "message": "Fence details saved successfully",
@@ -215,10 +266,89 @@ def add_notes(note_data: Notes):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# === Cost Estimate (pure; shared with speculative precompute) ===
+COSTING_FIELDS = (
+    "pricing_strategy", "material_prices", "daily_rate", "num_employees",
+    "dirt_complexity", "grade_of_slope_complexity", "productivity",
+)
+
+
+def is_default_estimate(data):
+    defaults = CostEstimation(job_id=data.job_id)
+    return all(getattr(data, field) == getattr(defaults, field) for field in COSTING_FIELDS)
+
+
+def estimate_costs(fence_details, data):
+    total_costs = util.calculate_total_costs(
+        fence_details=fence_details,
+        material_prices=data.material_prices,
+        pricing_strategy=data.pricing_strategy,
+        daily_rate=data.daily_rate,
+        num_employees=data.num_employees,
+        dirt_complexity=data.dirt_complexity,
+        grade_of_slope_complexity=data.grade_of_slope_complexity,
+        productivity=data.productivity
+    )
+    return total_costs, total_costs["labor_duration_options"]
+
+
+speculation.register_task(
+    "cost_estimation",
+    lambda job_id: estimate_costs(util.job_database[job_id]["fence_details"], CostEstimation(job_id=job_id))
+)
+
+
+def persist_estimate(data, total_costs):
+    with metrics.stage("job_store"):
+        util.save_cost_estimate(data.job_id, total_costs, data.num_employees, {
+            "dirt_complexity": data.dirt_complexity,
+            "grade_of_slope_complexity": data.grade_of_slope_complexity,
+            "productivity": data.productivity,
+        }, {
+            "pricing_strategy": data.pricing_strategy,
+            "material_prices": data.material_prices,
+            "daily_rate": data.daily_rate,
+        })
+        capacity.record_estimate(data.job_id, total_costs)
+
+
 @app.post("/new_bid/cost_estimation")
-def cost_estimation(data: CostEstimation):
-    print("🔥 COST ESTIMATION PAYLOAD RECEIVED FROM FRONTEND 🔥")
-    print(data)
+def cost_estimation(data: CostEstimation, request: Request, response: Response):
+    logger.debug("cost estimation payload: %s", data, extra={"job_id": data.job_id})
+    data = data.model_copy(update={"dirt_complexity": data.dirt_complexity.strip().lower()})
+    body = data.model_dump()
+
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key:
+        try:
+            replayed = estimate_cache.replay("cost_estimation", idempotency_key, body)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if replayed is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return replayed
+
+    # Double clicks and UI re-runs share one computation, then one cache entry
+    key = estimate_cache.estimate_key(body)
+    result = coalescing.single_flight("cost_estimation", key, lambda: cached_cost_estimation(data, key))
+    if idempotency_key:
+        estimate_cache.remember("cost_estimation", idempotency_key, body, result)
+    return result
+
+
+def cached_cost_estimation(data, key):
+    entry = estimate_cache.get(key)
+    if entry is None:
+        total_costs, result = run_cost_estimation(data)
+        return estimate_cache.put(key, data.job_id, total_costs, result)["response"]
+    if not estimate_cache.is_current(entry):
+        # Same inputs as an earlier estimate, but the job's saved costs moved on
+        persist_estimate(data, entry["total_costs"])
+        estimate_cache.mark_persisted(entry)
+    return entry["response"]
+
+
+def run_cost_estimation(data):
     try:
         if data.job_id not in util.job_database:
             raise HTTPException(status_code=404, detail="Job ID does not exist")
@@ -227,28 +357,17 @@ def cost_estimation(data: CostEstimation):
         if not fence_details:
             raise HTTPException(status_code=400, detail="Fence details not provided for this job")
 
-        total_costs = util.calculate_total_costs(
-            fence_details=fence_details,
-            material_prices=data.material_prices,
-            pricing_strategy=data.pricing_strategy,
-            daily_rate=data.daily_rate,
-            num_employees=data.num_employees,
-            dirt_complexity=data.dirt_complexity,
-            grade_of_slope_complexity=data.grade_of_slope_complexity
-        )
-
-
-        # ─── Persist cost data for later summary ────────────────────────
-        util.job_database[data.job_id]["costs"] = {
-            "material_total":       total_costs["material_total"],
-            "material_tax":         total_costs["material_tax"],
-            "delivery_charge":      total_costs["delivery_charge"],
-            "labor_costs":          total_costs["labor_costs"],             # contains num_days, total_labor_cost, etc.
-            "price_per_linear_foot": total_costs["price_per_linear_foot"],
-        }
-        util.job_database[data.job_id]["estimated_days"] = total_costs["labor_costs"]["num_days"]
-        # ────────────────────────────────────────────────────────────────
-
+        speculative = speculation.take(data.job_id, "cost_estimation") if is_default_estimate(data) else None
+        total_costs, labor_duration_options = speculative or estimate_costs(fence_details, data)
+        # Simulated first so a rejected simulation leaves the saved estimate alone
+        risk_simulation = risk.simulate_job_risk(
+            fence_details,
+            total_costs,
+            data,
+            draws=data.simulation_draws,
+            recommended_margin=data.recommended_margin
+        ) if data.simulate else None
+        persist_estimate(data, total_costs)
 
         grand_total = round(
             total_costs["material_total"] +
@@ -257,14 +376,7 @@ def cost_estimation(data: CostEstimation):
             total_costs["labor_costs"]["total_labor_cost"], 2
         )
 
-        labor_duration_options = util.generate_labor_duration_options(
-            linear_feet=fence_details.get("linear_feet"),
-            dirt_complexity=util.dirt_scores.get(data.dirt_complexity.lower(), 1.0),
-            grade_of_slope_complexity=util.calculate_slope_complexity_score(data.grade_of_slope_complexity),
-            productivity=data.productivity  # ✅ added here
-        )
-
-        return {
+        response = {
             "message": "Cost estimation completed successfully",
             "job_id": data.job_id,
             "price_per_linear_foot": total_costs["price_per_linear_foot"],
@@ -281,104 +393,497 @@ def cost_estimation(data: CostEstimation):
             }
         }
 
+        if risk_simulation is not None:
+            response["risk_simulation"] = risk_simulation
+
+        return total_costs, response
+
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-from fastapi import Body, HTTPException
-from fastapi.responses import FileResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import Paragraph, Frame, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from io import BytesIO
-import os
-import util
 
-@app.post("/generate_proposal")
-def generate_proposal(data: ProposalRequest):
-    job_id = data.job_id
+@app.post("/new_bid/price_solver")
+def price_solver(data: PriceSolverRequest):
+    try:
+        if data.job_id not in util.job_database:
+            raise HTTPException(status_code=404, detail="Job ID does not exist")
 
-    if job_id not in util.job_database:
-        raise HTTPException(status_code=404, detail="Job ID not found.")
+        fence_details = util.job_database[data.job_id].get("fence_details")
+        if not fence_details:
+            raise HTTPException(status_code=400, detail="Fence details not provided for this job")
 
-    job = util.job_database[job_id]
-    first_name = job.get("proposal_to", "").split()[0] if job.get("proposal_to") else "Client"
-
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    # === Logo ===
-    logo_path = "american-fence-concepts-logo_sm.webp"
-    if os.path.exists(logo_path):
-        logo = ImageReader(logo_path)
-        logo_width = 180
-        c.drawImage(logo, (width - logo_width) / 2, height - 100, width=logo_width, preserveAspectRatio=True, mask='auto')
-
-    # === Company Info ===
-    c.setFont("Helvetica", 10)
-    c.drawCentredString(width / 2, height - 110, "2383 Via Rancheros, Fallbrook, CA 92028")
-    c.drawCentredString(width / 2, height - 123, "www.americanfenceconcepts.com")
-    c.drawCentredString(width / 2, height - 135, "CA LIC #1037833")
-
-    # === Contact Info ===
-    c.setFont("Helvetica", 11)
-    contact_text = """Jon Keys
-760-877-9951
-j.keys@americanfenceconcepts.com
-
-Beau Postal
-949-259-8868
-bpostal@americanfenceconcepts.com"""
-    contact_obj = c.beginText(50, height - 200)
-    for line in contact_text.splitlines():
-        contact_obj.textLine(line)
-    c.drawText(contact_obj)
-
-    # === Greeting Paragraph ===
-    styles = getSampleStyleSheet()
-    style = styles["Normal"]
-    style.fontName = "Helvetica"
-    style.fontSize = 12
-    style.leading = 16
-
-    greeting_paragraph = Paragraph(
-        f"{first_name},<br/><br/>"
-        "American Fence Concepts appreciates the opportunity to offer the following proposal. "
-        "We agree to perform the below stated work and hereby agrees to fabricate, furnish, and install "
-        "the described work in a professional and timely work like manner. We look forward to doing business with you.",
-        style
-    )
+        solution = pricing_solver.solve_target_price(
+            fence_details=fence_details,
+            material_prices=data.material_prices,
+            pricing_strategy=data.pricing_strategy,
+            daily_rate=data.daily_rate,
+            num_employees=data.num_employees,
+            dirt_complexity=data.dirt_complexity,
+            grade_of_slope_complexity=data.grade_of_slope_complexity,
+            productivity=data.productivity,
+            target_revenue=data.target_revenue,
+            target_price_per_linear_foot=data.target_price_per_linear_foot,
+            crew_sizes=data.crew_sizes,
+            daily_rates=data.daily_rates,
+            whole_days=data.whole_days,
+            max_days=data.max_days,
+            min_margin=data.min_margin,
+            margin_curve_max=data.margin_curve_max,
+            margin_curve_step=data.margin_curve_step,
+            max_plans=data.max_plans
+        )
+        return {"job_id": data.job_id, **solution}
 
-    frame = Frame(
-        x1=50,
-        y1=height - 560,
-        width=width - 100,
-        height=140,
-        showBoundary=0
-    )
-    frame.addFromList([greeting_paragraph], c)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/new_bid/labor_plan")
+def labor_plan(data: LaborPlanRequest):
+    try:
+        linear_feet = data.linear_feet
+        fence_type = data.fence_type
+        if linear_feet is None:
+            if data.job_id not in util.job_database:
+                raise HTTPException(status_code=404, detail="Job ID does not exist")
+            fence_details = util.job_database[data.job_id].get("fence_details") or {}
+            linear_feet = fence_details.get("linear_feet")
+            fence_type = fence_type or fence_details.get("fence_type")
+            if not linear_feet:
+                raise HTTPException(status_code=400, detail="Fence details not provided for this job")
+
+        plan = labor_planner.plan_labor_options(
+            linear_feet=linear_feet,
+            daily_rate=data.daily_rate,
+            dirt_complexity=util.dirt_scores.get(data.dirt_complexity.lower(), 1.0),
+            grade_of_slope_complexity=util.calculate_slope_complexity_score(data.grade_of_slope_complexity),
+            productivity=data.productivity,
+            whole_days=data.whole_days,
+            min_crew_size=data.min_crew_size,
+            max_crew_size=data.max_crew_size,
+            min_shift_hours=data.min_shift_hours,
+            max_shift_hours=data.max_shift_hours,
+            shift_step_hours=data.shift_step_hours,
+            fence_type=fence_type,
+            soil=data.dirt_complexity
+        )
+        return {"job_id": data.job_id, "linear_feet": linear_feet, **plan}
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+_actuals_lock = threading.Lock()
+
+
+@app.post("/jobs/record_actuals")
+def record_actuals(data: JobActuals):
+    try:
+        if data.job_id not in util.job_database:
+            raise HTTPException(status_code=404, detail="Job ID does not exist")
+
+        job = util.job_database[data.job_id]
+        fence_details = job.get("fence_details")
+        if not fence_details:
+            raise HTTPException(status_code=400, detail="Fence details not provided for this job")
+
+        # Fall back to the inputs the job was last estimated with
+        labor_inputs = job.get("labor_inputs", {})
+        dirt_complexity = data.dirt_complexity or labor_inputs.get("dirt_complexity", "soft")
+        grade = data.grade_of_slope_complexity
+        if grade is None:
+            grade = labor_inputs.get("grade_of_slope_complexity", 0.0)
+        productivity = data.productivity or labor_inputs.get("productivity", 1.0)
+
+        complexity_multiplier = (
+            util.dirt_scores.get(dirt_complexity.lower(), 1.0)
+            + util.calculate_slope_complexity_score(grade)
+        ) - 1
+
+        # Each job is one observation: a retried request must not feed the
+        # labor model the same install twice
+        with _actuals_lock:
+            if "actual_install_hours" in job:
+                raise HTTPException(status_code=409, detail="Actuals already recorded for this job")
+            update = calibration.record_actual(
+                fence_type=fence_details.get("fence_type"),
+                soil=dirt_complexity,
+                linear_feet=fence_details.get("linear_feet"),
+                actual_install_hours=data.actual_install_hours,
+                complexity_multiplier=complexity_multiplier,
+                productivity=productivity
+            )
+            job["actual_install_hours"] = data.actual_install_hours
+        return {"job_id": data.job_id, **update}
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/calibration")
+def get_calibration():
+    return calibration.coefficients()
+
+
+@app.get("/capacity")
+def get_capacity():
+    return capacity.capacity_report()
 
 
+@app.get("/schedule")
+def get_schedule():
+    return scheduler.current_schedule()
 
-    c.showPage()
-    c.save()
-    buffer.seek(0)
 
-    output_path = f"proposal_{job_id}.pdf"
+@app.post("/schedule/accept_job")
+def schedule_accept_job(data: ScheduleAcceptRequest):
+    try:
+        return scheduler.accept_job(data.job_id, due_date=data.due_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/schedule/release_job")
+def schedule_release_job(data: JobIDRequest):
+    try:
+        return scheduler.release_job(data.job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-    writer = PdfWriter()
-    writer.append(PdfReader(buffer))  # First page
-    writer.append(PdfReader("afc-pro-pg2.pdf"))  # Second page
 
-    with open(output_path, "wb") as f_out:
-        writer.write(f_out)
+@app.post("/schedule/configure")
+def schedule_configure(data: ScheduleConfig):
+    try:
+        return scheduler.configure(
+            crews=[crew.model_dump() for crew in data.crews] if data.crews is not None else None,
+            start_date=data.start_date,
+            workdays=data.workdays,
+            holidays=data.holidays,
+            objective=data.objective
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return FileResponse(output_path, filename="AFC_Proposal.pdf", media_type="application/pdf")
+
+@app.get("/schedule/projected_start")
+def schedule_projected_start(job_id: str = None, estimated_days: float = None, crew_size: int = 3):
+    try:
+        if job_id:
+            person_days = scheduler.job_person_days(job_id)
+        elif estimated_days is not None:
+            person_days = estimated_days * crew_size
+        else:
+            raise HTTPException(status_code=400, detail="Provide job_id or estimated_days")
+        return scheduler.projected_start(person_days)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/instant_quote")
+def instant_quote(
+    fence_type: str,
+    linear_feet: float,
+    height: int = 6,
+    top_rail: bool = True,
+    with_chain_link: bool = False,
+    style: str = "dogeared",
+    bob: bool = False,
+    corner_posts: int = Query(price_curves.DEFAULT_CORNER_POSTS, ge=0),
+    end_posts: int = Query(price_curves.DEFAULT_END_POSTS, ge=0),
+    pricing_strategy: str = "Master Halco Pricing",
+    daily_rate: float = 150.0,
+    num_employees: int = Query(3, ge=1),
+    dirt_complexity: str = "soft",
+    grade_of_slope_complexity: float = 0.0
+):
+    try:
+        return price_curves.instant_quote(
+            fence_type=fence_type,
+            linear_feet=linear_feet,
+            pricing_strategy=pricing_strategy,
+            height=height,
+            top_rail=top_rail,
+            with_chain_link=with_chain_link,
+            style=style,
+            bob=bob,
+            corner_posts=corner_posts,
+            end_posts=end_posts,
+            daily_rate=daily_rate,
+            num_employees=num_employees,
+            dirt_complexity=dirt_complexity,
+            grade_of_slope_complexity=grade_of_slope_complexity
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/catalog/update_price")
+def update_catalog_price(data: CatalogPriceUpdate, request: Request):
+    require_admin(request)
+    try:
+        entry = util.update_catalog_price(
+            data.fence_type,
+            data.material,
+            data.unit_price,
+            unit_size=data.unit_size,
+            pricing_strategy=data.pricing_strategy,
+            height=data.height,
+            top_rail=data.top_rail,
+            with_chain_link=data.with_chain_link,
+            style=data.style,
+            bob=data.bob
+        )
+        return {"message": "Catalog updated", "catalog_version": util.catalog_version, "price": entry}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/bulk/import")
+async def bulk_import_jobs(request: Request):
+    # NDJSON in, NDJSON out: one {"job", "fence", "pricing"} record per line
+    return bulk_import.NDJSONStreamingResponse(bulk_import.stream_import(request.stream()))
+
+
+@app.post("/catalog/takeoff_definition")
+def register_takeoff_definition(data: TakeoffDefinition, request: Request):
+    require_admin(request)
+    try:
+        key = util.register_takeoff_definition(
+            data.fence_type,
+            {
+                "variables": [(v.name, v.formula) for v in data.variables],
+                "materials": [m.model_dump(exclude_none=True) for m in data.materials],
+            },
+            style=data.style,
+            price_table={k: v.model_dump() for k, v in data.price_table.items()} if data.price_table else None,
+            pricing_strategy=data.pricing_strategy,
+            height=data.height,
+            top_rail=data.top_rail,
+            with_chain_link=data.with_chain_link,
+            bob=data.bob
+        )
+        return {"message": "Takeoff definition registered", "definition": key, "catalog_version": util.catalog_version}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/admin/reprice")
+def start_reprice(data: RepriceRequest, request: Request):
+    require_admin(request)
+    if data.threshold is not None and data.threshold < 0:
+        raise HTTPException(status_code=400, detail="threshold must be 0 or greater")
+    run = repricing.request_reprice(trigger="admin", threshold=data.threshold)
+    return {"message": "Repricing queued", "run_id": run["run_id"]}
+
+
+@app.get("/admin/reprice")
+def get_latest_reprice(request: Request):
+    require_admin(request)
+    report = repricing.reprice_report()
+    if report is None:
+        raise HTTPException(status_code=404, detail="No repricing runs yet")
+    return report
+
+
+@app.get("/admin/speculation")
+def get_speculation_stats(request: Request):
+    require_admin(request)
+    return speculation.speculation_report()
+
+
+@app.get("/admin/coalescing")
+def get_coalescing_stats(request: Request):
+    require_admin(request)
+    return coalescing.coalescing_report()
+
+
+@app.get("/admin/estimate_cache")
+def get_estimate_cache_stats(request: Request):
+    require_admin(request)
+    return estimate_cache.estimate_cache_report()
+
+
+@app.get("/admin/logging")
+def get_logging_config(request: Request):
+    require_admin(request)
+    return structured_logging.logging_report()
+
+
+@app.post("/admin/logging")
+def update_logging_config(data: LogLevelUpdate, request: Request):
+    require_admin(request)
+    try:
+        if data.level is not None:
+            structured_logging.set_level(data.logger, data.level)
+        if data.debug_sample is not None:
+            structured_logging.set_debug_sample(data.debug_sample)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return structured_logging.logging_report()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _hit_ratio(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+metrics.register_gauge("afc_jobs", "Jobs in the job store.", lambda: len(util.job_database))
+metrics.register_gauge(
+    "afc_cache_hit_ratio",
+    "Share of lookups served without recomputing.",
+    lambda: {
+        "estimate": _hit_ratio(estimate_cache.estimate_cache_stats["hits"], estimate_cache.estimate_cache_stats["misses"]),
+        "speculation": _hit_ratio(speculation.speculation_stats["hits"], speculation.speculation_stats["misses"]),
+        "coalescing": _hit_ratio(
+            sum(s["coalesced"] for s in coalescing.coalescing_stats.values()),
+            sum(s["executed"] for s in coalescing.coalescing_stats.values())
+        ),
+    },
+    labels=("cache",)
+)
+metrics.register_gauge(
+    "afc_render_queue_depth",
+    "Speculative renders not yet finished plus document requests waiting for a slot.",
+    lambda: speculation.speculation_report()["pending"] + len(admission.controller.waiting["document"])
+)
+metrics.register_gauge(
+    "afc_admission_waiting",
+    "Requests queued for an admission slot.",
+    lambda: {name: len(queue) for name, queue in admission.controller.waiting.items()},
+    labels=("endpoint_class",)
+)
+metrics.register_gauge(
+    "afc_admission_running",
+    "Requests holding an admission slot.",
+    lambda: dict(admission.controller.running),
+    labels=("endpoint_class",)
+)
+
+
+@app.get("/admin/profiles")
+def get_profiles(request: Request):
+    require_admin(request)
+    return profiling.list_profiles()
+
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: int, request: Request):
+    require_admin(request)
+    session = profiling.get_profile(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(session["profile"])
+
+
+@app.get("/admin/memory")
+def get_memory(request: Request, limit: int = 20, top: int = 25):
+    require_admin(request)
+    return memory.memory_report(limit=limit, top=top)
+
+
+@app.get("/admin/traces")
+def get_traces(request: Request, limit: int = 50):
+    require_admin(request)
+    return {**tracing.tracing_stats, "traces": tracing.list_traces(limit)}
+
+
+@app.get("/admin/traces/{trace_id}")
+def get_trace(trace_id: str, request: Request):
+    require_admin(request)
+    spans = tracing.get_trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+
+@app.get("/admin/capture")
+def get_capture_stats(request: Request):
+    require_admin(request)
+    return capture.capture_report()
+
+
+@app.get("/admin/admission")
+def get_admission_stats(request: Request):
+    require_admin(request)
+    return admission.controller.report()
+
+
+@app.get("/admin/reprice/{run_id}")
+def get_reprice(run_id: int, request: Request):
+    require_admin(request)
+    report = repricing.reprice_report(run_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Repricing run not found")
+    return report
+
+# === Documents ===
+def load_documents():
+    # ReportLab and pypdf stay out of startup; the first document request (or
+    # the warm-up thread started in lifespan) pays for the import instead
+    import documents
+    return documents
+
+
+def warm_shared_state():
+    # Read-only state every worker would otherwise build for itself; with
+    # gunicorn preload (gunicorn.conf.py) this runs once in the master and
+    # the workers share it copy-on-write
+    takeoff.compile_all()
+    price_curves.rebuild_price_curves()
+    load_documents().preload_assets()
+
+
+def pdf_response(content, filename):
+    return Response(
+        content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.post("/generate_proposal")
+def generate_proposal(data: ProposalRequest):
+    if data.job_id not in util.job_database:
+        raise HTTPException(status_code=404, detail="Job ID not found.")
+
+    key = coalescing.request_key(data.job_id, speculation.fingerprint(data.job_id))
+    content = coalescing.single_flight(
+        "proposal", key, lambda: speculation.take(data.job_id, "proposal") or load_documents().render_proposal_pdf(data.job_id)
+    )
+    return pdf_response(content, "AFC_Proposal.pdf")
+
+
+speculation.register_task("proposal", lambda job_id: load_documents().render_proposal_pdf(job_id))
 
 @app.post("/generate_materials_list")
 def generate_materials_list(request: JobIDRequest):
@@ -395,240 +900,29 @@ def generate_materials_list(request: JobIDRequest):
     if not materials:
         raise HTTPException(status_code=400, detail="Materials not calculated.")
 
-    # Create PDF in memory
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, height - 50, "📦 Materials List")
-
-    c.setFont("Helvetica-Bold", 12)
-    y = height - 80
-    c.drawString(50, y, "Material")
-    c.drawString(250, y, "Quantity")
-    y -= 20
-
-    c.setFont("Helvetica", 11)
-    for material, quantity in materials.items():
-        c.drawString(50, y, material)
-        c.drawString(250, y, str(quantity))
-        y -= 18
-        if y < 50:
-            c.showPage()
-            y = height - 50
-
-    c.showPage()
-    c.save()
-    buffer.seek(0)
+    content = load_documents().render_materials_list_pdf(materials)
 
     output_path = f"materials_list_{job_id}.pdf"
-    with open(output_path, "wb") as f:
-        f.write(buffer.read())
+    with metrics.stage("pdf_write"), open(output_path, "wb") as f:
+        f.write(content)
 
     return FileResponse(output_path, filename="Materials_List.pdf", media_type="application/pdf")
 
 
-from fastapi import HTTPException
-from fastapi.responses import FileResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from io import BytesIO
-import os
-import util
-
-from datetime import datetime
-
 @app.post("/generate_job_spec_sheet")
 def generate_job_spec_sheet(data: ProposalRequest):
-    job_id = data.job_id
-
-    if job_id not in util.job_database:
+    if data.job_id not in util.job_database:
         raise HTTPException(status_code=404, detail="Job ID not found.")
 
-    job = util.job_database[job_id]
-    fence_details = job.get("fence_details", {})
+    key = coalescing.request_key(data.job_id, speculation.fingerprint(data.job_id))
+    content = coalescing.single_flight(
+        "job_spec_sheet", key, lambda: speculation.take(data.job_id, "job_spec_sheet") or load_documents().render_job_spec_sheet_pdf(data.job_id)
+    )
+    return pdf_response(content, "AFC_Job_Spec_Sheet.pdf")
 
-    # ─── Recalculate material costs with correct function per fence type ───
-    raw_materials = fence_details.get("materials_needed", {})
-    fence_type = fence_details.get("fence_type", "").strip().lower()
-    with_chain_link = fence_details.get("with_chain_link", False)
-    height = fence_details.get("height")
-    top_rail = fence_details.get("top_rail", False)
-    style = fence_details.get("style")
-    bob = fence_details.get("bob", False)
 
-    if fence_type == "vinyl":
-        detailed_costs, _ = util.calculate_vinyl_material_costs(
-            raw_materials,
-            custom_prices={},
-            pricing_strategy="Master Halco Pricing",
-            height=height,
-            top_rail=top_rail,
-            with_chain_link=with_chain_link
-        )
-    elif fence_type == "wood":
-        detailed_costs, _ = util.calculate_wood_material_costs(
-            raw_materials,
-            custom_prices={},
-            style=style,
-            height=height,
-            bob=bob
-        )
-    elif fence_type == "sp wrought iron":
-        detailed_costs, _ = util.calculate_sp_wrought_iron_material_costs(
-            raw_materials,
-            custom_prices={},
-            pricing_strategy="Master Halco Pricing",
-            height=height,
-            top_rail=top_rail
-        )
-    else:
-        detailed_costs, _ = util.calculate_material_costs(
-            raw_materials,
-            {},
-            "Master Halco Pricing",
-            height,
-            top_rail,
-            fence_type=fence_type,
-            style=style,
-            bob=bob
-        )
-    materials_needed = detailed_costs
-
-    proposal_to = job.get("proposal_to", "Client")
-    job_address = job.get("job_address", "Unknown Address")
-    fence_type_label = fence_details.get("fence_type", "Unknown Type")
-    display_height = fence_details.get("height", "N/A")
-    notes = job.get("notes", "")
-    today = datetime.today().strftime("%m/%d/%y")
-
-    # === Create PDF ===
-    output_path = f"job_spec_sheet_{job_id}.pdf"
-    c = canvas.Canvas(output_path, pagesize=letter)
-    width, height_pt = letter
-    x_margin = 50
-    y = height_pt - 72  # 1 inch
-
-    # Header
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(x_margin, y, "American Fence Concepts")
-    y -= 20
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x_margin, y, "Job Specification Sheet")
-    y -= 29
-
-    c.setFont("Helvetica", 10)
-    c.drawString(x_margin, y, f"Project Name: {proposal_to} - {fence_type_label.title()} Fence")
-    y -= 14
-    c.drawString(x_margin, y, f"Client: {proposal_to}")
-    y -= 14
-    c.drawString(x_margin, y, f"Date: {today}")
-    y -= 14
-    c.drawString(x_margin, y, f"Address: {job_address}")
-    y -= 20
-
-    # Job Scope
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(x_margin, y, "Job Scope:")
-    y -= 14
-    c.setFont("Helvetica", 11)
-    c.drawString(x_margin + 20, y, f"- {display_height}' High {fence_type_label.title()}")
-    y -= 14
-    if top_rail:
-        c.drawString(x_margin + 20, y, "- Top Rail")
-        y -= 14
-
-    # Materials Table
-    y -= 20
-    table_data = [["Material", "Quantity", "Unit Size", "Order Size"]]
-    for material, details in materials_needed.items():
-        label = material.replace("_", " ").title()
-        quantity  = round(details.get("quantity", 0))
-        unit_size = details.get("unit_size", 1)
-        order_size= round(details.get("order_size", 0))
-        table_data.append([label, quantity, unit_size, order_size])
-
-    table = Table(table_data, colWidths=[180, 80, 80, 80])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 0), (-1, -1), 10),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-    ]))
-
-    bottom_margin = 50
-    available_width = width - 2 * x_margin
-    available_height = y - bottom_margin
-    table_w, table_h = table.wrap(available_width, available_height)
-
-    if table_h > available_height:
-        c.showPage()
-        y = height_pt - 72
-
-    table.drawOn(c, x_margin, y - table_h)
-    y -= table_h + 20
-
-    # Notes Section
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x_margin, y, "Notes:")
-    y -= 16
-    c.setFont("Helvetica", 11)
-
-    if notes.strip():
-        from reportlab.lib.utils import simpleSplit
-        max_note_width = width - x_margin * 2 - 30  # 30 to account for dash & indent
-        # Split notes into paragraphs by newline
-        paragraphs = [p.strip() for p in notes.strip().split('\n') if p.strip()]
-        for para in paragraphs:
-            # Wrap the paragraph to fit within the width
-            wrapped_lines = simpleSplit(para, "Helvetica", 11, max_note_width)
-            for i, line in enumerate(wrapped_lines):
-                if y <= bottom_margin:
-                    c.showPage()
-                    y = height_pt - 72
-                    c.setFont("Helvetica-Bold", 12)
-                    c.drawString(x_margin, y, "Notes (cont'd):")
-                    y -= 16
-                    c.setFont("Helvetica", 11)
-                # Only put the dash on the first line of each bullet point
-                prefix = "- " if i == 0 else "  "
-                c.drawString(x_margin + 20, y, prefix + line)
-                y -= 14
-            y -= 2  # Slight extra space between bullets
-
-    c.save()
-    return FileResponse(output_path, filename="AFC_Job_Spec_Sheet.pdf", media_type="application/pdf")
-
-
-from fastapi import HTTPException
-from fastapi.responses import FileResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors
-from datetime import datetime
-from io import BytesIO
-import util
+speculation.register_task("job_spec_sheet", lambda job_id: load_documents().render_job_spec_sheet_pdf(job_id))
 
-from io import BytesIO
-from datetime import datetime
-import os
-import subprocess
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors
 
 @app.post("/generate_internal_summary")
 def generate_internal_summary(data: InternalSummaryRequest):
@@ -637,182 +931,11 @@ def generate_internal_summary(data: InternalSummaryRequest):
     if job_id not in util.job_database:
         raise HTTPException(status_code=404, detail="Job ID not found.")
 
-    job = util.job_database[job_id]
-    fence_details = job.get("fence_details", {})
-    proposal_to = job.get("proposal_to", "Client")
-    linear_feet = fence_details.get("linear_feet", 0)
-    height_value = fence_details.get("height", "N/A")
-
-    costs = job.get("costs", {})
-    material_total = costs.get("material_total", 0)
-    material_tax = costs.get("material_tax", 0)
-    delivery_charge = costs.get("delivery_charge", 0)
-    labor_info = costs.get("labor_costs", {})
-
-    daily_rate = data.daily_rate or labor_info.get("daily_rate") or 0
-    num_workers = data.crew_size or labor_info.get("crew_size") or 0
-    estimated_days = data.estimated_days if data.estimated_days is not None else job.get("estimated_days", "N/A")
-    additional_days = data.additional_days or 0
-
-    total_labor = labor_info.get("total_labor_cost", 0)
-    total_cost = material_total + material_tax + delivery_charge + total_labor
-    price_per_lf = total_cost / linear_feet if linear_feet else 0
-
-    def margin_calc(margin_pct):
-        revenue = total_cost / (1 - margin_pct)
-        profit = revenue - total_cost
-        return revenue, profit, revenue / linear_feet if linear_feet else 0
-
-    default_margins = {
-        "20%": 0.20,
-        "30%": 0.30,
-        "40%": 0.40,
-        "50%": 0.50,
-    }
-
-    selected_margin_pct = data.custom_margin
-    highlight_label = None
-
-    if selected_margin_pct is not None:
-        highlight_label = f"{int(selected_margin_pct * 100)}%"
-        if highlight_label not in default_margins:
-            default_margins[highlight_label] = selected_margin_pct
-
-    margins = {label: margin_calc(pct) for label, pct in default_margins.items()}
-
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    page_width, page_height = letter
-    x = 50
-    y = page_height - 50
-
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(x, y, "Internal Job Summary")
-    y -= 25
-
-    c.setFont("Helvetica", 11)
-    c.drawString(x, y, f"Job ID: {job_id}")
-    y -= 15
-    c.drawString(x, y, f"Client: {proposal_to}")
-    y -= 15
-    c.drawString(x, y, f"Fence Type: {fence_details.get('fence_type', '')} - {height_value}'")
-    y -= 15
-    c.drawString(x, y, f"Date: {datetime.now().strftime('%m/%d/%y')}")
-    y -= 25
-
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x, y, "Cost Breakdown:")
-    y -= 18
-    c.setFont("Helvetica", 11)
-    c.drawString(x, y, f"Material Cost: ${material_total:,.2f}")
-    y -= 16
-    c.drawString(x, y, f"Material Tax: ${material_tax:,.2f}")
-    y -= 16
-    c.drawString(x, y, f"Delivery Charge: ${delivery_charge:,.2f}")
-    y -= 16
-    c.drawString(x, y, f"Day Rate (per worker): ${daily_rate:,.2f}")
-    y -= 16
-    c.drawString(x, y, f"Workers: {num_workers}")
-    y -= 16
-    c.drawString(x, y, f"Total Labor Cost: ${total_labor:,.2f}")
-    y -= 16
-
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(x, y, f"Total Job Cost: ${total_cost:,.2f}")
-    y -= 25
-
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x, y, "Production Info:")
-    y -= 18
-    c.setFont("Helvetica", 11)
-    c.drawString(x, y, f"Estimated Production Time: {estimated_days} days")
-    y -= 16
-    c.drawString(x, y, f"Additional Labor Days: {additional_days}")
-    y -= 16
-    c.drawString(x, y, f"Number of Workers: {num_workers}")
-    y -= 16
-    c.drawString(x, y, f"Cost Per Linear Foot: ${price_per_lf:,.2f}")
-    y -= 25
-
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x, y, "Margin Projections:")
-    y -= 18
-
-    header_labels = list(margins.keys())
-    header_row = ["Metric"] + header_labels
-    revenue_row = ["Revenue"] + [f"${margins[label][0]:,.2f}" for label in header_labels]
-    profit_row = ["Profit"] + [f"${margins[label][1]:,.2f}" for label in header_labels]
-    price_row = ["Price/LF"] + [f"${margins[label][2]:,.2f}" for label in header_labels]
-
-    table_data_margins = [header_row, revenue_row, profit_row, price_row]
-
-    table_margins = Table(table_data_margins, colWidths=[100] + [80] * len(header_labels))
-
-    margin_table_style = [
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-        ("ALIGN", (1, 0), (-1, -1), "CENTER"),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 0), (-1, -1), 10),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-    ]
-
-    if highlight_label and highlight_label in header_labels:
-        col_index = header_labels.index(highlight_label) + 1
-        margin_table_style.append(
-            ("BACKGROUND", (col_index, 0), (col_index, -1), colors.lightblue)
-        )
-
-    table_margins.setStyle(TableStyle(margin_table_style))
-
-    available_width = page_width - (2 * x)
-    _, table_margin_h = table_margins.wrap(available_width, y)
-    if table_margin_h + 50 > y:
-        c.showPage()
-        y = page_height - 50
-
-    table_margins.drawOn(c, x, y - table_margin_h)
-    y -= table_margin_h + 20
-
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x, y, "Materials:")
-    y -= 15
-
-    materials = fence_details.get("materials_needed", {})
-    table_data = [["Material", "Quantity"]]
-    for material, details in materials.items():
-        label = material.replace("_", " ").title()
-        qty = round(details.get("quantity", 0)) if isinstance(details, dict) else round(details)
-        table_data.append([label, qty])
-
-    table = Table(table_data, colWidths=[200, 100])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 0), (-1, -1), 10),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-    ]))
-
-    table_width, table_height = table.wrap(available_width, y)
-    if table_height + 50 > y:
-        c.showPage()
-        y = page_height - 50
-
-    table.drawOn(c, x, y - table_height)
-    y -= table_height + 20
-
-    c.save()
-    buffer.seek(0)
+    content = load_documents().render_internal_summary_pdf(job_id, data)
 
     output_path = f"internal_summary_{job_id}.pdf"
-    with open(output_path, "wb") as f_out:
-        f_out.write(buffer.read())
+    with metrics.stage("pdf_write"), open(output_path, "wb") as f_out:
+        f_out.write(content)
 
     return FileResponse(
         output_path,
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from pydantic import ValidationError
+
+import tracing
+import util
+from models import CostEstimation, fence_detail_models
+
+
+# Prices a file of fence jobs without the web server:
+#   python batch_estimate.py jobs.csv estimates.csv --workers 8
+# Input is CSV (or Parquet when pyarrow is installed) with one job per row using
+# the same field names as /new_bid/fence_details and /new_bid/cost_estimation.
+# Output is CSV or JSON lines depending on the output file extension.
+# With AFC_TRACE_FILE set, the run and every row are traced to that file
+# (continuing AFC_TRACEPARENT when given).
+
+DEFAULT_CHUNKSIZE = 64
+PROGRESS_INTERVAL_SEC = 1.0
+
+FENCE_FIELDS = ("fence_type", "linear_feet", "corner_posts", "end_posts", "height", "top_rail", "with_chain_link", "style", "bob")
+PRICING_FIELDS = ("pricing_strategy", "daily_rate", "num_employees", "dirt_complexity", "grade_of_slope_complexity", "productivity")
+MARGINS = ("20%", "30%", "40%", "50%")
+
+OUTPUT_COLUMNS = (
+    "row", "id", "status", "error", "fence_type", "linear_feet",
+    "material_total", "material_tax", "delivery_charge", "labor_days", "labor_cost", "total_cost",
+    "price_per_linear_foot", *[f"revenue_{m.rstrip('%')}" for m in MARGINS], "detailed_costs",
+)
+
+
+# === Input ===
+def _csv_rows(path):
+    with open(path, newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def _parquet_rows(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Reading Parquet requires pyarrow (pip install pyarrow)")
+    for batch in pq.ParquetFile(path).iter_batches():
+        yield from batch.to_pylist()
+
+
+def read_rows(path):
+    return _parquet_rows(path) if path.endswith(".parquet") else _csv_rows(path)
+
+
+def count_rows(path):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    with open(path, newline="") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+# === Estimating ===
+def _present(row, fields):
+    # CSV cells are strings; blanks mean "use the default"
+    return {k: row[k] for k in fields if row.get(k) not in (None, "")}
+
+
+def estimate_row(item):
+    index, row, traceparent = item
+    if traceparent is None:
+        return _estimate(index, row)
+    with tracing.activate(tracing.start_trace("batch_estimate.row", traceparent, row=index)):
+        return _estimate(index, row)
+
+
+def _estimate(index, row):
+    result = {"row": index, "id": row.get("job_id") or row.get("id") or str(index), "status": "ok", "error": None}
+    try:
+        details = _present(row, FENCE_FIELDS)
+        fence_type = str(details.get("fence_type", "")).strip().lower()
+        model = fence_detail_models.get(fence_type)
+        if model is None:
+            raise ValueError(f"Unsupported fence type: {fence_type}")
+        validated = model(job_id=result["id"], **{**details, "fence_type": fence_type})
+        fence_details = validated.model_dump()
+        fence_details["materials_needed"] = util.calculate_materials_router(
+            fence_type,
+            lf=validated.linear_feet,
+            cp=getattr(validated, "corner_posts", 0),
+            ep=getattr(validated, "end_posts", 0),
+            height=validated.height,
+            top_rail=getattr(validated, "top_rail", False),
+            with_chain_link=getattr(validated, "with_chain_link", False),
+            style=getattr(validated, "style", None),
+            bob=getattr(validated, "bob", False)
+        )
+
+        pricing = CostEstimation(job_id=result["id"], **_present(row, PRICING_FIELDS))
+        total_costs = util.calculate_total_costs(
+            fence_details=fence_details,
+            material_prices={},
+            pricing_strategy=pricing.pricing_strategy,
+            daily_rate=pricing.daily_rate,
+            num_employees=pricing.num_employees,
+            dirt_complexity=pricing.dirt_complexity,
+            grade_of_slope_complexity=pricing.grade_of_slope_complexity,
+            productivity=pricing.productivity
+        )
+    except ValidationError as e:
+        result.update(status="error", error="; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+        return result
+    except Exception as e:
+        result.update(status="error", error=str(e))
+        return result
+
+    labor = total_costs["labor_costs"]
+    result.update({
+        "fence_type": fence_type,
+        "linear_feet": validated.linear_feet,
+        "material_total": total_costs["material_total"],
+        "material_tax": total_costs["material_tax"],
+        "delivery_charge": total_costs["delivery_charge"],
+        "labor_days": labor["num_days"],
+        "labor_cost": labor["total_labor_cost"],
+        "total_cost": round(
+            total_costs["material_total"] + total_costs["material_tax"]
+            + total_costs["delivery_charge"] + labor["total_labor_cost"], 2
+        ),
+        "price_per_linear_foot": total_costs["price_per_linear_foot"],
+        "profit_margins": total_costs["profit_margins"],
+        "detailed_costs": total_costs["detailed_costs"],
+        "labor_duration_options": total_costs["labor_duration_options"],
+    })
+    return result
+
+
+def _init_worker(trace_file=None):
+    # Row failures already land in the output file; keep util's warnings off the console
+    logging.disable(logging.WARNING)
+    if trace_file:
+        tracing.configure_file_export(trace_file, background=False)
+
+
+# === Output ===
+class CsvWriter:
+    def __init__(self, f):
+        self.writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, result):
+        row = dict(result)
+        for margin in MARGINS:
+            row[f"revenue_{margin.rstrip('%')}"] = result.get("profit_margins", {}).get(margin, {}).get("revenue")
+        if "detailed_costs" in row:
+            row["detailed_costs"] = json.dumps(row["detailed_costs"])
+        self.writer.writerow(row)
+
+
+class JsonLinesWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, result):
+        self.f.write(json.dumps(result) + "\n")
+
+
+def _progress(done, total, ok, started, final=False):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0.0
+    line = f"{done}/{total} rows"
+    if total:
+        line += f"  {done / total:6.1%}"
+    line += f"  {ok} ok  {done - ok} errors  {rate:,.0f} rows/s"
+    if total and rate and not final:
+        line += f"  eta {(total - done) / rate:,.0f}s"
+    print(f"\r{line}   ", end="\n" if final else "", file=sys.stderr, flush=True)
+
+
+# === Entry Point ===
+def run(input_path, output_path, workers=None, chunksize=DEFAULT_CHUNKSIZE, quiet=False):
+    total = count_rows(input_path)
+    started = time.perf_counter()
+    last_report = started
+    done = ok = 0
+
+    trace_file = os.environ.get("AFC_TRACE_FILE")
+    root = None
+    if trace_file:
+        tracing.configure_file_export(trace_file)
+        root = tracing.start_trace("batch_estimate", os.environ.get("AFC_TRACEPARENT"), sample_rate=1.0, input=input_path)
+    traceparent = root.traceparent if root is not None else None
+    items = ((index, row, traceparent) for index, row in enumerate(read_rows(input_path), start=1))
+
+    with tracing.activate(root), open(output_path, "w", newline="") as out, \
+            multiprocessing.Pool(workers or os.cpu_count(), initializer=_init_worker, initargs=(trace_file if root else None,)) as pool:
+        writer = JsonLinesWriter(out) if output_path.endswith((".jsonl", ".ndjson")) else CsvWriter(out)
+        # imap keeps input order and only pulls rows as workers free up
+        for result in pool.imap(estimate_row, items, chunksize=chunksize):
+            writer.write(result)
+            done += 1
+            ok += result["status"] == "ok"
+            now = time.perf_counter()
+            if not quiet and now - last_report >= PROGRESS_INTERVAL_SEC:
+                _progress(done, total, ok, started)
+                last_report = now
+
+    elapsed = time.perf_counter() - started
+    if not quiet:
+        _progress(done, total, ok, started, final=True)
+    return {
+        "rows": done,
+        "ok": ok,
+        "errors": done - ok,
+        "elapsed_sec": round(elapsed, 3),
+        "rows_per_sec": round(done / elapsed, 1) if elapsed else 0.0,
+        "workers": workers or os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate a file of fence jobs offline.")
+    parser.add_argument("input", help="CSV or .parquet file, one job per row")
+    parser.add_argument("output", help="results file (.csv, or .jsonl for full detail)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows handed to a worker at a time")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    stats = run(args.input, args.output, workers=args.workers, chunksize=args.chunksize, quiet=args.quiet)
+    print(json.dumps(stats), file=sys.stderr)
+    return 1 if stats["errors"] and not stats["ok"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
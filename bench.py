@@ -0,0 +1,308 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+
+import util
+
+
+# Benchmarks the calculation engine and the document endpoints on synthetic jobs:
+#   python bench.py                          full run, results to bench_results.json
+#   python bench.py --quick -o new.json      smaller grid
+#   python bench.py --compare old.json       also diff against an earlier run
+# Jobs cover every fence type / height / option combination that has pricing,
+# at each size in SIZES. Engine functions are timed directly; the PDF endpoints
+# go through an in-process TestClient so routing, validation and middleware
+# are included. --compare exits 1 when any median is more than --threshold
+# slower than the baseline.
+
+SIZES = (20, 100, 500, 2_000, 20_000)
+QUICK_SIZES = (100, 2_000)
+PRICING_STRATEGY = "Master Halco Pricing"
+DOCUMENT_ENDPOINTS = ("/generate_proposal", "/generate_materials_list", "/generate_job_spec_sheet", "/generate_internal_summary")
+MIN_SAMPLE_SEC = 0.005
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.20
+
+
+# === Synthetic Jobs ===
+def fence_variants():
+    # Built from the pricing tables so a newly priced height or style is benchmarked too
+    variants = []
+    for key in util.pricing_tables[PRICING_STRATEGY]:
+        if len(key) == 2:
+            height, top_rail = key
+            variants.append({"fence_type": "chain link", "height": int(height), "top_rail": top_rail})
+    for with_chain_link, table in ((False, util.VINYL_PRICING), (True, util.VINYL_CHAINLINK_PRICING)):
+        for height in table:
+            variants.append({"fence_type": "vinyl", "height": height, "with_chain_link": with_chain_link})
+    for style, height, bob in util.WOOD_PRICING:
+        variants.append({"fence_type": "wood", "style": style, "height": height, "bob": bob})
+    for height in util.SP_WROUGHT_IRON_PRICING:
+        variants.append({"fence_type": "sp wrought iron", "height": height})
+    return sorted(variants, key=case_name)
+
+
+def synthetic_jobs(sizes=SIZES, seed=0):
+    rng = random.Random(seed)
+    jobs = []
+    for variant in fence_variants():
+        for lf in sizes:
+            job = {**variant, "linear_feet": float(lf)}
+            if variant["fence_type"] in ("chain link", "vinyl"):
+                # Longer runs turn more corners
+                job["corner_posts"] = rng.randint(0, 2 + lf // 250)
+                job["end_posts"] = rng.randint(1, 2 + lf // 1000)
+            jobs.append(job)
+    return jobs
+
+
+def case_name(job):
+    parts = [job["fence_type"].replace(" ", "_"), f"h{job['height']}"]
+    if job.get("top_rail"):
+        parts.append("top_rail")
+    if job.get("with_chain_link"):
+        parts.append("with_chain_link")
+    if "style" in job:
+        parts.append(job["style"].replace(" ", "_"))
+    if job.get("bob"):
+        parts.append("bob")
+    if "linear_feet" in job:
+        parts.append(f"{int(job['linear_feet'])}ft")
+    return "/".join(parts)
+
+
+def materials_for(job):
+    return util.calculate_materials_router(
+        job["fence_type"],
+        lf=job["linear_feet"],
+        cp=job.get("corner_posts", 0),
+        ep=job.get("end_posts", 0),
+        height=job["height"],
+        top_rail=job.get("top_rail", False),
+        with_chain_link=job.get("with_chain_link", False),
+        style=job.get("style"),
+        bob=job.get("bob", False)
+    )
+
+
+# === Engine Benchmarks ===
+def _materials_call(job):
+    fence_type = job["fence_type"]
+    if fence_type == "chain link":
+        return "calculate_materials_chain_link", lambda: util.calculate_materials_chain_link(
+            job["linear_feet"], job["corner_posts"], job["end_posts"], job["height"], job["top_rail"])
+    if fence_type == "vinyl":
+        return "calculate_materials_vinyl", lambda: util.calculate_materials_vinyl(
+            job["linear_feet"], job["corner_posts"], job["end_posts"], job["height"], job["with_chain_link"])
+    if fence_type == "wood":
+        return "calculate_materials_wood", lambda: util.calculate_materials_wood(
+            job["linear_feet"], job["style"], bob=job["bob"], height=job["height"])
+    return "calculate_materials_sp_wrought_iron", lambda: util.calculate_materials_sp_wrought_iron(
+        job["linear_feet"], job["height"])
+
+
+def _material_costs_call(job, materials):
+    fence_type = job["fence_type"]
+    if fence_type == "chain link":
+        return "calculate_material_costs", lambda: util.calculate_material_costs(
+            materials, pricing_strategy=PRICING_STRATEGY, height=job["height"], top_rail=job["top_rail"], fence_type=fence_type)
+    if fence_type == "vinyl":
+        return "calculate_vinyl_material_costs", lambda: util.calculate_vinyl_material_costs(
+            materials, pricing_strategy=PRICING_STRATEGY, height=job["height"], with_chain_link=job["with_chain_link"])
+    if fence_type == "wood":
+        return "calculate_wood_material_costs", lambda: util.calculate_wood_material_costs(
+            materials, style=job["style"], height=job["height"], bob=job["bob"])
+    return "calculate_sp_wrought_iron_material_costs", lambda: util.calculate_sp_wrought_iron_material_costs(
+        materials, pricing_strategy=PRICING_STRATEGY, height=job["height"])
+
+
+def engine_calls(job):
+    materials = materials_for(job)
+    fence_details = {**job, "materials_needed": materials}
+    yield _materials_call(job)
+    yield _material_costs_call(job, materials)
+    yield "calculate_total_costs", lambda: util.calculate_total_costs(
+        fence_details=fence_details,
+        material_prices={},
+        pricing_strategy=PRICING_STRATEGY,
+        daily_rate=150.0,
+        num_employees=3,
+        dirt_complexity="soft",
+        grade_of_slope_complexity=0.0
+    )
+    yield "generate_labor_duration_options", lambda: util.generate_labor_duration_options(
+        job["linear_feet"], fence_type=job["fence_type"], soil="soft")
+
+
+def time_call(func, repeat):
+    # Per-call seconds for each of `repeat` samples; fast calls are looped
+    # until a sample is long enough to rise above timer noise
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_SAMPLE_SEC and number < 1_000_000:
+        number *= 10
+    return [t / number for t in timer.repeat(repeat, number)]
+
+
+def summarize(samples):
+    return {
+        "min_ms": round(min(samples) * 1000, 6),
+        "median_ms": round(statistics.median(samples) * 1000, 6),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 6),
+        "runs": len(samples),
+    }
+
+
+def bench_engine(jobs, repeat, results):
+    for job in jobs:
+        for name, func in engine_calls(job):
+            results.setdefault(name, {})[case_name(job)] = summarize(time_call(func, repeat))
+
+
+# === Document Endpoints ===
+def _create_job(client, job):
+    job_id = client.post("/new_bid/job_details", json={
+        "proposal_to": "Benchmark Client",
+        "phone": "555-0100",
+        "email": "bench@example.com",
+        "job_address": "100 Benchmark Way",
+        "job_name": case_name(job),
+    }).json()["job_id"]
+    for path, body in (
+        ("/new_bid/fence_details", {"job_id": job_id, **job}),
+        ("/new_bid/cost_estimation", {"job_id": job_id, "daily_rate": 150.0}),
+    ):
+        response = client.post(path, json=body)
+        if response.status_code != 200:
+            raise ValueError(f"{path} returned {response.status_code}: {response.text[:200]}")
+    return job_id
+
+
+def bench_documents(jobs, repeat, results, errors):
+    import app
+    import speculation
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app.app)
+    for job in jobs:
+        name = case_name(job)
+        try:
+            job_id = _create_job(client, job)
+        except ValueError as e:
+            errors.append({"case": name, "error": str(e)})
+            continue
+        # Time the render itself, not a speculative result already waiting
+        speculation.discard(job_id)
+        for endpoint in DOCUMENT_ENDPOINTS:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.post(endpoint, json={"job_id": job_id})
+                samples.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors.append({"case": name, "endpoint": endpoint, "error": f"{response.status_code}: {response.text[:200]}"})
+                    break
+            else:
+                results.setdefault(endpoint, {})[name] = summarize(samples)
+        for leftover in (f"materials_list_{job_id}.pdf", f"internal_summary_{job_id}.pdf"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        util.job_database.pop(job_id, None)
+
+
+# === Results ===
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    # Rows for every benchmark present in both runs, slowest change first
+    rows = []
+    for bench, cases in results.items():
+        for case, stats in cases.items():
+            before = baseline.get(bench, {}).get(case)
+            if before and before["median_ms"]:
+                change = stats["median_ms"] / before["median_ms"] - 1
+                rows.append((change, bench, case, before["median_ms"], stats["median_ms"]))
+    rows.sort(reverse=True)
+    regressions = [row for row in rows if row[0] > threshold]
+    return rows, regressions
+
+
+def print_summary(results):
+    for bench, cases in results.items():
+        medians = [stats["median_ms"] for stats in cases.values()]
+        print(f"{bench:45s} {len(cases):4d} cases  median {statistics.median(medians):10.4f} ms  max {max(medians):10.4f} ms",
+              file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the estimate engine and document endpoints.")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="samples per benchmark case")
+    parser.add_argument("--quick", action="store_true", help=f"only sizes {QUICK_SIZES}")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic job generator")
+    parser.add_argument("--skip-documents", action="store_true", help="engine functions only")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to diff against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown counted as a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    # Failing cases are recorded in the results; keep their warnings off the console
+    logging.disable(logging.WARNING)
+    jobs = synthetic_jobs(QUICK_SIZES if args.quick else SIZES, seed=args.seed)
+    results, errors = {}, []
+    started = time.perf_counter()
+    bench_engine(jobs, args.repeat, results)
+    if not args.skip_documents:
+        bench_documents(jobs, max(1, args.repeat // 2), results, errors)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "sizes": list(QUICK_SIZES if args.quick else SIZES),
+            "cases": len(jobs),
+            "elapsed_sec": round(time.perf_counter() - started, 3),
+        },
+        "results": results,
+        "errors": errors,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print_summary(results)
+    if errors:
+        print(f"{len(errors)} cases failed; see 'errors' in {args.output}", file=sys.stderr)
+
+    if not args.compare:
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)["results"]
+    rows, regressions = compare(results, baseline, args.threshold)
+    for change, bench, case, before, after in rows[:20]:
+        print(f"{change:+8.1%}  {bench:40s} {case:45s} {before:10.4f} -> {after:10.4f} ms", file=sys.stderr)
+    print(f"{len(regressions)} of {len(rows)} cases slower by more than {args.threshold:.0%}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
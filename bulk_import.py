@@ -0,0 +1,200 @@
+import asyncio
+import json
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+import capacity
+import util
+from models import JobDetails, CostEstimation, fence_detail_models
+
+
+# === Pipeline Limits ===
+# Records in flight are capped by the two queues, so memory stays flat no
+# matter how many lines the upload has.
+BULK_WORKERS = 4
+BULK_QUEUE_SIZE = 32
+MAX_LINE_BYTES = 64 * 1024
+
+
+def _error_message(e):
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+
+# === Single Record ===
+def _create_job(record):
+    details = JobDetails(**record.get("job", {}))
+    job_id, _ = util.save_job_details(
+        proposal_to=details.proposal_to,
+        phone=details.phone,
+        email=details.email,
+        job_address=details.job_address,
+        job_name=details.job_name,
+        notes=details.notes
+    )
+    return job_id
+
+
+def _save_fence(job_id, record):
+    details = {**record.get("fence", {}), "job_id": job_id}
+    fence_type = str(details.get("fence_type", "")).lower()
+    model = fence_detail_models.get(fence_type)
+    if model is None:
+        raise ValueError(f"Unsupported fence type: {fence_type}")
+    validated = model(**details)
+    materials = util.calculate_materials_router(
+        fence_type,
+        lf=validated.linear_feet,
+        cp=getattr(validated, "corner_posts", 0),
+        ep=getattr(validated, "end_posts", 0),
+        height=validated.height,
+        top_rail=getattr(validated, "top_rail", False),
+        with_chain_link=getattr(validated, "with_chain_link", False),
+        style=getattr(validated, "style", None),
+        bob=getattr(validated, "bob", False)
+    )
+
+    # Validated defaults (e.g. wood height) are stored so pricing sees them
+    fence_details = {**details, **validated.model_dump(), "materials_needed": materials}
+    util.job_database[job_id]["fence_details"] = fence_details
+    return fence_details
+
+
+def _price(job_id, fence_details, record):
+    data = CostEstimation(**{**record.get("pricing", {}), "job_id": job_id})
+    total_costs = util.calculate_total_costs(
+        fence_details=fence_details,
+        material_prices=data.material_prices,
+        pricing_strategy=data.pricing_strategy,
+        daily_rate=data.daily_rate,
+        num_employees=data.num_employees,
+        dirt_complexity=data.dirt_complexity,
+        grade_of_slope_complexity=data.grade_of_slope_complexity,
+        productivity=data.productivity
+    )
+    util.save_cost_estimate(job_id, total_costs, data.num_employees, {
+        "dirt_complexity": data.dirt_complexity,
+        "grade_of_slope_complexity": data.grade_of_slope_complexity,
+        "productivity": data.productivity,
+    }, {
+        "pricing_strategy": data.pricing_strategy,
+        "material_prices": data.material_prices,
+        "daily_rate": data.daily_rate,
+    })
+    capacity.record_estimate(job_id, total_costs)
+    return total_costs
+
+
+def import_record(line_number, line):
+    result = {"line": line_number, "job_id": None}
+    stage = "parse"
+    # A bad record becomes an error line; it never stops the rest of the upload
+    try:
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("Each line must be a JSON object")
+        stage = "job"
+        job_id = result["job_id"] = _create_job(record)
+        stage = "fence"
+        fence_details = _save_fence(job_id, record)
+        stage = "pricing"
+        total_costs = _price(job_id, fence_details, record)
+    except Exception as e:
+        result.update({"status": "error", "stage": stage, "error": _error_message(e)})
+        return result
+
+    result.update({
+        "status": "ok",
+        "material_total": total_costs["material_total"],
+        "material_tax": total_costs["material_tax"],
+        "delivery_charge": total_costs["delivery_charge"],
+        "labor_costs": total_costs["labor_costs"],
+        "total_cost": round(
+            total_costs["material_total"]
+            + total_costs["material_tax"]
+            + total_costs["delivery_charge"]
+            + total_costs["labor_costs"]["total_labor_cost"], 2
+        ),
+        "price_per_linear_foot": total_costs["price_per_linear_foot"],
+        "profit_margins": total_costs["profit_margins"],
+        "labor_duration_options": total_costs["labor_duration_options"],
+    })
+    return result
+
+
+# === Streaming ===
+async def ndjson_lines(chunks, max_line_bytes=MAX_LINE_BYTES):
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line = bytes(buffer[:newline])
+            del buffer[:newline + 1]
+            yield line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line exceeds {max_line_bytes} bytes")
+    if buffer:
+        yield bytes(buffer)
+
+
+async def stream_import(chunks, workers=BULK_WORKERS, queue_size=BULK_QUEUE_SIZE):
+    pending = asyncio.Queue(maxsize=queue_size)
+    results = asyncio.Queue(maxsize=queue_size)
+
+    async def read():
+        line_number = 0
+        try:
+            async for line in ndjson_lines(chunks):
+                line_number += 1
+                if line.strip():
+                    await pending.put((line_number, line))
+        except ValueError as e:
+            await results.put({"line": line_number + 1, "job_id": None, "status": "error", "stage": "parse", "error": str(e)})
+        finally:
+            for _ in range(workers):
+                await pending.put(None)
+
+    async def work():
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                await results.put(await run_in_threadpool(import_record, *item))
+        finally:
+            await results.put(None)
+
+    tasks = [asyncio.create_task(read())] + [asyncio.create_task(work()) for _ in range(workers)]
+    finished = 0
+    try:
+        # Results go out in completion order; "line" ties each back to its input
+        while finished < workers:
+            result = await results.get()
+            if result is None:
+                finished += 1
+                continue
+            yield json.dumps(result) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    # The upload is still being read while results stream back, so the base
+    # class's disconnect listener must not compete with it for receive()
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
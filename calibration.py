@@ -0,0 +1,103 @@
+import math
+import threading
+
+import numpy as np
+
+import util
+
+
+# === Labor Model ===
+# Install minutes per panel = exp(fence_type coefficient + soil coefficient).
+# The prior reproduces the original flat 106.25 min/panel for every fence type
+# and soil; each recorded actual nudges the coefficients with one recursive
+# least squares step in log space, so there is never a refit over history.
+DEFAULT_PANEL_INSTALL_TIME_MIN = 106.25
+
+FENCE_TYPES = ("chain link", "vinyl", "wood", "sp wrought iron")
+SOILS = ("soft", "hard", "core drill", "jack hammer")
+
+prior_variance = 0.25          # log-space; ~ +/-50% on a single coefficient
+observation_variance = 0.04
+forgetting_factor = 1.0        # < 1.0 lets old seasons fade out
+
+_features = [("fence_type", ft) for ft in FENCE_TYPES] + [("soil", soil) for soil in SOILS]
+_index = {feature: i for i, feature in enumerate(_features)}
+
+model = {
+    "theta": np.array([math.log(DEFAULT_PANEL_INSTALL_TIME_MIN)] * len(FENCE_TYPES) + [0.0] * len(SOILS)),
+    "P": np.eye(len(_features)) * prior_variance,
+    "observations": 0,
+}
+model_version = 0
+
+_model_lock = threading.Lock()
+
+
+def _normalize(value):
+    return str(value or "").strip().lower().replace("_", " ")
+
+
+def _feature_vector(fence_type, soil):
+    x = np.zeros(len(_features))
+    ft_index = _index.get(("fence_type", _normalize(fence_type)))
+    soil_index = _index.get(("soil", _normalize(soil)))
+    if ft_index is None:
+        return None
+    x[ft_index] = 1.0
+    if soil_index is not None:
+        x[soil_index] = 1.0
+    return x
+
+
+def install_time_minutes(fence_type=None, soil=None):
+    x = _feature_vector(fence_type, soil)
+    if x is None:
+        return DEFAULT_PANEL_INSTALL_TIME_MIN
+    return float(math.exp(x @ model["theta"]))
+
+
+# === Online Update ===
+def record_actual(fence_type, soil, linear_feet, actual_install_hours, complexity_multiplier=1.0, productivity=1.0):
+    global model_version
+
+    x = _feature_vector(fence_type, soil)
+    if x is None:
+        raise ValueError(f"Unsupported fence type: {fence_type}")
+    if not linear_feet or linear_feet <= 0 or actual_install_hours <= 0:
+        raise ValueError("linear_feet and actual_install_hours must be greater than 0")
+    if complexity_multiplier <= 0 or productivity <= 0:
+        raise ValueError("complexity_multiplier and productivity must be greater than 0")
+
+    panels = linear_feet / util.PANEL_LENGTH_FT
+    # Back out minutes per panel the crew actually achieved on this job
+    observed_minutes = actual_install_hours * 60.0 * productivity / (panels * complexity_multiplier)
+    y = math.log(observed_minutes)
+
+    with _model_lock:
+        predicted_minutes = install_time_minutes(fence_type, soil)
+        theta, P = model["theta"], model["P"]
+        Px = P @ x
+        gain = Px / (forgetting_factor * observation_variance + x @ Px)
+        model["theta"] = theta + gain * (y - x @ theta)
+        model["P"] = (P - np.outer(gain, Px)) / forgetting_factor
+        model["observations"] += 1
+        model_version += 1
+
+        return {
+            "model_version": model_version,
+            "observed_panel_install_time_min": round(observed_minutes, 2),
+            "previous_panel_install_time_min": round(predicted_minutes, 2),
+            "calibrated_panel_install_time_min": round(install_time_minutes(fence_type, soil), 2),
+        }
+
+
+def coefficients():
+    with _model_lock:
+        return {
+            "model_version": model_version,
+            "observations": model["observations"],
+            "panel_install_time_min": {
+                ft: {soil: round(install_time_minutes(ft, soil), 2) for soil in SOILS}
+                for ft in FENCE_TYPES
+            },
+        }
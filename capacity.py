@@ -0,0 +1,120 @@
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+import scheduler
+
+
+# === Running Totals ===
+# Each job's contribution is remembered so a re-estimate or reschedule only
+# subtracts the old numbers and adds the new ones; nothing rescans the backlog.
+totals = {
+    "estimated_jobs": 0,
+    "total_cost": 0.0,
+    "material_total": 0.0,
+    "revenue_by_margin": defaultdict(float),
+    "materials_on_order": defaultdict(float),    # accepted (scheduled) jobs only
+    "crew_days_by_week": defaultdict(int),
+}
+
+_cost_contributions = {}
+_schedule_contributions = {}
+_accepted = set()
+_capacity_lock = threading.Lock()
+
+
+def _apply(target, contribution, sign):
+    for key, value in contribution.items():
+        target[key] += sign * value
+        if abs(target[key]) < 1e-9:
+            del target[key]
+
+
+# === Estimates ===
+def cost_contribution(total_costs):
+    subtotal = (
+        total_costs["material_total"]
+        + total_costs["material_tax"]
+        + total_costs["delivery_charge"]
+        + total_costs["labor_costs"]["total_labor_cost"]
+    )
+    return {
+        "total_cost": subtotal,
+        "material_total": total_costs["material_total"],
+        "revenue_by_margin": {
+            label: margin["revenue"] for label, margin in total_costs.get("profit_margins", {}).items()
+        },
+        "materials_on_order": {
+            material: detail["order_size"] for material, detail in total_costs.get("detailed_costs", {}).items()
+        },
+    }
+
+
+def record_estimate(job_id, total_costs):
+    new = cost_contribution(total_costs)
+    with _capacity_lock:
+        old = _cost_contributions.pop(job_id, None)
+        if old is not None:
+            _remove_costs(job_id, old)
+        else:
+            totals["estimated_jobs"] += 1
+        totals["total_cost"] += new["total_cost"]
+        totals["material_total"] += new["material_total"]
+        _apply(totals["revenue_by_margin"], new["revenue_by_margin"], 1)
+        if job_id in _accepted:
+            _apply(totals["materials_on_order"], new["materials_on_order"], 1)
+        _cost_contributions[job_id] = new
+
+
+def _remove_costs(job_id, old):
+    totals["total_cost"] -= old["total_cost"]
+    totals["material_total"] -= old["material_total"]
+    _apply(totals["revenue_by_margin"], old["revenue_by_margin"], -1)
+    if job_id in _accepted:
+        _apply(totals["materials_on_order"], old["materials_on_order"], -1)
+
+
+# === Schedule ===
+def record_assignment(job_id, assignment, working_date):
+    # Crew-days bucketed by the Monday of each working day's week
+    weeks = defaultdict(int)
+    if assignment is not None:
+        for day in range(assignment["start_day"], assignment["end_day"]):
+            worked = working_date(day)
+            weeks[(worked - timedelta(days=worked.weekday())).isoformat()] += 1
+
+    with _capacity_lock:
+        old = _schedule_contributions.pop(job_id, None)
+        if old is not None:
+            _apply(totals["crew_days_by_week"], old, -1)
+        if weeks:
+            _apply(totals["crew_days_by_week"], weeks, 1)
+            _schedule_contributions[job_id] = dict(weeks)
+
+        # Materials are only on order once a job is accepted onto the schedule
+        costs = _cost_contributions.get(job_id)
+        if assignment is not None and job_id not in _accepted:
+            _accepted.add(job_id)
+            if costs is not None:
+                _apply(totals["materials_on_order"], costs["materials_on_order"], 1)
+        elif assignment is None and job_id in _accepted:
+            _accepted.discard(job_id)
+            if costs is not None:
+                _apply(totals["materials_on_order"], costs["materials_on_order"], -1)
+
+
+# === Dashboard ===
+def capacity_report():
+    with _capacity_lock:
+        return {
+            "estimated_jobs": totals["estimated_jobs"],
+            "scheduled_jobs": len(_accepted),
+            "total_cost": round(totals["total_cost"], 2),
+            "material_total": round(totals["material_total"], 2),
+            "revenue_by_margin": {k: round(v, 2) for k, v in sorted(totals["revenue_by_margin"].items())},
+            "materials_on_order": {k: round(v, 2) for k, v in sorted(totals["materials_on_order"].items())},
+            "crew_days_by_week": dict(sorted(totals["crew_days_by_week"].items())),
+        }
+
+
+scheduler.assignment_listeners.append(record_assignment)
@@ -0,0 +1,165 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from urllib.parse import parse_qsl
+
+
+# === Traffic Capture ===
+# With AFC_CAPTURE_FILE set, every request/response pair is appended to that
+# file as one JSON line for replay.py to play back against another instance.
+# Captures are sanitized on the way out: customer contact fields are replaced,
+# only an allowlist of headers is kept, and non-JSON bodies (PDFs, CSV
+# uploads) are reduced to their size. Admin and /metrics traffic is skipped.
+MAX_CAPTURED_BODY = 1_000_000
+KEPT_HEADERS = ("content-type", "accept", "idempotency-key")
+REDACTED_FIELDS = ("proposal_to", "phone", "email", "job_address", "job_name", "notes")
+SKIPPED_PREFIXES = ("/admin/", "/metrics")
+
+capture_stats = {"captured": 0, "truncated": 0}
+
+_records = None
+_started = time.time()
+_path = None
+
+
+def _write_records(path, records):
+    with open(path, "a", buffering=1) as f:
+        while True:
+            record = records.get()
+            if record is None:
+                return
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def configure(path=None):
+    global _records, _path
+    path = path or os.environ.get("AFC_CAPTURE_FILE")
+    if not path or _records is not None:
+        return
+    _records = queue.SimpleQueue()
+    _path = path
+    _start_writer()
+
+
+def _start_writer():
+    records = _records
+    writer = threading.Thread(target=_write_records, args=(_path, records), name="traffic-capture", daemon=True)
+    writer.start()
+
+    def flush():
+        records.put(None)
+        writer.join(timeout=2)
+    atexit.register(flush)
+
+
+def _restart_after_fork():
+    # Each gunicorn worker appends through a writer thread of its own
+    global _records
+    if _records is not None:
+        _records = queue.SimpleQueue()
+        _start_writer()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def sanitize(value):
+    if isinstance(value, dict):
+        return {
+            k: ("redacted" if k in REDACTED_FIELDS and isinstance(v, str) and v else sanitize(v))
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [sanitize(v) for v in value]
+    return value
+
+
+def _body(chunks, size, content_type):
+    # Parsed JSON, or just the size for anything else
+    if size > MAX_CAPTURED_BODY:
+        capture_stats["truncated"] += 1
+        return None, {"bytes": size, "content_type": content_type, "truncated": True}
+    raw = b"".join(chunks)
+    if raw and content_type.startswith("application/json"):
+        try:
+            return json.loads(raw), None
+        except ValueError:
+            pass
+    return None, ({"bytes": len(raw), "content_type": content_type} if raw else None)
+
+
+def _job_id(query, request_json, response_json):
+    for source in (request_json, query, response_json):
+        if isinstance(source, dict) and isinstance(source.get("job_id"), str):
+            return source["job_id"]
+    return None
+
+
+def capture_report():
+    return {**capture_stats, "file": _path, "enabled": _records is not None}
+
+
+# === ASGI Middleware ===
+class CaptureMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _records is None or scope["type"] != "http" or scope["path"].startswith(SKIPPED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.time()
+        request = {"chunks": [], "size": 0}
+        response = {"status": 500, "headers": {}, "chunks": [], "size": 0}
+
+        async def receive_and_record():
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                request["size"] += len(body)
+                # Streamed uploads (bulk import) aren't held in memory past the cap
+                if request["size"] <= MAX_CAPTURED_BODY:
+                    request["chunks"].append(body)
+            return message
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                response["size"] += len(body)
+                if response["size"] <= MAX_CAPTURED_BODY:
+                    response["chunks"].append(body)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_record, send_and_record)
+        finally:
+            headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+            query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+            request_json, request_body = _body(request["chunks"], request["size"], headers.get("content-type", ""))
+            response_json, response_body = _body(
+                response["chunks"], response["size"], response["headers"].get("content-type", ""))
+            route = scope.get("route")
+            _records.put({
+                "at": round(started, 6),
+                "offset_sec": round(started - _started, 6),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "query": sanitize(query),
+                "headers": {k: headers[k] for k in KEPT_HEADERS if k in headers},
+                "json": sanitize(request_json),
+                "body": request_body,
+                "job_id": _job_id(query, request_json, response_json),
+                "status": response["status"],
+                "response_json": sanitize(response_json),
+                "response_body": response_body,
+                "duration_ms": round((time.time() - started) * 1000, 3),
+            })
+            capture_stats["captured"] += 1
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Startup budget check for cold starts:
+#   python check_startup.py                   fails (exit 1) when over budget
+#   python check_startup.py --runs 5 --json   median of 5 fresh interpreters
+# Each run imports app in a new interpreter, confirms the PDF stack was left
+# for later, then times the first "/" and the first estimate (job details ->
+# fence details -> cost estimation) through an in-process TestClient.
+
+IMPORT_BUDGET_MS = 900
+FIRST_ESTIMATE_BUDGET_MS = 400
+DEFERRED_MODULES = ("reportlab", "pypdf", "documents")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+loaded_early = [m for m in %(deferred)r if m in sys.modules]
+
+from fastapi.testclient import TestClient
+client = TestClient(app.app)
+client.get("/")
+first_response = time.perf_counter()
+
+job_id = client.post("/new_bid/job_details", json={
+    "proposal_to": "Startup Check", "phone": "0", "email": "-", "job_address": "-", "job_name": "-",
+}).json()["job_id"]
+client.post("/new_bid/fence_details", json={
+    "job_id": job_id, "fence_type": "chain link", "linear_feet": 150,
+    "corner_posts": 2, "end_posts": 2, "height": 6, "top_rail": True,
+})
+status = client.post("/new_bid/cost_estimation", json={"job_id": job_id}).status_code
+first_estimate = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (first_response - imported) * 1000,
+    "first_estimate_ms": (first_estimate - first_response) * 1000,
+    "estimate_status": status,
+    "loaded_at_import": loaded_early,
+}))
+"""
+
+
+def probe():
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE % {"deferred": DEFERRED_MODULES}],
+        capture_output=True, text=True, env={"AFC_LOG_LEVEL": "ERROR", **os.environ}
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"startup probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check app import time and time to first estimate against budgets.")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to sample (median is checked)")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--estimate-budget-ms", type=float, default=FIRST_ESTIMATE_BUDGET_MS)
+    parser.add_argument("--json", action="store_true", help="print the measurements as JSON")
+    args = parser.parse_args(argv)
+
+    runs = [probe() for _ in range(args.runs)]
+    summary = {
+        key: round(statistics.median(run[key] for run in runs), 1)
+        for key in ("import_ms", "first_response_ms", "first_estimate_ms")
+    }
+    loaded_early = sorted({m for run in runs for m in run["loaded_at_import"]})
+    failures = []
+    if summary["import_ms"] > args.import_budget_ms:
+        failures.append(f"import took {summary['import_ms']}ms (budget {args.import_budget_ms:g}ms)")
+    if summary["first_estimate_ms"] > args.estimate_budget_ms:
+        failures.append(f"first estimate took {summary['first_estimate_ms']}ms (budget {args.estimate_budget_ms:g}ms)")
+    if loaded_early:
+        failures.append(f"loaded at import time: {', '.join(loaded_early)}")
+    if any(run["estimate_status"] != 200 for run in runs):
+        failures.append("cost estimation did not return 200")
+
+    if args.json:
+        print(json.dumps({**summary, "runs": runs, "failures": failures}, indent=2))
+    else:
+        print(", ".join(f"{k} {v}" for k, v in summary.items()))
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+
+
+# === Single-Flight Coalescing ===
+# Identical requests that arrive while one is already being computed wait on
+# that computation and share its result (or its exception) instead of
+# repeating the work.
+coalescing_stats = defaultdict(lambda: {"executed": 0, "coalesced": 0})
+
+_in_flight = {}
+_coalescing_lock = threading.Lock()
+
+
+def request_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def single_flight(kind, key, compute):
+    with _coalescing_lock:
+        call = _in_flight.get((kind, key))
+        leader = call is None
+        if leader:
+            call = _in_flight[(kind, key)] = Future()
+            coalescing_stats[kind]["executed"] += 1
+        else:
+            coalescing_stats[kind]["coalesced"] += 1
+
+    if not leader:
+        return call.result()
+
+    try:
+        result = compute()
+    except BaseException as e:
+        call.set_exception(e)
+        raise
+    else:
+        call.set_result(result)
+        return result
+    finally:
+        with _coalescing_lock:
+            del _in_flight[(kind, key)]
+
+
+def coalescing_report():
+    with _coalescing_lock:
+        in_flight = defaultdict(int)
+        for kind, _ in _in_flight:
+            in_flight[kind] += 1
+        return {
+            kind: {**counts, "in_flight": in_flight.get(kind, 0)}
+            for kind, counts in sorted(coalescing_stats.items())
+        }
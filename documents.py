@@ -0,0 +1,523 @@
+import os
+from datetime import datetime
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, Frame, Table, TableStyle
+
+import metrics
+import tracing
+import util
+
+
+# === Document Rendering ===
+# Everything that needs ReportLab or pypdf. Importing those takes a good part
+# of app startup, so app.py only loads this module on first use (or from a
+# background thread once the server is up) instead of at import time.
+# Each renderer returns the finished PDF as bytes.
+# Templates ship next to this module, so they resolve whatever the cwd is
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_PATH = os.path.join(ASSET_DIR, "american-fence-concepts-logo_sm.webp")
+PROPOSAL_PAGE_TWO = os.path.join(ASSET_DIR, "afc-pro-pg2.pdf")
+DOCUMENT_FONTS = ("Helvetica", "Helvetica-Bold")
+
+_assets = {}
+_logo = None
+
+
+# === Template Assets ===
+# Read once and kept for the life of the process (restart to pick up a new
+# template). In preload mode the gunicorn master loads them before forking, so
+# every worker shares the same pages copy-on-write.
+def asset_bytes(path):
+    data = _assets.get(path)
+    if data is None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Document template not found: {path}")
+        with open(path, "rb") as f:
+            data = _assets.setdefault(path, f.read())
+    return data
+
+
+def _logo_reader():
+    global _logo
+    if _logo is None and os.path.exists(LOGO_PATH):  # the logo is optional
+        reader = ImageReader(BytesIO(asset_bytes(LOGO_PATH)))
+        reader.getRGBData()  # decode now; afterwards the reader is only read
+        _logo = reader
+    return _logo
+
+
+def preload_assets():
+    asset_bytes(PROPOSAL_PAGE_TWO)
+    _logo_reader()
+    for font in DOCUMENT_FONTS:
+        pdfmetrics.getFont(font)  # parses the font's width tables
+    getSampleStyleSheet()
+
+
+@tracing.traced
+def render_proposal_pdf(job_id):
+    clock = metrics.StageClock()
+    job = util.job_database[job_id]
+    first_name = job.get("proposal_to", "").split()[0] if job.get("proposal_to") else "Client"
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    # === Logo ===
+    clock.lap("pdf_layout")
+    logo = _logo_reader()
+    if logo is not None:
+        logo_width = 180
+        c.drawImage(logo, (width - logo_width) / 2, height - 100, width=logo_width, preserveAspectRatio=True, mask='auto')
+    clock.lap("pdf_asset_load")
+
+    # === Company Info ===
+    c.setFont("Helvetica", 10)
+    c.drawCentredString(width / 2, height - 110, "2383 Via Rancheros, Fallbrook, CA 92028")
+    c.drawCentredString(width / 2, height - 123, "www.americanfenceconcepts.com")
+    c.drawCentredString(width / 2, height - 135, "CA LIC #1037833")
+
+    # === Contact Info ===
+    c.setFont("Helvetica", 11)
+    contact_text = """Jon Keys
+760-877-9951
+j.keys@americanfenceconcepts.com
+
+Beau Postal
+949-259-8868
+bpostal@americanfenceconcepts.com"""
+    contact_obj = c.beginText(50, height - 200)
+    for line in contact_text.splitlines():
+        contact_obj.textLine(line)
+    c.drawText(contact_obj)
+
+    # === Greeting Paragraph ===
+    styles = getSampleStyleSheet()
+    style = styles["Normal"]
+    style.fontName = "Helvetica"
+    style.fontSize = 12
+    style.leading = 16
+
+    greeting_paragraph = Paragraph(
+        f"{first_name},<br/><br/>"
+        "American Fence Concepts appreciates the opportunity to offer the following proposal. "
+        "We agree to perform the below stated work and hereby agrees to fabricate, furnish, and install "
+        "the described work in a professional and timely work like manner. We look forward to doing business with you.",
+        style
+    )
+
+    frame = Frame(
+        x1=50,
+        y1=height - 560,
+        width=width - 100,
+        height=140,
+        showBoundary=0
+    )
+    frame.addFromList([greeting_paragraph], c)
+
+
+
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    clock.lap("pdf_layout")
+
+    # PdfReader keeps a read position, so each render parses its own copy
+    second_page = PdfReader(BytesIO(asset_bytes(PROPOSAL_PAGE_TWO)))
+    clock.lap("pdf_asset_load")
+
+    writer = PdfWriter()
+    writer.append(PdfReader(buffer))  # First page
+    writer.append(second_page)  # Second page
+    clock.lap("pdf_merge")
+
+    output = BytesIO()
+    writer.write(output)
+    clock.lap("pdf_write")
+    clock.finish()
+    return output.getvalue()
+
+
+def render_materials_list_pdf(materials):
+    clock = metrics.StageClock()
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, height - 50, "📦 Materials List")
+
+    c.setFont("Helvetica-Bold", 12)
+    y = height - 80
+    c.drawString(50, y, "Material")
+    c.drawString(250, y, "Quantity")
+    y -= 20
+
+    c.setFont("Helvetica", 11)
+    for material, quantity in materials.items():
+        c.drawString(50, y, material)
+        c.drawString(250, y, str(quantity))
+        y -= 18
+        if y < 50:
+            c.showPage()
+            y = height - 50
+
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    clock.lap("pdf_layout")
+    clock.finish()
+    return buffer.getvalue()
+
+
+@tracing.traced
+def render_job_spec_sheet_pdf(job_id):
+    clock = metrics.StageClock()
+    job = util.job_database[job_id]
+    fence_details = job.get("fence_details", {})
+
+    # ─── Recalculate material costs with correct function per fence type ───
+    raw_materials = fence_details.get("materials_needed", {})
+    fence_type = fence_details.get("fence_type", "").strip().lower()
+    with_chain_link = fence_details.get("with_chain_link", False)
+    height = fence_details.get("height")
+    top_rail = fence_details.get("top_rail", False)
+    style = fence_details.get("style")
+    bob = fence_details.get("bob", False)
+
+    if fence_type == "vinyl":
+        detailed_costs, _ = util.calculate_vinyl_material_costs(
+            raw_materials,
+            custom_prices={},
+            pricing_strategy="Master Halco Pricing",
+            height=height,
+            top_rail=top_rail,
+            with_chain_link=with_chain_link
+        )
+    elif fence_type == "wood":
+        detailed_costs, _ = util.calculate_wood_material_costs(
+            raw_materials,
+            custom_prices={},
+            style=style,
+            height=height,
+            bob=bob
+        )
+    elif fence_type == "sp wrought iron":
+        detailed_costs, _ = util.calculate_sp_wrought_iron_material_costs(
+            raw_materials,
+            custom_prices={},
+            pricing_strategy="Master Halco Pricing",
+            height=height,
+            top_rail=top_rail
+        )
+    else:
+        detailed_costs, _ = util.calculate_material_costs(
+            raw_materials,
+            {},
+            "Master Halco Pricing",
+            height,
+            top_rail,
+            fence_type=fence_type,
+            style=style,
+            bob=bob
+        )
+    materials_needed = detailed_costs
+    clock.lap("pricing")
+
+    proposal_to = job.get("proposal_to", "Client")
+    job_address = job.get("job_address", "Unknown Address")
+    fence_type_label = fence_details.get("fence_type", "Unknown Type")
+    display_height = fence_details.get("height", "N/A")
+    notes = job.get("notes", "")
+    today = datetime.today().strftime("%m/%d/%y")
+
+    # === Create PDF ===
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height_pt = letter
+    x_margin = 50
+    y = height_pt - 72  # 1 inch
+
+    # Header
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x_margin, y, "American Fence Concepts")
+    y -= 20
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x_margin, y, "Job Specification Sheet")
+    y -= 29
+
+    c.setFont("Helvetica", 10)
+    c.drawString(x_margin, y, f"Project Name: {proposal_to} - {fence_type_label.title()} Fence")
+    y -= 14
+    c.drawString(x_margin, y, f"Client: {proposal_to}")
+    y -= 14
+    c.drawString(x_margin, y, f"Date: {today}")
+    y -= 14
+    c.drawString(x_margin, y, f"Address: {job_address}")
+    y -= 20
+
+    # Job Scope
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x_margin, y, "Job Scope:")
+    y -= 14
+    c.setFont("Helvetica", 11)
+    c.drawString(x_margin + 20, y, f"- {display_height}' High {fence_type_label.title()}")
+    y -= 14
+    if top_rail:
+        c.drawString(x_margin + 20, y, "- Top Rail")
+        y -= 14
+
+    # Materials Table
+    y -= 20
+    table_data = [["Material", "Quantity", "Unit Size", "Order Size"]]
+    for material, details in materials_needed.items():
+        label = material.replace("_", " ").title()
+        quantity  = round(details.get("quantity", 0))
+        unit_size = details.get("unit_size", 1)
+        order_size= round(details.get("order_size", 0))
+        table_data.append([label, quantity, unit_size, order_size])
+
+    table = Table(table_data, colWidths=[180, 80, 80, 80])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
+        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 0), (-1, -1), 10),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ]))
+
+    bottom_margin = 50
+    available_width = width - 2 * x_margin
+    available_height = y - bottom_margin
+    table_w, table_h = table.wrap(available_width, available_height)
+
+    if table_h > available_height:
+        c.showPage()
+        y = height_pt - 72
+
+    table.drawOn(c, x_margin, y - table_h)
+    y -= table_h + 20
+
+    # Notes Section
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x_margin, y, "Notes:")
+    y -= 16
+    c.setFont("Helvetica", 11)
+
+    if notes.strip():
+        from reportlab.lib.utils import simpleSplit
+        max_note_width = width - x_margin * 2 - 30  # 30 to account for dash & indent
+        # Split notes into paragraphs by newline
+        paragraphs = [p.strip() for p in notes.strip().split('\n') if p.strip()]
+        for para in paragraphs:
+            # Wrap the paragraph to fit within the width
+            wrapped_lines = simpleSplit(para, "Helvetica", 11, max_note_width)
+            for i, line in enumerate(wrapped_lines):
+                if y <= bottom_margin:
+                    c.showPage()
+                    y = height_pt - 72
+                    c.setFont("Helvetica-Bold", 12)
+                    c.drawString(x_margin, y, "Notes (cont'd):")
+                    y -= 16
+                    c.setFont("Helvetica", 11)
+                # Only put the dash on the first line of each bullet point
+                prefix = "- " if i == 0 else "  "
+                c.drawString(x_margin + 20, y, prefix + line)
+                y -= 14
+            y -= 2  # Slight extra space between bullets
+    clock.lap("pdf_layout")
+
+    c.save()
+    clock.lap("pdf_write")
+    clock.finish()
+    return buffer.getvalue()
+
+
+def render_internal_summary_pdf(job_id, data):
+    job = util.job_database[job_id]
+    fence_details = job.get("fence_details", {})
+    proposal_to = job.get("proposal_to", "Client")
+    linear_feet = fence_details.get("linear_feet", 0)
+    height_value = fence_details.get("height", "N/A")
+
+    costs = job.get("costs", {})
+    material_total = costs.get("material_total", 0)
+    material_tax = costs.get("material_tax", 0)
+    delivery_charge = costs.get("delivery_charge", 0)
+    labor_info = costs.get("labor_costs", {})
+
+    daily_rate = data.daily_rate or labor_info.get("daily_rate") or 0
+    num_workers = data.crew_size or labor_info.get("crew_size") or 0
+    estimated_days = data.estimated_days if data.estimated_days is not None else job.get("estimated_days", "N/A")
+    additional_days = data.additional_days or 0
+
+    total_labor = labor_info.get("total_labor_cost", 0)
+    total_cost = material_total + material_tax + delivery_charge + total_labor
+    price_per_lf = total_cost / linear_feet if linear_feet else 0
+
+    def margin_calc(margin_pct):
+        revenue = total_cost / (1 - margin_pct)
+        profit = revenue - total_cost
+        return revenue, profit, revenue / linear_feet if linear_feet else 0
+
+    default_margins = {
+        "20%": 0.20,
+        "30%": 0.30,
+        "40%": 0.40,
+        "50%": 0.50,
+    }
+
+    selected_margin_pct = data.custom_margin
+    highlight_label = None
+
+    if selected_margin_pct is not None:
+        highlight_label = f"{int(selected_margin_pct * 100)}%"
+        if highlight_label not in default_margins:
+            default_margins[highlight_label] = selected_margin_pct
+
+    margins = {label: margin_calc(pct) for label, pct in default_margins.items()}
+
+    clock = metrics.StageClock()
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    page_width, page_height = letter
+    x = 50
+    y = page_height - 50
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x, y, "Internal Job Summary")
+    y -= 25
+
+    c.setFont("Helvetica", 11)
+    c.drawString(x, y, f"Job ID: {job_id}")
+    y -= 15
+    c.drawString(x, y, f"Client: {proposal_to}")
+    y -= 15
+    c.drawString(x, y, f"Fence Type: {fence_details.get('fence_type', '')} - {height_value}'")
+    y -= 15
+    c.drawString(x, y, f"Date: {datetime.now().strftime('%m/%d/%y')}")
+    y -= 25
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x, y, "Cost Breakdown:")
+    y -= 18
+    c.setFont("Helvetica", 11)
+    c.drawString(x, y, f"Material Cost: ${material_total:,.2f}")
+    y -= 16
+    c.drawString(x, y, f"Material Tax: ${material_tax:,.2f}")
+    y -= 16
+    c.drawString(x, y, f"Delivery Charge: ${delivery_charge:,.2f}")
+    y -= 16
+    c.drawString(x, y, f"Day Rate (per worker): ${daily_rate:,.2f}")
+    y -= 16
+    c.drawString(x, y, f"Workers: {num_workers}")
+    y -= 16
+    c.drawString(x, y, f"Total Labor Cost: ${total_labor:,.2f}")
+    y -= 16
+
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x, y, f"Total Job Cost: ${total_cost:,.2f}")
+    y -= 25
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x, y, "Production Info:")
+    y -= 18
+    c.setFont("Helvetica", 11)
+    c.drawString(x, y, f"Estimated Production Time: {estimated_days} days")
+    y -= 16
+    c.drawString(x, y, f"Additional Labor Days: {additional_days}")
+    y -= 16
+    c.drawString(x, y, f"Number of Workers: {num_workers}")
+    y -= 16
+    c.drawString(x, y, f"Cost Per Linear Foot: ${price_per_lf:,.2f}")
+    y -= 25
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x, y, "Margin Projections:")
+    y -= 18
+
+    header_labels = list(margins.keys())
+    header_row = ["Metric"] + header_labels
+    revenue_row = ["Revenue"] + [f"${margins[label][0]:,.2f}" for label in header_labels]
+    profit_row = ["Profit"] + [f"${margins[label][1]:,.2f}" for label in header_labels]
+    price_row = ["Price/LF"] + [f"${margins[label][2]:,.2f}" for label in header_labels]
+
+    table_data_margins = [header_row, revenue_row, profit_row, price_row]
+
+    table_margins = Table(table_data_margins, colWidths=[100] + [80] * len(header_labels))
+
+    margin_table_style = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
+        ("ALIGN", (1, 0), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 0), (-1, -1), 10),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ]
+
+    if highlight_label and highlight_label in header_labels:
+        col_index = header_labels.index(highlight_label) + 1
+        margin_table_style.append(
+            ("BACKGROUND", (col_index, 0), (col_index, -1), colors.lightblue)
+        )
+
+    table_margins.setStyle(TableStyle(margin_table_style))
+
+    available_width = page_width - (2 * x)
+    _, table_margin_h = table_margins.wrap(available_width, y)
+    if table_margin_h + 50 > y:
+        c.showPage()
+        y = page_height - 50
+
+    table_margins.drawOn(c, x, y - table_margin_h)
+    y -= table_margin_h + 20
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x, y, "Materials:")
+    y -= 15
+
+    materials = fence_details.get("materials_needed", {})
+    table_data = [["Material", "Quantity"]]
+    for material, details in materials.items():
+        label = material.replace("_", " ").title()
+        qty = round(details.get("quantity", 0)) if isinstance(details, dict) else round(details)
+        table_data.append([label, qty])
+
+    table = Table(table_data, colWidths=[200, 100])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
+        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 0), (-1, -1), 10),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ]))
+
+    table_width, table_height = table.wrap(available_width, y)
+    if table_height + 50 > y:
+        c.showPage()
+        y = page_height - 50
+
+    table.drawOn(c, x, y - table_height)
+    y -= table_height + 20
+
+    c.save()
+    clock.lap("pdf_layout")
+    clock.finish()
+    return buffer.getvalue()
@@ -0,0 +1,109 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import coalescing
+import speculation
+import util
+
+
+# === Cost Estimate Response Cache ===
+# Keyed by (job state fingerprint, normalized request body). The fingerprint
+# already folds in the catalog version, labor model version and date, so any
+# change that could move the numbers lands on a new key.
+ESTIMATE_CACHE_SIZE = 1024
+IDEMPOTENCY_KEYS_KEPT = 4096
+IDEMPOTENCY_TTL_SEC = 24 * 60 * 60
+
+estimate_cache_stats = {"hits": 0, "misses": 0, "replays": 0, "key_conflicts": 0}
+
+_estimates = OrderedDict()
+_idempotency = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def estimate_key(body):
+    return coalescing.request_key(body, speculation.fingerprint(body["job_id"]))
+
+
+def get(key):
+    with _cache_lock:
+        entry = _estimates.get(key)
+        if entry is None:
+            estimate_cache_stats["misses"] += 1
+            return None
+        _estimates.move_to_end(key)
+        estimate_cache_stats["hits"] += 1
+        return entry
+
+
+def put(key, job_id, total_costs, response):
+    entry = {
+        "job_id": job_id,
+        "total_costs": copy.deepcopy(total_costs),
+        "response": copy.deepcopy(response),
+        "persisted": util.job_database[job_id].get("costs"),
+    }
+    with _cache_lock:
+        _estimates[key] = entry
+        while len(_estimates) > ESTIMATE_CACHE_SIZE:
+            _estimates.popitem(last=False)
+    return entry
+
+
+def is_current(entry):
+    # False once another estimate or a reprice has replaced the job's saved costs
+    job = util.job_database.get(entry["job_id"])
+    return job is not None and job.get("costs") is entry["persisted"]
+
+
+def mark_persisted(entry):
+    entry["persisted"] = util.job_database[entry["job_id"]].get("costs")
+
+
+def clear(*_):
+    with _cache_lock:
+        _estimates.clear()
+
+
+# === Idempotency Keys ===
+# A retried request carrying the same Idempotency-Key gets the original
+# response back, even if the job has changed since. Keys are scoped to the
+# route and job, so two clients that happen to pick the same key for
+# different jobs don't collide.
+def _scoped(route, idempotency_key, body):
+    return (route, body.get("job_id"), idempotency_key)
+
+
+def replay(route, idempotency_key, body):
+    body_hash = coalescing.request_key(body)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _idempotency.get(_scoped(route, idempotency_key, body))
+        if entry is None or now - entry["at"] > IDEMPOTENCY_TTL_SEC:
+            return None
+        if entry["body_hash"] != body_hash:
+            estimate_cache_stats["key_conflicts"] += 1
+            raise ValueError("Idempotency-Key was already used with a different request body")
+        estimate_cache_stats["replays"] += 1
+        return entry["response"]
+
+
+def remember(route, idempotency_key, body, response):
+    with _cache_lock:
+        _idempotency[_scoped(route, idempotency_key, body)] = {
+            "body_hash": coalescing.request_key(body),
+            "response": response,
+            "at": time.monotonic(),
+        }
+        while len(_idempotency) > IDEMPOTENCY_KEYS_KEPT:
+            _idempotency.popitem(last=False)
+
+
+def estimate_cache_report():
+    with _cache_lock:
+        return {**estimate_cache_stats, "cached_estimates": len(_estimates), "idempotency_keys": len(_idempotency)}
+
+
+util.register_catalog_listener(clear)
@@ -0,0 +1,32 @@
+import gc
+import os
+
+
+# Preforked serving: gunicorn -c gunicorn.conf.py app:app
+# The app is imported once in the master (preload_app), which also compiles
+# the takeoff definitions, builds the price curves and loads the PDF stack,
+# template pages, logo and font metrics before any worker is forked. Workers
+# share those pages copy-on-write, so adding workers adds little memory and a
+# respawned worker is serving as soon as it forks.
+#
+# Jobs live in each worker's own memory (util.job_database), so with more than
+# one worker a job's requests must reach the same worker (sticky sessions) or
+# later steps answer 404. WEB_CONCURRENCY therefore defaults to 1.
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    import app
+    app.warm_shared_state()
+    # Park everything loaded so far in the permanent generation; otherwise
+    # the first collection in each worker touches (and so copies) every
+    # shared page the collector walks
+    gc.collect()
+    gc.freeze()
+    server.log.info("preloaded shared state; %d objects frozen", gc.get_freeze_count())
@@ -0,0 +1,119 @@
+import numpy as np
+
+import calibration
+import util
+
+
+# === Planning Bounds ===
+# Crew and shift limits the estimator may choose from. The daily rate is quoted
+# for a standard shift, longer shifts are paid pro rata.
+labor_planning_bounds = {
+    "min_crew_size": 3,
+    "max_crew_size": 15,
+    "min_shift_hours": util.WORK_HOURS_PER_DAY,
+    "max_shift_hours": 10.0,
+    "shift_step_hours": 1.0,
+    "standard_shift_hours": util.WORK_HOURS_PER_DAY,
+}
+
+
+def shift_options(min_shift_hours, max_shift_hours, shift_step_hours):
+    if min_shift_hours <= 0 or max_shift_hours < min_shift_hours:
+        raise ValueError("Shift bounds must satisfy 0 < min_shift_hours <= max_shift_hours")
+    if shift_step_hours <= 0:
+        raise ValueError("shift_step_hours must be greater than 0")
+    return np.arange(min_shift_hours, max_shift_hours + shift_step_hours / 2, shift_step_hours)
+
+
+# === Vectorized Crew x Shift Grid ===
+def labor_grid(adjusted_hours, crew_sizes, shift_hours, whole_days=True):
+    crews, shifts = np.meshgrid(
+        np.asarray(crew_sizes, dtype=float),
+        np.asarray(shift_hours, dtype=float),
+        indexing="ij"
+    )
+    days = adjusted_hours / (crews * shifts)
+    billed_days = np.ceil(np.round(days, 9)) if whole_days else days
+    return crews, shifts, days, billed_days
+
+
+def pareto_front(days, costs):
+    # Fewest calendar days first; keep a plan only if it is cheaper than every faster one
+    order = np.lexsort((costs, days))
+    front = []
+    best_cost = np.inf
+    for i in order:
+        if costs[i] < best_cost:
+            front.append(int(i))
+            best_cost = costs[i]
+    return front
+
+
+def plan_labor_options(
+    linear_feet,
+    daily_rate=None,
+    dirt_complexity=1.0,
+    grade_of_slope_complexity=1.0,
+    productivity=1.0,
+    whole_days=True,
+    min_crew_size=None,
+    max_crew_size=None,
+    min_shift_hours=None,
+    max_shift_hours=None,
+    shift_step_hours=None,
+    panel_install_time_min=None,
+    panel_length_ft=util.PANEL_LENGTH_FT,
+    fence_type=None,
+    soil=None
+):
+    bounds = labor_planning_bounds
+    min_crew_size = min_crew_size if min_crew_size is not None else bounds["min_crew_size"]
+    max_crew_size = max_crew_size if max_crew_size is not None else bounds["max_crew_size"]
+    if min_crew_size < 1 or max_crew_size < min_crew_size:
+        raise ValueError("Crew bounds must satisfy 1 <= min_crew_size <= max_crew_size")
+
+    shifts = shift_options(
+        min_shift_hours if min_shift_hours is not None else bounds["min_shift_hours"],
+        max_shift_hours if max_shift_hours is not None else bounds["max_shift_hours"],
+        shift_step_hours if shift_step_hours is not None else bounds["shift_step_hours"],
+    )
+    daily_rate = daily_rate if daily_rate is not None else util.default_labor_values["daily_rate"]
+    hourly_rate = daily_rate / bounds["standard_shift_hours"]
+    if panel_install_time_min is None:
+        panel_install_time_min = calibration.install_time_minutes(fence_type, soil)
+
+    adjusted_hours = util.calculate_adjusted_labor_hours(
+        linear_feet=linear_feet,
+        panel_install_time_min=panel_install_time_min,
+        panel_length_ft=panel_length_ft,
+        dirt_complexity=dirt_complexity,
+        grade_of_slope_complexity=grade_of_slope_complexity,
+        productivity=productivity
+    )
+
+    crews, shift_grid, days, billed_days = labor_grid(
+        adjusted_hours, np.arange(min_crew_size, max_crew_size + 1), shifts, whole_days
+    )
+    labor_cost = hourly_rate * shift_grid * crews * billed_days
+
+    crews, shift_grid = crews.ravel(), shift_grid.ravel()
+    days, billed_days, labor_cost = days.ravel(), billed_days.ravel(), labor_cost.ravel()
+
+    def option(i):
+        return {
+            "crew_size": int(crews[i]),
+            "shift_hours": float(shift_grid[i]),
+            "estimated_days": round(float(days[i]), 6),
+            "calendar_days": round(float(billed_days[i]), 6),
+            "labor_cost": round(float(labor_cost[i]), 2),
+        }
+
+    front = pareto_front(billed_days, labor_cost)
+    return {
+        "adjusted_labor_hours": round(adjusted_hours, 4),
+        "whole_days": whole_days,
+        "options_evaluated": int(crews.size),
+        "pareto_front": [option(i) for i in front],
+        "cheapest": option(front[-1]),
+        "fastest": option(front[0]),
+    }
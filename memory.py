@@ -0,0 +1,194 @@
+import contextlib
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from concurrent.futures import Future
+
+import util
+
+
+# === Memory Accounting ===
+# Deep sizes of the job store, caches and template assets for /admin/memory,
+# plus the top allocation sites from tracemalloc when AFC_TRACEMALLOC is set
+# (its value is the number of stack frames kept per allocation, e.g. 1 or 10).
+# tracemalloc costs a good deal of CPU and memory of its own, so it stays off
+# unless asked for; everything else is measured on demand. Python's own
+# PYTHONTRACEMALLOC=N works too and also covers allocations made at import.
+JOB_SECTIONS = ("fence_details", "materials", "costs", "other")
+TEMPLATE_ASSETS = ("afc-pro-pg2.pdf", "american-fence-concepts-logo_sm.webp")
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))  # same as documents.ASSET_DIR
+CACHES = {
+    # report name: (module, attribute, lock guarding it or None)
+    "estimate_cache": ("estimate_cache", "_estimates", "_cache_lock"),
+    "idempotency_keys": ("estimate_cache", "_idempotency", "_cache_lock"),
+    "speculative_renders": ("speculation", "_speculations", "_speculation_lock"),
+    "price_curves": ("price_curves", "_curves", "_curves_lock"),
+    "compiled_takeoffs": ("takeoff", "_compiled", "_definitions_lock"),
+    "pricing_tables": ("util", "pricing_tables", None),
+    "reprice_runs": ("repricing", "reprice_runs", "_reprice_lock"),
+    "scheduled_jobs": ("scheduler", "accepted_jobs", "_schedule_lock"),
+    "traces": ("tracing", "_traces", "_traces_lock"),
+    "profiles": ("profiling", "_profiles", "_profiles_lock"),
+}
+
+# Shared with every other object in the process; counting them would say little
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                  types.CodeType, type(threading.Lock()), type(threading.RLock()))
+
+
+def configure():
+    frames = os.environ.get("AFC_TRACEMALLOC")
+    if frames and not tracemalloc.is_tracing():
+        tracemalloc.start(int(frames))
+
+
+# === Deep Size ===
+def deep_size(obj, seen=None):
+    # Bytes reachable from obj, counting each object once. Pass the same
+    # `seen` set across calls to keep shared objects from being counted twice.
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        # Containers are copied with one list() call before walking: it runs
+        # without releasing the GIL, so unlocked ones such as the job store
+        # can't change size partway through
+        if isinstance(obj, dict):
+            for item in list(obj.items()):
+                stack.extend(item)
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(list(obj))
+        elif isinstance(obj, Future):
+            # A speculative render holds its PDF bytes here
+            if obj.done() and not obj.cancelled() and obj.exception() is None:
+                stack.append(obj.result())
+        elif isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return total
+
+
+def _job_sections(job):
+    fence_details = job.get("fence_details") or {}
+    seen = set()
+    sizes = {
+        "materials": deep_size(fence_details.get("materials_needed"), seen),
+        "fence_details": deep_size({k: v for k, v in fence_details.items() if k != "materials_needed"}, seen),
+        "costs": deep_size(job.get("costs"), seen),
+    }
+    sizes["other"] = deep_size({k: v for k, v in job.items() if k not in ("fence_details", "costs")}, seen)
+    return sizes
+
+
+def job_store_report(limit=20):
+    jobs = list(util.job_database.items())
+    per_job = []
+    totals = dict.fromkeys(JOB_SECTIONS, 0)
+    for job_id, job in jobs:
+        sections = _job_sections(job)
+        for name, size in sections.items():
+            totals[name] += size
+        per_job.append({"job_id": job_id, "bytes": sum(sections.values()), **sections})
+    per_job.sort(key=lambda entry: entry["bytes"], reverse=True)
+    total = deep_size(util.job_database)
+    return {
+        "jobs": len(jobs),
+        "total_bytes": total,
+        "mean_job_bytes": round(total / len(jobs)) if jobs else 0,
+        "sections": totals,
+        "largest_jobs": per_job[:limit],
+    }
+
+
+# === Caches and Assets ===
+def caches_report():
+    report = {}
+    for name, (module_name, attribute, lock_name) in CACHES.items():
+        module = sys.modules.get(module_name)
+        obj = getattr(module, attribute, None)
+        if obj is None:
+            continue  # not loaded in this process, or renamed since this table was written
+        # Measured under the owner's lock so the walk never sees a dict mid-update
+        lock = getattr(module, lock_name, None) if lock_name else None
+        with lock or contextlib.nullcontext():
+            report[name] = {"bytes": deep_size(obj), "entries": len(obj)}
+    return report
+
+
+def assets_report():
+    # Size on disk, and in memory once documents has loaded them
+    documents = sys.modules.get("documents")
+    cached = documents._assets if documents is not None else {}
+    report = {}
+    for name in TEMPLATE_ASSETS:
+        path = os.path.join(ASSET_DIR, name)
+        report[name] = {
+            "file_bytes": os.path.getsize(path) if os.path.exists(path) else None,
+            "cached_bytes": len(cached[path]) if path in cached else None,
+        }
+    return report
+
+
+# === Allocation Sites ===
+def allocation_report(top=25):
+    if not tracemalloc.is_tracing():
+        return {"enabled": False, "hint": "set AFC_TRACEMALLOC=1 (or more frames) and restart"}
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    stats = snapshot.statistics("traceback" if tracemalloc.get_traceback_limit() > 1 else "lineno")
+    return {
+        "enabled": True,
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        "top_sites": [
+            {
+                "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],  # oldest call first
+                "bytes": stat.size,
+                "blocks": stat.count,
+            }
+            for stat in stats[:top]
+        ],
+    }
+
+
+def process_report():
+    report = {"pid": os.getpid(), "rss_bytes": None, "max_rss_bytes": None}
+    try:
+        with open("/proc/self/statm") as f:
+            report["rss_bytes"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        report["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        pass
+    return report
+
+
+def memory_report(limit=20, top=25):
+    return {
+        "process": process_report(),
+        "job_store": job_store_report(limit),
+        "caches": caches_report(),
+        "template_assets": assets_report(),
+        "allocations": allocation_report(top),
+    }
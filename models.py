@@ -1,7 +1,7 @@
 # models.py
 
-from pydantic import BaseModel
-from typing import Optional, Dict, Union
+from pydantic import BaseModel, Field, confloat, conint, model_validator
+from typing import Optional, Dict, Union, List, Literal
 
 
 # === Job Details ===
@@ -52,6 +52,14 @@ class SPWroughtIronDetails(BaseFenceDetails):
     height: int
 
 
+fence_detail_models = {
+    "chain link": ChainLinkDetails,
+    "vinyl": VinylDetails,
+    "wood": WoodDetails,
+    "sp wrought iron": SPWroughtIronDetails,
+}
+
+
 # === Notes ===
 class Notes(BaseModel):
     job_id: str
@@ -68,6 +76,84 @@ class CostEstimation(BaseModel):
     dirt_complexity: str = "soft"
     grade_of_slope_complexity: float = 0.0
     productivity: float = 1.0
+    simulate: bool = False
+    simulation_draws: int = 100_000
+    recommended_margin: float = 0.30
+
+
+# === Reverse Pricing Solver ===
+class PriceSolverRequest(BaseModel):
+    job_id: str
+    target_revenue: Optional[float] = None
+    target_price_per_linear_foot: Optional[float] = None
+    pricing_strategy: str = "Master Halco Pricing"
+    material_prices: Dict[str, float] = {}
+    daily_rate: float = 150.0
+    num_employees: int = Field(3, ge=1)
+    dirt_complexity: str = "soft"
+    grade_of_slope_complexity: float = 0.0
+    productivity: float = Field(1.0, gt=0)
+    crew_sizes: List[conint(ge=1, le=50)] = Field(list(range(3, 16)), max_length=50)
+    daily_rates: Optional[List[confloat(gt=0)]] = Field(None, max_length=50)
+    whole_days: bool = False
+    max_days: Optional[float] = None
+    min_margin: float = 0.0
+    margin_curve_max: float = Field(0.70, ge=0, lt=1)
+    margin_curve_step: float = Field(0.005, ge=0.001, lt=1)  # at most ~1,000 curve points
+    max_plans: int = Field(20, ge=1)
+
+
+# === Labor Planning ===
+class LaborPlanRequest(BaseModel):
+    job_id: Optional[str] = None
+    linear_feet: Optional[float] = None
+    fence_type: Optional[str] = None
+    daily_rate: float = 150.0
+    dirt_complexity: str = "soft"
+    grade_of_slope_complexity: float = 0.0
+    productivity: float = Field(1.0, gt=0)
+    whole_days: bool = True
+    min_crew_size: Optional[int] = Field(None, ge=1, le=50)
+    max_crew_size: Optional[int] = Field(None, ge=1, le=50)
+    min_shift_hours: Optional[float] = Field(None, gt=0, le=24)
+    max_shift_hours: Optional[float] = Field(None, gt=0, le=24)
+    shift_step_hours: Optional[float] = Field(None, ge=0.25)  # quarter-hour steps at the finest
+
+    @model_validator(mode="after")
+    def check_ranges(self):
+        if self.min_crew_size is not None and self.max_crew_size is not None and self.min_crew_size > self.max_crew_size:
+            raise ValueError("min_crew_size must not exceed max_crew_size")
+        if self.min_shift_hours is not None and self.max_shift_hours is not None and self.min_shift_hours > self.max_shift_hours:
+            raise ValueError("min_shift_hours must not exceed max_shift_hours")
+        return self
+
+
+# === Labor Model Calibration ===
+class JobActuals(BaseModel):
+    job_id: str
+    actual_install_hours: float  # total crew hours on site, all workers combined
+    dirt_complexity: Optional[str] = None
+    grade_of_slope_complexity: Optional[float] = None
+    productivity: Optional[float] = None
+
+
+# === Crew Scheduling ===
+class CrewDefinition(BaseModel):
+    crew_id: str
+    size: int
+
+
+class ScheduleAcceptRequest(BaseModel):
+    job_id: str
+    due_date: Optional[str] = None  # YYYY-MM-DD
+
+
+class ScheduleConfig(BaseModel):
+    crews: Optional[List[CrewDefinition]] = None
+    start_date: Optional[str] = None  # YYYY-MM-DD
+    workdays: Optional[List[int]] = None  # 0 = Monday
+    holidays: Optional[List[str]] = None
+    objective: Optional[Literal["makespan", "lateness"]] = None
 
 
 # === Proposal / Materials Generation ===
@@ -87,6 +173,55 @@ class InternalSummaryRequest(BaseModel):
     custom_margin: Optional[float] = None  # e.g. 0.35 for 35%
 
 
+# === Catalog Maintenance ===
+class CatalogPriceUpdate(BaseModel):
+    fence_type: str
+    material: str
+    unit_price: float
+    unit_size: Optional[int] = None
+    pricing_strategy: str = "Master Halco Pricing"
+    height: int = 6
+    top_rail: bool = True
+    with_chain_link: bool = False
+    style: Optional[str] = None
+    bob: bool = False
+
+
+class TakeoffVariable(BaseModel):
+    name: str
+    formula: str
+
+
+class TakeoffMaterial(BaseModel):
+    name: str
+    formula: str
+    rounding: Literal["cents_up", "ceil", "none"] = "cents_up"
+    when: Optional[str] = None
+
+
+class CatalogPriceEntry(BaseModel):
+    unit_size: int = 1
+    unit_price: float
+
+
+class TakeoffDefinition(BaseModel):
+    fence_type: str
+    style: Optional[str] = None
+    variables: List[TakeoffVariable] = []
+    materials: List[TakeoffMaterial]
+    price_table: Optional[Dict[str, CatalogPriceEntry]] = None
+    pricing_strategy: str = "Master Halco Pricing"
+    height: int = 6
+    top_rail: bool = True
+    with_chain_link: bool = False
+    bob: bool = False
+
 
+class RepriceRequest(BaseModel):
+    threshold: Optional[float] = None  # fraction, e.g. 0.02 flags quotes that moved more than 2%
 
 
+class LogLevelUpdate(BaseModel):
+    logger: str = ""  # module name, e.g. "util"; empty for the root logger
+    level: Optional[str] = None  # DEBUG, INFO, WARNING, ...
+    debug_sample: Optional[float] = None  # fraction of DEBUG records kept
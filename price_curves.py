@@ -0,0 +1,256 @@
+import bisect
+import threading
+
+import util
+
+
+# === Curve Grid ===
+# Linear-foot sample points shared by every curve: dense where residential jobs
+# land, coarser out to 20,000 ft. Quotes between points are interpolated.
+CURVE_GRID = tuple(
+    list(range(10, 1000, 10))
+    + list(range(1000, 5000, 50))
+    + list(range(5000, 20001, 250))
+)
+
+# Terminal posts assumed for a phone quote when the rep doesn't know the layout.
+# Only this layout is kept as a curve; quotes for any other are priced exactly.
+DEFAULT_CORNER_POSTS = 0
+DEFAULT_END_POSTS = 2
+
+# Fence types whose takeoff ignores corner/end posts
+POSTLESS_TYPES = ("wood", "sp wrought iron")
+
+_curves = {}
+_curves_version = None
+_curves_lock = threading.Lock()
+_rebuild_wakeup = threading.Event()
+_rebuilder = None
+
+
+# === Configuration Keys ===
+def configuration_key(
+    fence_type,
+    pricing_strategy="Master Halco Pricing",
+    height=6,
+    top_rail=True,
+    with_chain_link=False,
+    style=None,
+    bob=False,
+    corner_posts=DEFAULT_CORNER_POSTS,
+    end_posts=DEFAULT_END_POSTS
+):
+    # Drop options a fence type ignores so equivalent quotes share one curve
+    fence_type = str(fence_type or "").strip().lower().replace("_", " ")
+    height = int(height) if height is not None else 6
+    if pricing_strategy not in util.known_pricing_strategies():
+        raise ValueError(f"Unknown pricing strategy: {pricing_strategy}")
+    if corner_posts < 0 or end_posts < 0:
+        raise ValueError("corner_posts and end_posts must be 0 or greater")
+
+    if fence_type == "chain link":
+        options = (bool(top_rail),)
+    elif fence_type == "vinyl":
+        options = (bool(with_chain_link),)
+    elif fence_type == "wood":
+        options = (str(style or "dogeared").strip().lower(), bool(bob))
+    elif fence_type == "sp wrought iron":
+        options = ()
+    else:
+        raise ValueError(f"Unsupported fence type: {fence_type}")
+    if fence_type in POSTLESS_TYPES:
+        corner_posts, end_posts = 0, 0
+    if fence_type != "chain link":
+        # Only chain link picks its price table by strategy; for the rest
+        # it only changes tax and delivery, which aren't part of the curve
+        pricing_strategy = None
+
+    return (pricing_strategy, fence_type, height, options, int(corner_posts), int(end_posts))
+
+
+def has_curve(key):
+    _, fence_type, _, _, cp, ep = key
+    return fence_type in POSTLESS_TYPES or (cp, ep) == (DEFAULT_CORNER_POSTS, DEFAULT_END_POSTS)
+
+
+def _takeoff_kwargs(key, linear_feet):
+    _, fence_type, height, options, cp, ep = key
+    kwargs = {"lf": linear_feet, "cp": cp, "ep": ep, "height": height}
+    if fence_type == "chain link":
+        kwargs["top_rail"] = options[0]
+    elif fence_type == "vinyl":
+        kwargs["with_chain_link"] = options[0]
+    elif fence_type == "wood":
+        kwargs["style"], kwargs["bob"] = options
+    return kwargs
+
+
+def _price_table(key):
+    pricing_strategy, fence_type, height, options, _, _ = key
+    config = {"pricing_strategy": pricing_strategy, "height": height}
+    if fence_type == "chain link":
+        config["top_rail"] = options[0]
+    elif fence_type == "vinyl":
+        config["with_chain_link"] = options[0]
+    elif fence_type == "wood":
+        config["style"], config["bob"] = options
+    return util.resolve_price_table(fence_type, **config)
+
+
+def exact_material_total(key, linear_feet):
+    materials = util.calculate_materials_router(key[1], **_takeoff_kwargs(key, linear_feet))
+    _, material_total = util.price_materials(materials, _price_table(key))
+    return material_total
+
+
+def priced_configurations():
+    # Every configuration that has a price table, at the default post layout
+    for pricing_strategy, table in util.pricing_tables.items():
+        for key in table:
+            if len(key) == 2:
+                yield configuration_key("chain link", pricing_strategy, height=int(key[0]), top_rail=key[1])
+        for height in util.VINYL_PRICING:
+            yield configuration_key("vinyl", pricing_strategy, height=height, with_chain_link=False)
+        for height in util.VINYL_CHAINLINK_PRICING:
+            yield configuration_key("vinyl", pricing_strategy, height=height, with_chain_link=True)
+        for style, height, bob in util.WOOD_PRICING:
+            yield configuration_key("wood", pricing_strategy, height=height, style=style, bob=bob)
+        for height in util.SP_WROUGHT_IRON_PRICING:
+            yield configuration_key("sp wrought iron", pricing_strategy, height=height)
+
+
+# === Curve Build / Lookup ===
+def build_curve(key):
+    if not _price_table(key):
+        raise ValueError(f"No pricing available for configuration {key}")
+    return [exact_material_total(key, lf) for lf in CURVE_GRID]
+
+
+def get_curve(key):
+    global _curves_version
+    curve = _curves.get(key) if _curves_version == util.catalog_version else None
+    if curve is not None:
+        return curve
+
+    with _curves_lock:
+        if _curves_version != util.catalog_version:
+            _curves.clear()
+            _curves_version = util.catalog_version
+        if key not in _curves:
+            _curves[key] = build_curve(key)
+        return _curves[key]
+
+
+def curves_ready():
+    return bool(_curves) and _curves_version == util.catalog_version
+
+
+def rebuild_price_curves(_version=None):
+    global _curves_version
+    with _curves_lock:
+        _curves.clear()
+        _curves_version = util.catalog_version
+    for key in priced_configurations():
+        try:
+            get_curve(key)
+        except ValueError:
+            continue
+    return len(_curves)
+
+
+def _rebuild_in_background():
+    while True:
+        _rebuild_wakeup.wait()
+        _rebuild_wakeup.clear()
+        rebuild_price_curves()
+
+
+def schedule_rebuild(_version=None):
+    # Catalog listener: the request that changed a price doesn't wait for every
+    # curve. Until the rebuild reaches a curve, quotes build it on demand.
+    global _rebuilder
+    with _curves_lock:
+        if _rebuilder is None:
+            _rebuilder = threading.Thread(target=_rebuild_in_background, name="price-curves", daemon=True)
+            _rebuilder.start()
+    _rebuild_wakeup.set()
+
+
+def interpolate_material_total(key, linear_feet):
+    # (material total, tolerance). Material totals are step functions of
+    # length (every quantity is rounded up to whole units), so between grid
+    # points the straight line is an approximation. Totals never shrink as a
+    # run gets longer, so the exact total lies between the two neighbouring
+    # grid values and the tolerance is the larger gap to either of them.
+    if linear_feet < CURVE_GRID[0] or linear_feet > CURVE_GRID[-1] or not has_curve(key):
+        return exact_material_total(key, linear_feet), 0.0
+
+    curve = get_curve(key)
+    i = bisect.bisect_left(CURVE_GRID, linear_feet)
+    if CURVE_GRID[i] == linear_feet:
+        return curve[i], 0.0
+
+    lo_lf, hi_lf = CURVE_GRID[i - 1], CURVE_GRID[i]
+    weight = (linear_feet - lo_lf) / (hi_lf - lo_lf)
+    total = round(curve[i - 1] + (curve[i] - curve[i - 1]) * weight, 2)
+    return total, round(max(abs(total - curve[i - 1]), abs(curve[i] - total)), 2)
+
+
+# === Instant Quote ===
+def instant_quote(
+    fence_type,
+    linear_feet,
+    pricing_strategy="Master Halco Pricing",
+    height=6,
+    top_rail=True,
+    with_chain_link=False,
+    style=None,
+    bob=False,
+    corner_posts=DEFAULT_CORNER_POSTS,
+    end_posts=DEFAULT_END_POSTS,
+    daily_rate=None,
+    num_employees=3,
+    dirt_complexity="soft",
+    grade_of_slope_complexity=0.0
+):
+    if linear_feet <= 0:
+        raise ValueError("linear_feet must be greater than 0")
+    if num_employees < 1:
+        raise ValueError("num_employees must be at least 1")
+
+    key = configuration_key(
+        fence_type, pricing_strategy, height, top_rail, with_chain_link,
+        style, bob, corner_posts, end_posts
+    )
+    material_total, tolerance = interpolate_material_total(key, linear_feet)
+    material_tax, delivery_charge = util.calculate_tax_and_delivery(material_total, pricing_strategy)
+
+    labor_costs = util.calculate_labor_cost(
+        linear_feet=linear_feet,
+        crew_size=num_employees,
+        daily_rate=daily_rate,
+        dirt_complexity=util.dirt_scores.get(str(dirt_complexity).lower(), 1.0),
+        grade_of_slope_complexity=util.calculate_slope_complexity_score(grade_of_slope_complexity),
+        fence_type=key[1],
+        soil=dirt_complexity
+    )
+
+    subtotal = material_total + material_tax + delivery_charge + labor_costs["total_labor_cost"]
+
+    return {
+        "fence_type": key[1],
+        "linear_feet": linear_feet,
+        "material_total": material_total,
+        # How far material_total can be from a full estimate's; 0.0 when exact
+        "material_total_tolerance": tolerance,
+        "material_tax": material_tax,
+        "delivery_charge": delivery_charge,
+        "labor_costs": labor_costs,
+        "total_cost": round(subtotal, 2),
+        "price_per_linear_foot": round(subtotal / linear_feet, 2),
+        "profit_margins": util.calculate_profit_margins(subtotal, linear_feet),
+        "catalog_version": util.catalog_version,
+    }
+
+
+util.register_catalog_listener(schedule_rebuild)
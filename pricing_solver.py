@@ -0,0 +1,161 @@
+import numpy as np
+
+import calibration
+import util
+
+
+DEFAULT_CREW_SIZES = tuple(range(3, 16))
+
+
+# === Margin Curve ===
+def margin_curve(subtotal, linear_feet, max_margin=0.70, step=0.005):
+    margins = np.round(np.arange(0.0, max_margin + step / 2, step), 4)
+    revenue = np.round(subtotal / (1 - margins), 2)
+    profit = np.round(revenue - subtotal, 2)
+    price_per_foot = np.round(revenue / linear_feet, 2) if linear_feet else np.zeros_like(revenue)
+    return {
+        "margins": margins.tolist(),
+        "revenue": revenue.tolist(),
+        "profit": profit.tolist(),
+        "price_per_linear_foot": price_per_foot.tolist(),
+    }
+
+
+def implied_margin(subtotal, target_revenue):
+    if target_revenue <= 0:
+        raise ValueError("Target revenue must be greater than 0")
+    return round(1 - subtotal / target_revenue, 4)
+
+
+# === Crew Plan Search ===
+def search_crew_plans(
+    fixed_costs,
+    adjusted_hours,
+    target_revenue,
+    crew_sizes=DEFAULT_CREW_SIZES,
+    daily_rates=(150.0,),
+    work_hours_per_day=util.WORK_HOURS_PER_DAY,
+    whole_days=False,
+    max_days=None,
+    min_margin=0.0,
+    max_plans=20
+):
+    # Every crew size x daily rate combination evaluated at once on a grid
+    crews, rates = np.meshgrid(
+        np.asarray(crew_sizes, dtype=float),
+        np.asarray(daily_rates, dtype=float),
+        indexing="ij"
+    )
+    days = adjusted_hours / (crews * work_hours_per_day)
+    # Rounded first, as in labor_planner.labor_grid, so float noise can't bill an extra day
+    billed_days = np.ceil(np.round(days, 9)) if whole_days else days
+    labor_cost = rates * crews * billed_days
+    total_cost = fixed_costs + labor_cost
+    margins = 1 - total_cost / target_revenue
+
+    feasible = margins >= min_margin
+    if max_days is not None:
+        feasible &= billed_days <= max_days
+
+    idx = np.flatnonzero(feasible.ravel())
+    # Best margin first; ties go to the shorter job
+    order = np.lexsort((billed_days.ravel()[idx], -margins.ravel()[idx]))
+    idx = idx[order][:max_plans]
+
+    plans = []
+    for i in idx:
+        plans.append({
+            "crew_size": int(crews.flat[i]),
+            "daily_rate": round(float(rates.flat[i]), 2),
+            "estimated_days": round(float(days.flat[i]), 2),
+            "billed_days": round(float(billed_days.flat[i]), 2),
+            "labor_cost": round(float(labor_cost.flat[i]), 2),
+            "total_cost": round(float(total_cost.flat[i]), 2),
+            "margin": round(float(margins.flat[i]), 4),
+            "profit": round(float(target_revenue - total_cost.flat[i]), 2),
+        })
+    return plans, int(feasible.sum())
+
+
+# === Reverse Pricing ===
+def solve_target_price(
+    fence_details,
+    material_prices,
+    pricing_strategy,
+    daily_rate,
+    num_employees,
+    dirt_complexity,
+    grade_of_slope_complexity,
+    productivity=1.0,
+    target_revenue=None,
+    target_price_per_linear_foot=None,
+    crew_sizes=DEFAULT_CREW_SIZES,
+    daily_rates=None,
+    whole_days=False,
+    max_days=None,
+    min_margin=0.0,
+    margin_curve_max=0.70,
+    margin_curve_step=0.005,
+    max_plans=20
+):
+    linear_feet = fence_details.get("linear_feet") or 0
+    if target_revenue is None:
+        if target_price_per_linear_foot is None:
+            raise ValueError("Provide target_revenue or target_price_per_linear_foot")
+        target_revenue = target_price_per_linear_foot * linear_feet
+    if target_revenue <= 0:
+        raise ValueError("Target revenue must be greater than 0")
+
+    _, material_total = util.calculate_fence_material_costs(fence_details, material_prices, pricing_strategy)
+    material_tax, delivery_charge = util.calculate_tax_and_delivery(material_total, pricing_strategy)
+    fixed_costs = material_total + material_tax + delivery_charge
+
+    dirt_score = util.dirt_scores.get(str(dirt_complexity).lower(), 1.0)
+    slope_score = util.calculate_slope_complexity_score(grade_of_slope_complexity)
+
+    # Current plan, costed as calculate_total_costs does but at the same
+    # productivity as the crew plans below so the two compare like for like
+    labor_costs = util.calculate_labor_cost(
+        linear_feet=linear_feet,
+        crew_size=num_employees,
+        daily_rate=daily_rate,
+        dirt_complexity=dirt_score,
+        grade_of_slope_complexity=slope_score,
+        fence_type=fence_details.get("fence_type"),
+        soil=dirt_complexity,
+        productivity=productivity
+    )
+    subtotal = round(fixed_costs + labor_costs["total_labor_cost"], 2)
+
+    adjusted_hours = util.calculate_adjusted_labor_hours(
+        linear_feet=linear_feet,
+        panel_install_time_min=calibration.install_time_minutes(fence_details.get("fence_type"), dirt_complexity),
+        dirt_complexity=dirt_score,
+        grade_of_slope_complexity=slope_score,
+        productivity=productivity
+    )
+    plans, feasible_count = search_crew_plans(
+        fixed_costs,
+        adjusted_hours,
+        target_revenue,
+        crew_sizes=crew_sizes,
+        daily_rates=daily_rates or (daily_rate,),
+        whole_days=whole_days,
+        max_days=max_days,
+        min_margin=min_margin,
+        max_plans=max_plans
+    )
+
+    return {
+        "target_revenue": round(target_revenue, 2),
+        "target_price_per_linear_foot": round(target_revenue / linear_feet, 2) if linear_feet else 0,
+        "material_total": material_total,
+        "material_tax": material_tax,
+        "delivery_charge": delivery_charge,
+        "labor_costs": labor_costs,
+        "total_cost": subtotal,
+        "implied_margin": implied_margin(subtotal, target_revenue),
+        "feasible_plan_count": feasible_count,
+        "crew_plans": plans,
+        "margin_curve": margin_curve(subtotal, linear_feet, margin_curve_max, margin_curve_step),
+    }
@@ -0,0 +1,169 @@
+import contextvars
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+# === On-Demand Request Profiling ===
+# A request carrying "X-Profile: sample" (or "cprofile") plus a valid
+# "X-Admin-Token" runs its handler under a profiler. Only that handler's
+# worker thread is profiled; other requests are untouched. The response gets
+# an X-Profile-Id header and the profile is kept in memory for download from
+# /admin/profiles/{id}:
+#   sample   - folded stacks ("a;b;c 12"), ready for flamegraph.pl or speedscope
+#   cprofile - deterministic pstats listing sorted by cumulative time
+# Profiling is off entirely unless AFC_ADMIN_TOKEN is set.
+SAMPLE_INTERVAL_SEC = 0.001
+PROFILES_KEPT = 50
+PROFILE_MODES = ("sample", "cprofile")
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+_profile_ids = itertools.count(1)
+_session = contextvars.ContextVar("profile_session", default=None)
+
+
+def admin_token_ok(token):
+    expected = os.environ.get("AFC_ADMIN_TOKEN")
+    return bool(expected) and token is not None and hmac.compare_digest(token, expected)
+
+
+# === Samplers ===
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample_thread(thread_id, root_code, stop, stacks):
+    while not stop.wait(SAMPLE_INTERVAL_SEC):
+        frame = sys._current_frames().get(thread_id)
+        labels = []
+        # Walk leaf to root, stopping at the handler wrapper so threadpool
+        # plumbing doesn't show up in every stack
+        while frame is not None and frame.f_code is not root_code:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        if labels:
+            stacks[";".join(reversed(labels))] += 1
+
+
+def _run_sampled(session, call):
+    stacks = Counter()
+    stop = threading.Event()
+    sampler = threading.Thread(
+        target=_sample_thread,
+        args=(threading.get_ident(), _run_sampled.__code__, stop, stacks),
+        name="profile-sampler",
+        daemon=True,
+    )
+    sampler.start()
+    try:
+        return call()
+    finally:
+        stop.set()
+        sampler.join()
+        session["profile"] = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        session["samples"] = sum(stacks.values())
+
+
+def _run_cprofile(session, call):
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(call)
+    finally:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(80)
+        session["profile"] = out.getvalue()
+
+
+def profiled(endpoint):
+    # Async handlers run on the event loop alongside everything else, so
+    # there is no thread of their own to profile; leave them alone
+    if inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        session = _session.get()
+        if session is None or "profile" in session:
+            return endpoint(*args, **kwargs)
+        session["handler"] = endpoint.__name__
+        call = functools.partial(endpoint, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            if session["mode"] == "cprofile":
+                return _run_cprofile(session, call)
+            return _run_sampled(session, call)
+        finally:
+            session["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    return wrapper
+
+
+# === Storage ===
+def _store(session):
+    with _profiles_lock:
+        _profiles[session["id"]] = session
+        while len(_profiles) > PROFILES_KEPT:
+            _profiles.popitem(last=False)
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+def list_profiles():
+    with _profiles_lock:
+        return [
+            {k: v for k, v in session.items() if k != "profile"}
+            for session in reversed(_profiles.values())
+        ]
+
+
+# === ASGI Middleware ===
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        mode = headers.get("x-profile", "").strip().lower()
+        if mode in ("1", "true"):
+            mode = "sample"
+        if mode not in PROFILE_MODES or not admin_token_ok(headers.get("x-admin-token")):
+            await self.app(scope, receive, send)
+            return
+
+        session = {
+            "id": next(_profile_ids),
+            "mode": mode,
+            "method": scope["method"],
+            "path": scope["path"],
+            "at": time.time(),
+        }
+        token = _session.set(session)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start" and "profile" in session:
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", str(session["id"]).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _session.reset(token)
+            if "profile" in session:
+                _store(session)
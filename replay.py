@@ -0,0 +1,227 @@
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+# Replays a traffic capture (AFC_CAPTURE_FILE, see capture.py) against a
+# running instance and reports throughput and latency per route:
+#   python replay.py capture.jsonl --url http://localhost:8000 --concurrency 16 --speedup 4
+# Each job's requests (job details -> fence -> estimate -> documents) replay in
+# their captured order as one session; the job id the target hands back for
+# the created job is substituted into everything that follows. Sessions start
+# at their captured offsets divided by --speedup (0 = as fast as possible) and
+# at most --concurrency run at once. Requests for jobs created before the
+# capture began, and requests whose body wasn't captured, are skipped.
+
+DEFAULT_URL = "http://127.0.0.1:8000"
+DEFAULT_CONCURRENCY = 8
+REQUEST_TIMEOUT_SEC = 60
+
+
+# === Loading ===
+def read_capture(path):
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda r: r["offset_sec"])
+
+
+def build_sessions(records):
+    # One session per job in capture order, plus one per request that isn't
+    # tied to a job. Returns (sessions, skipped counts).
+    sessions, by_job = [], {}
+    skipped = defaultdict(int)
+    for record in records:
+        if record.get("body"):
+            skipped["body_not_captured"] += 1
+            continue
+        job_id = record.get("job_id")
+        if job_id is None:
+            sessions.append([record])
+        elif job_id in by_job:
+            by_job[job_id].append(record)
+        elif _creates_job(record):
+            by_job[job_id] = [record]
+            sessions.append(by_job[job_id])
+        else:
+            skipped["job_created_before_capture"] += 1
+    return sessions, dict(skipped)
+
+
+def _creates_job(record):
+    return not (record.get("json") or {}).get("job_id") and "job_id" not in (record.get("query") or {})
+
+
+# === Replaying ===
+class Replayer:
+    def __init__(self, url, concurrency, speedup):
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.speedup = speedup
+        self.results = []
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, "http"):
+            self._local.http = requests.Session()
+        return self._local.http
+
+    def _send(self, record, job_ids, session_id):
+        body = record.get("json")
+        query = dict(record.get("query") or {})
+        headers = dict(record.get("headers") or {})
+        if isinstance(body, dict) and body.get("job_id") in job_ids:
+            body = {**body, "job_id": job_ids[body["job_id"]]}
+        if query.get("job_id") in job_ids:
+            query["job_id"] = job_ids[query["job_id"]]
+        if "idempotency-key" in headers:
+            # Unique per replayed session so repeat runs and loops don't collide,
+            # while retries within the session still share their key
+            headers["idempotency-key"] = f"{session_id}-{headers['idempotency-key']}"
+
+        started = time.perf_counter()
+        error = None
+        try:
+            response = self._session().request(
+                record["method"],
+                self.url + record["path"],
+                params=query or None,
+                json=body,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT_SEC
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status, error = None, None, str(e)
+        elapsed = time.perf_counter() - started
+
+        self.results.append({
+            "route": f"{record['method']} {record.get('route') or record['path']}",
+            "status": status,
+            "expected_status": record.get("status"),
+            "seconds": elapsed,
+            "error": error,
+        })
+        return response
+
+    def _run_session(self, records, start, base):
+        job_ids = {}
+        session_id = uuid.uuid4().hex[:12]
+        for record in records:
+            if self.speedup:
+                delay = start + (record["offset_sec"] - base) / self.speedup - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            response = self._send(record, job_ids, session_id)
+            if record.get("job_id") and record["job_id"] not in job_ids:
+                created = _json(response).get("job_id") if response is not None else None
+                if created is None:
+                    return  # the rest of this job can't be replayed
+                job_ids[record["job_id"]] = created
+
+    def run(self, sessions):
+        if not sessions:
+            return 0.0
+        base = sessions[0][0]["offset_sec"]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="replay") as pool:
+            for future in [pool.submit(self._run_session, s, start, base) for s in sessions]:
+                future.result()
+        return time.perf_counter() - start
+
+
+def _json(response):
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+# === Report ===
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, elapsed):
+    routes = defaultdict(list)
+    for result in results:
+        routes[result["route"]].append(result)
+    report = {}
+    for route, entries in sorted(routes.items()):
+        latencies = sorted(r["seconds"] * 1000 for r in entries)
+        report[route] = {
+            "requests": len(entries),
+            "throughput_rps": round(len(entries) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "errors": sum(1 for r in entries if r["error"] or r["status"] >= 500),
+            "status_mismatches": sum(1 for r in entries if r["status"] != r["expected_status"]),
+        }
+    latencies = sorted(r["seconds"] * 1000 for r in results)
+    total = {
+        "requests": len(results),
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 3) if latencies else None,
+    }
+    return {"total": total, "routes": report}
+
+
+def print_report(report, skipped, out=sys.stderr):
+    print(f"{'route':50s} {'reqs':>6s} {'rps':>8s} {'p50 ms':>9s} {'p99 ms':>9s} {'errors':>7s} {'status!=':>9s}", file=out)
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:50s} {stats['requests']:6d} {stats['throughput_rps']:8.2f} {stats['p50_ms']:9.2f} "
+            f"{stats['p99_ms']:9.2f} {stats['errors']:7d} {stats['status_mismatches']:9d}",
+            file=out
+        )
+    total = report["total"]
+    print(f"{total['requests']} requests in {total['elapsed_sec']}s, {total['throughput_rps']} req/s", file=out)
+    for reason, count in skipped.items():
+        print(f"skipped {count} ({reason.replace('_', ' ')})", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a running instance.")
+    parser.add_argument("capture", help="JSONL file written with AFC_CAPTURE_FILE")
+    parser.add_argument("--url", default=DEFAULT_URL, help=f"target base URL (default {DEFAULT_URL})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="sessions replayed at once")
+    parser.add_argument("--speedup", type=float, default=1.0, help="divide captured gaps by this; 0 replays flat out")
+    parser.add_argument("--loops", type=int, default=1, help="replay the capture this many times back to back")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    sessions, skipped = build_sessions(read_capture(args.capture))
+    if args.loops > 1:
+        # Later loops start where the previous one's timeline ended
+        offsets = [r["offset_sec"] for session in sessions for r in session]
+        span = max(offsets) - min(offsets) if offsets else 0.0
+        sessions = [
+            [{**r, "offset_sec": r["offset_sec"] + loop * span} for r in session]
+            for loop, session in itertools.product(range(args.loops), sessions)
+        ]
+    replayer = Replayer(args.url, args.concurrency, args.speedup)
+    elapsed = replayer.run(sessions)
+    report = summarize(replayer.results, elapsed)
+    report["skipped"] = skipped
+    print_report(report, skipped)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if not replayer.results else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+import calibration
+import capacity
+import util
+
+
+logger = logging.getLogger(__name__)
+
+# === Repricing Settings ===
+# Open jobs are re-costed a chunk at a time with a short pause in between so a
+# catalog-wide reprice never holds the interpreter long enough to stall requests.
+REPRICE_CHUNK_SIZE = 250
+REPRICE_CHUNK_PAUSE_SEC = 0.005
+DEFAULT_MOVE_THRESHOLD = 0.02  # fraction of the old total
+MAX_RUNS_KEPT = 20
+
+reprice_runs = OrderedDict()
+
+_run_ids = itertools.count(1)
+_requests = []
+_wakeup = threading.Event()
+_reprice_lock = threading.Lock()
+_worker = None
+
+
+# === Exact Vectorized Rounding ===
+def round_cents(values):
+    # np.round differs from round() only when x * 100 sits on a half cent, so
+    # those rare near-ties are settled with round() itself
+    values = np.asarray(values, dtype=float)
+    scaled = values * 100
+    rounded = np.round(scaled) / 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded.flat[i] = round(float(values.flat[i]), 2)
+    return rounded
+
+
+# === Job Selection ===
+def open_jobs():
+    # Estimated and not yet installed (no actuals recorded)
+    return [
+        (job_id, job) for job_id, job in list(util.job_database.items())
+        if job.get("costs") and job.get("fence_details") and "actual_install_hours" not in job
+    ]
+
+
+def grand_total(costs):
+    return round(
+        costs["material_total"] + costs["material_tax"] + costs["delivery_charge"]
+        + costs["labor_costs"]["total_labor_cost"], 2
+    )
+
+
+def _job_inputs(job):
+    fence_details = job["fence_details"]
+    labor_inputs = job.get("labor_inputs", {})
+    pricing_inputs = job.get("pricing_inputs", {})
+    crew_size = job.get("crew_size") or util.default_labor_values["num_employees"]
+    daily_rate = pricing_inputs.get("daily_rate")
+    if daily_rate is None:
+        daily_rate = job["costs"]["labor_costs"]["labor_cost_per_day"] / crew_size
+    top_rail = fence_details.get("top_rail", False)
+    if isinstance(top_rail, str):
+        top_rail = top_rail.lower() == "true"
+    return {
+        "fence_details": fence_details,
+        "fence_type": fence_details.get("fence_type", ""),
+        "linear_feet": fence_details.get("linear_feet") or 0,
+        "pricing_strategy": pricing_inputs.get("pricing_strategy", "Master Halco Pricing"),
+        "material_prices": pricing_inputs.get("material_prices") or {},
+        "daily_rate": daily_rate,
+        "crew_size": crew_size,
+        "dirt_complexity": labor_inputs.get("dirt_complexity", "soft"),
+        "grade_of_slope_complexity": labor_inputs.get("grade_of_slope_complexity", 0.0),
+        "top_rail": top_rail,
+    }
+
+
+def _price_source(inputs):
+    # Mirrors calculate_fence_material_costs: vinyl, wood and SP wrought iron
+    # price only listed materials; the chain link fallback lists every
+    # material and prices unknown ones at 0
+    fence_details = inputs["fence_details"]
+    fence_type = inputs["fence_type"].strip().lower()
+    if fence_type in ("vinyl", "wood", "sp wrought iron"):
+        table = util.resolve_price_table(
+            fence_type,
+            pricing_strategy=inputs["pricing_strategy"],
+            height=fence_details.get("height"),
+            top_rail=inputs["top_rail"],
+            with_chain_link=fence_details.get("with_chain_link", False),
+            style=fence_details.get("style"),
+            bob=fence_details.get("bob", False)
+        )
+        return table, False
+    if inputs["pricing_strategy"] in util.pricing_tables:
+        key = (str(fence_details.get("height")), bool(inputs["top_rail"]))
+        return util.pricing_tables[inputs["pricing_strategy"]].get(key, {}), True
+    return {k: {"unit_size": 1, "unit_price": v} for k, v in util.default_material_prices.items()}, True
+
+
+# === Vectorized Costing ===
+def _price_group(table, list_all, group):
+    # One price table, many jobs: a jobs x materials matrix priced in one pass
+    def priced(material, inputs):
+        return list_all or material in table or material in inputs["material_prices"]
+
+    columns = OrderedDict()
+    for inputs in group:
+        for material in inputs["fence_details"]["materials_needed"]:
+            if priced(material, inputs):
+                columns.setdefault(material, len(columns))
+
+    n, m = len(group), len(columns)
+    quantities = np.zeros((n, m))
+    present = np.zeros((n, m), dtype=bool)
+    prices = np.tile([table[k]["unit_price"] if k in table else 0.0 for k in columns], (n, 1))
+    unit_sizes = np.array([table[k]["unit_size"] if k in table else 1 for k in columns], dtype=float)
+    for i, inputs in enumerate(group):
+        for material, quantity in inputs["fence_details"]["materials_needed"].items():
+            c = columns.get(material)
+            if c is not None and priced(material, inputs):
+                quantities[i, c] = quantity
+                present[i, c] = True
+        for material, price in inputs["material_prices"].items():
+            if material in columns:
+                prices[i, columns[material]] = price
+
+    order_sizes = np.ceil(quantities / unit_sizes)
+    unit_prices = round_cents(prices)
+    item_totals = round_cents(order_sizes * unit_prices)
+
+    # Summed column by column so every job adds its items in takeoff order
+    totals = np.zeros(n)
+    for c in range(m):
+        totals = totals + np.where(present[:, c], item_totals[:, c], 0.0)
+
+    detailed = []
+    for i, inputs in enumerate(group):
+        materials = inputs["fence_details"]["materials_needed"]
+        detailed.append({
+            name: {
+                "quantity": materials[name],
+                "unit_size": table[name]["unit_size"] if name in table else 1,
+                "order_size": int(order_sizes[i, c]),
+                "unit_price": float(unit_prices[i, c]),
+                "total_cost": float(item_totals[i, c]),
+            }
+            for name in materials
+            for c in [columns.get(name)]
+            if c is not None and present[i, c]
+        })
+    return detailed, round_cents(totals)
+
+
+def reprice_batch(batch):
+    # batch: [(job_id, inputs)] -> ({job_id: total_costs}, {job_id: error})
+    groups = OrderedDict()
+    failures = {}
+    for job_id, inputs in batch:
+        try:
+            table, list_all = _price_source(inputs)
+        except (ValueError, TypeError) as e:
+            failures[job_id] = str(e)
+            continue
+        groups.setdefault((id(table), list_all), (table, list_all, []))[2].append((job_id, inputs))
+
+    ordered, detailed, material_totals = [], [], []
+    for table, list_all, members in groups.values():
+        group_detailed, group_totals = _price_group(table, list_all, [inputs for _, inputs in members])
+        ordered.extend(members)
+        detailed.extend(group_detailed)
+        material_totals.extend(group_totals.tolist())
+    if not ordered:
+        return {}, failures
+
+    material_total = np.array(material_totals)
+    linear_feet = np.array([inputs["linear_feet"] for _, inputs in ordered], dtype=float)
+    crew = np.array([inputs["crew_size"] for _, inputs in ordered], dtype=float)
+    daily_rate = np.array([inputs["daily_rate"] for _, inputs in ordered], dtype=float)
+    install_minutes = np.array([
+        calibration.install_time_minutes(inputs["fence_type"], inputs["dirt_complexity"]) for _, inputs in ordered
+    ])
+    dirt = np.array([util.dirt_scores.get(str(inputs["dirt_complexity"]).lower(), 1.0) for _, inputs in ordered])
+    slope = np.array([util.calculate_slope_complexity_score(inputs["grade_of_slope_complexity"]) for _, inputs in ordered])
+    tax_rate, delivery = np.array([util.tax_and_delivery_rates(inputs["pricing_strategy"]) for _, inputs in ordered]).T
+
+    # Same operation order as calculate_labor_cost so results match to the cent
+    # (labor cost is priced at productivity 1.0; see calculate_num_days)
+    time_per_linear_foot = (install_minutes / 60.0) / util.PANEL_LENGTH_FT
+    adjusted_hours = ((linear_feet * time_per_linear_foot) * ((dirt + slope) - 1)) / 1.0
+    num_days = (adjusted_hours / crew) / util.WORK_HOURS_PER_DAY
+    labor_cost_per_day = daily_rate * crew
+    labor_total = round_cents(labor_cost_per_day * num_days)
+
+    material_tax = round_cents(material_total * tax_rate)
+    subtotal = material_total + material_tax + delivery + labor_total
+    safe_feet = np.where(linear_feet != 0, linear_feet, 1.0)
+    price_per_foot = np.where(linear_feet != 0, round_cents(subtotal / safe_feet), 0)
+    revenue = {m: round_cents(subtotal / (1 - m)) for m in util.PROFIT_MARGINS}
+    profit = {m: round_cents(revenue[m] - subtotal) for m in util.PROFIT_MARGINS}
+    margin_ppf = {m: np.where(linear_feet != 0, round_cents(revenue[m] / safe_feet), 0) for m in util.PROFIT_MARGINS}
+    num_days, labor_cost_per_day = round_cents(num_days), round_cents(labor_cost_per_day)
+
+    results = {}
+    for i, (job_id, inputs) in enumerate(ordered):
+        results[job_id] = {
+            "materials_needed": inputs["fence_details"]["materials_needed"],
+            "detailed_costs": detailed[i],
+            "material_total": float(material_total[i]),
+            "material_tax": float(material_tax[i]),
+            "delivery_charge": float(delivery[i]),
+            "labor_costs": {
+                "num_days": float(num_days[i]),
+                "labor_cost_per_day": float(labor_cost_per_day[i]),
+                "total_labor_cost": float(labor_total[i]),
+            },
+            "price_per_linear_foot": float(price_per_foot[i]) if linear_feet[i] else 0,
+            "profit_margins": {
+                f"{int(m * 100)}%": {
+                    "revenue": float(revenue[m][i]),
+                    "profit": float(profit[m][i]),
+                    "price_per_linear_foot": float(margin_ppf[m][i]) if linear_feet[i] else 0,
+                }
+                for m in util.PROFIT_MARGINS
+            },
+        }
+    return results, failures
+
+
+def spot_check(job_id, total_costs, inputs_by_id):
+    # reprice_batch restates calculate_total_costs in array form; one job per
+    # chunk goes through the scalar path too so the two can't drift apart
+    # unnoticed. A mismatch stops the run before any job is saved.
+    inputs = inputs_by_id[job_id]
+    expected = util.calculate_total_costs(
+        fence_details=inputs["fence_details"],
+        material_prices=inputs["material_prices"],
+        pricing_strategy=inputs["pricing_strategy"],
+        daily_rate=inputs["daily_rate"],
+        num_employees=inputs["crew_size"],
+        dirt_complexity=inputs["dirt_complexity"],
+        grade_of_slope_complexity=inputs["grade_of_slope_complexity"]
+    )
+    fields = ("material_total", "material_tax", "delivery_charge", "labor_costs", "price_per_linear_foot", "profit_margins")
+    diverged = [field for field in fields if expected[field] != total_costs[field]]
+    if diverged:
+        logger.error("vectorized repricing diverged from calculate_total_costs for job %s: %s", job_id, diverged)
+        raise ValueError(f"Vectorized repricing diverged from calculate_total_costs on job {job_id}: {', '.join(diverged)}")
+
+
+# === Runs ===
+def _new_run(trigger, threshold):
+    run = {
+        "run_id": next(_run_ids),
+        "trigger": trigger,
+        "status": "running",
+        "catalog_version": util.catalog_version,
+        "labor_model_version": calibration.model_version,
+        "threshold": threshold,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "finished_at": None,
+        "jobs_total": 0,
+        "jobs_repriced": 0,
+        "jobs_skipped": 0,
+        "jobs_failed": 0,
+        "old_total": 0.0,
+        "new_total": 0.0,
+        "movers": [],
+        "failures": {},
+    }
+    with _reprice_lock:
+        reprice_runs[run["run_id"]] = run
+        while len(reprice_runs) > MAX_RUNS_KEPT:
+            reprice_runs.popitem(last=False)
+    return run
+
+
+def reprice_open_jobs(trigger="admin", threshold=DEFAULT_MOVE_THRESHOLD, run=None):
+    run = run or _new_run(trigger, threshold)
+    run["status"] = "running"
+    jobs = open_jobs()
+    run["jobs_total"] = len(jobs)
+
+    for start in range(0, len(jobs), REPRICE_CHUNK_SIZE):
+        if _wakeup.is_set():
+            # A newer catalog change is queued; its run will cover every job again
+            run["status"] = "superseded"
+            break
+
+        chunk = []
+        snapshots = {}
+        for job_id, job in jobs[start:start + REPRICE_CHUNK_SIZE]:
+            snapshots[job_id] = job.get("costs")
+            try:
+                chunk.append((job_id, _job_inputs(job)))
+            except (KeyError, TypeError, ZeroDivisionError) as e:
+                run["failures"][job_id] = str(e)
+        results, failures = reprice_batch(chunk)
+        inputs_by_id = dict(chunk)
+        run["failures"].update(failures)
+        if results:
+            spot_check(*next(iter(results.items())), inputs_by_id)
+
+        for job_id, total_costs in results.items():
+            job = util.job_database.get(job_id)
+            if job is None or job.get("costs") is not snapshots[job_id]:
+                # Re-estimated or removed while this chunk was being priced
+                run["jobs_skipped"] += 1
+                continue
+            old_total = grand_total(snapshots[job_id])
+            new_total = grand_total(total_costs)
+            util.save_cost_estimate(job_id, total_costs, inputs_by_id[job_id]["crew_size"], job.get("labor_inputs", {}))
+            capacity.record_estimate(job_id, total_costs)
+            job["last_repriced"] = {
+                "run_id": run["run_id"],
+                "catalog_version": run["catalog_version"],
+                "old_total": old_total,
+                "new_total": new_total,
+                "repriced_at": datetime.now().isoformat(timespec="seconds"),
+            }
+
+            run["jobs_repriced"] += 1
+            run["old_total"] = round(run["old_total"] + old_total, 2)
+            run["new_total"] = round(run["new_total"] + new_total, 2)
+            change = round(new_total - old_total, 2)
+            change_pct = change / old_total if old_total else (1.0 if change else 0.0)
+            if abs(change_pct) > threshold:
+                run["movers"].append({
+                    "job_id": job_id,
+                    "job_name": job.get("job_name"),
+                    "old_total": old_total,
+                    "new_total": new_total,
+                    "change": change,
+                    "change_pct": round(change_pct, 4),
+                })
+
+        run["jobs_failed"] = len(run["failures"])
+        time.sleep(REPRICE_CHUNK_PAUSE_SEC)
+
+    run["movers"].sort(key=lambda mover: -abs(mover["change_pct"]))
+    if run["status"] == "running":
+        run["status"] = "completed"
+    run["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    return run
+
+
+# === Background Worker ===
+def _work():
+    while True:
+        _wakeup.wait()
+        with _reprice_lock:
+            _wakeup.clear()
+            pending, _requests[:] = list(_requests), []
+        # Requests that piled up while a run was going collapse into one run
+        run = pending[-1]
+        run["threshold"] = min(r["threshold"] for r in pending)
+        run["catalog_version"] = util.catalog_version
+        run["labor_model_version"] = calibration.model_version
+        for superseded in pending[:-1]:
+            superseded.update(status="superseded", finished_at=datetime.now().isoformat(timespec="seconds"))
+        try:
+            reprice_open_jobs(run=run, threshold=run["threshold"])
+        except Exception as e:
+            run.update(status="failed", error=str(e), finished_at=datetime.now().isoformat(timespec="seconds"))
+
+
+def request_reprice(trigger="admin", threshold=None):
+    global _worker
+    run = _new_run(trigger, DEFAULT_MOVE_THRESHOLD if threshold is None else threshold)
+    run["status"] = "queued"
+    with _reprice_lock:
+        _requests.append(run)
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name="repricing", daemon=True)
+            _worker.start()
+    _wakeup.set()
+    return run
+
+
+def reprice_report(run_id=None):
+    with _reprice_lock:
+        if run_id is None:
+            if not reprice_runs:
+                return None
+            run_id = next(reversed(reprice_runs))
+        run = reprice_runs.get(run_id)
+        return dict(run, movers=list(run["movers"]), failures=dict(run["failures"])) if run else None
+
+
+def on_catalog_changed(version):
+    request_reprice(trigger="catalog")
+
+
+util.register_catalog_listener(on_catalog_changed)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import calibration
+import util
+
+
+DEFAULT_DRAWS = 100_000
+MAX_DRAWS = 1_000_000
+PERCENTILES = (50, 80, 95)
+
+# === Input Distributions ===
+# Triangular (low, most likely, high) dirt score for each soil category: soft
+# ground still hits the occasional hard patch, rock can be worse than expected.
+soil_score_ranges = {
+    "soft": (1.0, 1.0, 1.5),
+    "hard": (1.3, 1.5, 1.8),
+    "core drill": (1.6, 1.8, 2.0),
+    "jack hammer": (1.8, 2.0, 2.3),
+}
+slope_grade_std_pct = 2.0        # surveyed grade is +/- a couple of percent
+productivity_sigma = 0.15        # lognormal spread of crew productivity
+
+simulation_cache_size = 512
+_simulation_cache = OrderedDict()
+_simulation_lock = threading.Lock()
+
+
+def job_input_hash(fence_details, inputs):
+    payload = {
+        "fence_details": fence_details,
+        "inputs": inputs,
+        "catalog_version": util.catalog_version,
+        "labor_model_version": calibration.model_version,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def slope_complexity_scores(percentages):
+    # Vectorized calculate_slope_complexity_score
+    clipped = np.minimum(45, percentages)
+    scores = np.round(1.2 + (clipped - 10) * ((2.0 - 1.2) / (45 - 10)), 3)
+    return np.where(percentages <= 0, 1.0, scores)
+
+
+def sample_inputs(rng, draws, dirt_complexity, grade_of_slope_complexity, productivity):
+    dirt_key = str(dirt_complexity).lower()
+    if dirt_key in soil_score_ranges:
+        low, mode, high = soil_score_ranges[dirt_key]
+        dirt = rng.triangular(low, mode, high, draws) if high > low else np.full(draws, mode)
+    else:
+        dirt = np.full(draws, util.dirt_scores.get(dirt_key, 1.0))
+
+    if grade_of_slope_complexity > 0:
+        grades = np.maximum(0.0, rng.normal(grade_of_slope_complexity, slope_grade_std_pct, draws))
+    else:
+        grades = np.zeros(draws)
+    slope = slope_complexity_scores(grades)
+
+    productivity_draws = productivity * rng.lognormal(-productivity_sigma ** 2 / 2, productivity_sigma, draws)
+    return dirt, slope, productivity_draws
+
+
+# === Simulation ===
+def simulate_cost_risk(
+    fixed_costs,
+    linear_feet,
+    daily_rate,
+    num_employees,
+    dirt_complexity,
+    grade_of_slope_complexity,
+    productivity=1.0,
+    draws=DEFAULT_DRAWS,
+    recommended_margin=0.30,
+    seed=None,
+    panel_install_time_min=calibration.DEFAULT_PANEL_INSTALL_TIME_MIN
+):
+    if not 1 <= draws <= MAX_DRAWS:
+        raise ValueError(f"draws must be between 1 and {MAX_DRAWS}")
+    if not 0 <= recommended_margin < 1:
+        raise ValueError("recommended_margin must be at least 0 and below 1")
+    if productivity <= 0 or num_employees < 1:
+        raise ValueError("productivity must be greater than 0 and num_employees at least 1")
+    daily_rate = daily_rate if daily_rate is not None else util.default_labor_values["daily_rate"]
+
+    rng = np.random.default_rng(seed)
+    dirt, slope, productivity_draws = sample_inputs(
+        rng, draws, dirt_complexity, grade_of_slope_complexity, productivity
+    )
+
+    base_hours = util.calculate_adjusted_labor_hours(
+        linear_feet=linear_feet,
+        panel_install_time_min=panel_install_time_min
+    )
+    adjusted_hours = base_hours * ((dirt + slope) - 1) / productivity_draws
+    days = adjusted_hours / num_employees / util.WORK_HOURS_PER_DAY
+    labor_cost = daily_rate * num_employees * days
+    total_cost = fixed_costs + labor_cost
+
+    day_pcts = np.percentile(days, PERCENTILES)
+    labor_pcts = np.percentile(labor_cost, PERCENTILES)
+    cost_pcts = np.percentile(total_cost, PERCENTILES)
+
+    percentiles = {}
+    for i, pct in enumerate(PERCENTILES):
+        cost = float(cost_pcts[i])
+        recommended_price = cost / (1 - recommended_margin)
+        percentiles[f"P{pct}"] = {
+            "num_days": round(float(day_pcts[i]), 2),
+            "total_labor_cost": round(float(labor_pcts[i]), 2),
+            "total_cost": round(cost, 2),
+            "recommended_price": round(recommended_price, 2),
+            "recommended_price_per_linear_foot": round(recommended_price / linear_feet, 2) if linear_feet else 0,
+        }
+
+    return {
+        "draws": draws,
+        "recommended_margin": recommended_margin,
+        "mean_num_days": round(float(days.mean()), 2),
+        "mean_total_cost": round(float(total_cost.mean()), 2),
+        "percentiles": percentiles,
+    }
+
+
+def simulate_job_risk(fence_details, total_costs, data, draws=DEFAULT_DRAWS, recommended_margin=0.30):
+    inputs = {
+        "pricing_strategy": data.pricing_strategy,
+        "material_prices": data.material_prices,
+        "daily_rate": data.daily_rate,
+        "num_employees": data.num_employees,
+        "dirt_complexity": data.dirt_complexity,
+        "grade_of_slope_complexity": data.grade_of_slope_complexity,
+        "productivity": data.productivity,
+        "draws": draws,
+        "recommended_margin": recommended_margin,
+    }
+    input_hash = job_input_hash(fence_details, inputs)
+
+    with _simulation_lock:
+        if input_hash in _simulation_cache:
+            _simulation_cache.move_to_end(input_hash)
+            return {**_simulation_cache[input_hash], "cached": True}
+
+    fixed_costs = total_costs["material_total"] + total_costs["material_tax"] + total_costs["delivery_charge"]
+    result = simulate_cost_risk(
+        fixed_costs=fixed_costs,
+        linear_feet=fence_details.get("linear_feet") or 0,
+        daily_rate=data.daily_rate,
+        num_employees=data.num_employees,
+        dirt_complexity=data.dirt_complexity,
+        grade_of_slope_complexity=data.grade_of_slope_complexity,
+        productivity=data.productivity,
+        draws=draws,
+        recommended_margin=recommended_margin,
+        # Seeded from the inputs so a re-run after eviction gives the same answer
+        seed=int(input_hash[:16], 16),
+        panel_install_time_min=calibration.install_time_minutes(fence_details.get("fence_type"), data.dirt_complexity)
+    )
+    result["input_hash"] = input_hash
+
+    with _simulation_lock:
+        _simulation_cache[input_hash] = result
+        while len(_simulation_cache) > simulation_cache_size:
+            _simulation_cache.popitem(last=False)
+    return {**result, "cached": False}
@@ -0,0 +1,250 @@
+import itertools
+import math
+import threading
+from datetime import date, timedelta
+
+import util
+
+
+# === Crew Roster / Working Calendar ===
+crew_roster = [
+    {"crew_id": "crew-1", "size": 3},
+    {"crew_id": "crew-2", "size": 3},
+    {"crew_id": "crew-3", "size": 6},
+]
+
+working_calendar = {
+    "start_date": None,             # None = today
+    "workdays": [0, 1, 2, 3, 4],    # Monday..Friday
+    "holidays": [],
+}
+
+accepted_jobs = {}
+
+schedule = {
+    "objective": "makespan",
+    "assignments": {},
+    "crew_free_day": {},
+}
+
+assignment_listeners = []
+
+_working_dates = []
+_working_dates_start = {"date": None}   # calendar start the cached dates are counted from
+_acceptance_sequence = itertools.count()
+_schedule_lock = threading.Lock()
+
+
+# === Calendar Helpers ===
+def _calendar_start():
+    start = working_calendar["start_date"]
+    if start is None:
+        return date.today()
+    return start if isinstance(start, date) else date.fromisoformat(str(start))
+
+
+def working_date(day_index):
+    # Working day N (0-based) counted from the calendar start, skipping weekends/holidays
+    if not working_calendar["workdays"]:
+        raise ValueError("Working calendar has no workdays")
+    holidays = {str(h) for h in working_calendar["holidays"]}
+    start = _calendar_start()
+    if start != _working_dates_start["date"]:
+        # With no fixed start_date the anchor moves with date.today(), so re-anchor the cache
+        _working_dates.clear()
+        _working_dates_start["date"] = start
+    if not _working_dates:
+        current = start - timedelta(days=1)
+    else:
+        current = _working_dates[-1]
+    while len(_working_dates) <= day_index:
+        current += timedelta(days=1)
+        if current.weekday() in working_calendar["workdays"] and current.isoformat() not in holidays:
+            _working_dates.append(current)
+    return _working_dates[day_index]
+
+
+def _notify(job_id, assignment):
+    for listener in list(assignment_listeners):
+        listener(job_id, assignment, working_date)
+
+
+def crew_days_needed(person_days, crew_size):
+    return max(1, math.ceil(round(person_days / crew_size, 6)))
+
+
+# === Jobs ===
+def job_person_days(job_id):
+    job = util.job_database.get(job_id)
+    if job is None:
+        raise ValueError(f"Job ID {job_id} does not exist.")
+    if job.get("estimated_days") is None:
+        raise ValueError(f"Job ID {job_id} has no labor estimate yet. Run cost estimation first.")
+    return float(job["estimated_days"]) * int(job.get("crew_size") or util.default_labor_values["num_employees"])
+
+
+def _assign(job_id, crew_free_day):
+    # Earliest-finishing crew wins; crew size changes how long the job takes
+    job = accepted_jobs[job_id]
+    best = None
+    for crew in crew_roster:
+        start = crew_free_day[crew["crew_id"]]
+        finish = start + crew_days_needed(job["person_days"], crew["size"])
+        if best is None or finish < best[1]:
+            best = (crew, finish, start)
+
+    crew, finish, start = best
+    crew_free_day[crew["crew_id"]] = finish
+    return {
+        "job_id": job_id,
+        "crew_id": crew["crew_id"],
+        "crew_size": crew["size"],
+        "start_day": start,
+        "end_day": finish,
+        "working_days": finish - start,
+    }
+
+
+def _solve(objective):
+    if objective == "makespan":
+        # Longest job first (LPT) keeps the finishing edge even across crews
+        order = sorted(accepted_jobs, key=lambda j: -accepted_jobs[j]["person_days"])
+    elif objective == "lateness":
+        # Earliest due date first; undated jobs fill in behind
+        order = sorted(
+            accepted_jobs,
+            key=lambda j: (accepted_jobs[j]["due_date"] is None, accepted_jobs[j]["due_date"] or "", accepted_jobs[j]["sequence"])
+        )
+    else:
+        raise ValueError("objective must be 'makespan' or 'lateness'")
+
+    crew_free_day = {crew["crew_id"]: 0 for crew in crew_roster}
+    schedule["objective"] = objective
+    schedule["assignments"] = {job_id: _assign(job_id, crew_free_day) for job_id in order}
+    schedule["crew_free_day"] = crew_free_day
+    for job_id, assignment in schedule["assignments"].items():
+        _notify(job_id, assignment)
+
+
+def rebuild_schedule(objective=None):
+    with _schedule_lock:
+        _solve(objective or schedule["objective"])
+        return schedule_summary()
+
+
+def configure(crews=None, start_date=None, workdays=None, holidays=None, objective=None):
+    # Everything is checked before anything changes, so a bad request leaves
+    # the current roster and calendar in place
+    if crews is not None:
+        if not crews:
+            raise ValueError("Crew roster cannot be empty")
+        crews = [{"crew_id": c["crew_id"], "size": int(c["size"])} for c in crews]
+        if any(crew["size"] <= 0 for crew in crews):
+            raise ValueError("Crew size must be at least 1")
+    if start_date is not None:
+        start_date = date.fromisoformat(str(start_date))
+    if workdays is not None:
+        workdays = sorted(set(workdays))
+        if not workdays or any(day not in range(7) for day in workdays):
+            raise ValueError("workdays must list at least one day from 0 (Monday) to 6 (Sunday)")
+
+    with _schedule_lock:
+        if crews is not None:
+            crew_roster[:] = crews
+        if start_date is not None:
+            working_calendar["start_date"] = start_date
+        if workdays is not None:
+            working_calendar["workdays"] = workdays
+        if holidays is not None:
+            working_calendar["holidays"] = [str(h) for h in holidays]
+        _working_dates.clear()
+        _working_dates_start["date"] = None
+        _solve(objective or schedule["objective"])
+        return schedule_summary()
+
+
+def accept_job(job_id, due_date=None):
+    person_days = job_person_days(job_id)
+    if due_date is not None:
+        due_date = date.fromisoformat(str(due_date)).isoformat()
+    with _schedule_lock:
+        if job_id in accepted_jobs:
+            # Changed estimate: a full re-solve keeps the rest of the plan honest
+            accepted_jobs[job_id].update({"person_days": person_days, "due_date": due_date})
+            _solve(schedule["objective"])
+        else:
+            accepted_jobs[job_id] = {
+                "person_days": person_days,
+                "due_date": due_date,
+                "sequence": next(_acceptance_sequence),
+            }
+            if not schedule["crew_free_day"]:
+                schedule["crew_free_day"] = {crew["crew_id"]: 0 for crew in crew_roster}
+            # Incremental: slot the new job behind existing work instead of re-solving
+            schedule["assignments"][job_id] = _assign(job_id, schedule["crew_free_day"])
+            _notify(job_id, schedule["assignments"][job_id])
+        return _describe(schedule["assignments"][job_id])
+
+
+def release_job(job_id):
+    with _schedule_lock:
+        if accepted_jobs.pop(job_id, None) is None:
+            raise ValueError(f"Job ID {job_id} is not on the schedule.")
+        _notify(job_id, None)
+        _solve(schedule["objective"])
+        return schedule_summary()
+
+
+def projected_start(person_days):
+    # Read-only: where a new quote would land if accepted right now
+    with _schedule_lock:
+        crew_free_day = dict(schedule["crew_free_day"]) or {crew["crew_id"]: 0 for crew in crew_roster}
+        best = None
+        for crew in crew_roster:
+            start = crew_free_day.get(crew["crew_id"], 0)
+            finish = start + crew_days_needed(person_days, crew["size"])
+            if best is None or finish < best[2]:
+                best = (crew, start, finish)
+        crew, start, finish = best
+        return {
+            "crew_id": crew["crew_id"],
+            "crew_size": crew["size"],
+            "projected_start_date": working_date(start).isoformat(),
+            "projected_end_date": working_date(finish - 1).isoformat(),
+            "working_days": finish - start,
+        }
+
+
+# === Reporting ===
+def _describe(assignment):
+    job = accepted_jobs[assignment["job_id"]]
+    end_date = working_date(assignment["end_day"] - 1)
+    described = {
+        **assignment,
+        "start_date": working_date(assignment["start_day"]).isoformat(),
+        "end_date": end_date.isoformat(),
+        "due_date": job["due_date"],
+    }
+    if job["due_date"]:
+        described["days_late"] = max(0, (end_date - date.fromisoformat(job["due_date"])).days)
+    return described
+
+
+def current_schedule():
+    with _schedule_lock:
+        return schedule_summary()
+
+
+def schedule_summary():
+    assignments = [_describe(a) for a in schedule["assignments"].values()]
+    assignments.sort(key=lambda a: (a["start_day"], a["crew_id"]))
+    makespan = max(schedule["crew_free_day"].values(), default=0)
+    return {
+        "objective": schedule["objective"],
+        "job_count": len(assignments),
+        "makespan_working_days": makespan,
+        "completion_date": working_date(makespan - 1).isoformat() if makespan else None,
+        "total_days_late": sum(a.get("days_late", 0) for a in assignments),
+        "crews": crew_roster,
+        "assignments": assignments,
+    }
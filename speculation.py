@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import calibration
+import tracing
+import util
+
+
+# === Speculative Precompute ===
+# Saving fence details is almost always followed by a cost estimate and the
+# proposal / spec sheet PDFs, so those are started in the background right
+# away. Every result is tied to a fingerprint of the inputs it was built from;
+# once the job changes, the result is never served.
+SPECULATION_WORKERS = 2
+# Longest a request waits on a render that is already running; one still
+# queued behind other jobs is cancelled and the request renders inline
+SPECULATION_WAIT_SEC = 0.25
+MAX_SPECULATIONS = 256
+
+FINGERPRINT_FIELDS = ("proposal_to", "phone", "email", "job_address", "job_name", "notes", "fence_details")
+
+speculative_tasks = OrderedDict()
+speculation_stats = {"started": 0, "hits": 0, "misses": 0, "discarded": 0, "cancelled": 0}
+
+_speculations = OrderedDict()
+_speculation_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="speculation")
+
+
+class StaleSpeculation(Exception):
+    pass
+
+
+def register_task(kind, task):
+    speculative_tasks[kind] = task
+
+
+def fingerprint(job_id):
+    job = util.job_database.get(job_id)
+    if job is None:
+        return None
+    payload = {field: job.get(field) for field in FINGERPRINT_FIELDS}
+    payload["catalog_version"] = util.catalog_version
+    payload["labor_model_version"] = calibration.model_version
+    payload["date"] = date.today().isoformat()  # the spec sheet prints today's date
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _run(job_id, kind, expected):
+    with tracing.span(f"speculation.{kind}", job_id=job_id):
+        if fingerprint(job_id) != expected:
+            raise StaleSpeculation(job_id)
+        result = speculative_tasks[kind](job_id)
+        # Inputs changed mid-render: the result mixes old and new data
+        if fingerprint(job_id) != expected:
+            raise StaleSpeculation(job_id)
+        return result
+
+
+def _cancel(entry):
+    for future in entry["futures"].values():
+        if future.cancel():
+            speculation_stats["cancelled"] += 1
+
+
+def speculate(job_id):
+    expected = fingerprint(job_id)
+    if expected is None:
+        return
+    with _speculation_lock:
+        previous = _speculations.pop(job_id, None)
+        if previous is not None:
+            _cancel(previous)
+        _speculations[job_id] = {
+            "fingerprint": expected,
+            # bind() keeps the background renders in the saving request's trace
+            "futures": {kind: _executor.submit(tracing.bind(_run), job_id, kind, expected) for kind in speculative_tasks},
+        }
+        speculation_stats["started"] += 1
+        while len(_speculations) > MAX_SPECULATIONS:
+            _cancel(_speculations.popitem(last=False)[1])
+
+
+def discard(job_id):
+    with _speculation_lock:
+        entry = _speculations.pop(job_id, None)
+        if entry is not None:
+            _cancel(entry)
+            speculation_stats["discarded"] += 1
+
+
+def take(job_id, kind):
+    # The precomputed result if it still matches the job, else None
+    with _speculation_lock:
+        entry = _speculations.get(job_id)
+        future = entry["futures"].get(kind) if entry else None
+        if future is not None and entry["fingerprint"] != fingerprint(job_id):
+            _cancel(_speculations.pop(job_id))
+            future = None
+        # Still queued: rendering inline is quicker than waiting for a worker
+        if future is not None and future.cancel():
+            speculation_stats["cancelled"] += 1
+            future = None
+        if future is None:
+            speculation_stats["misses"] += 1
+            return None
+    try:
+        # Done, or running and likely to finish before an inline render would
+        result = future.result(timeout=SPECULATION_WAIT_SEC)
+    except Exception:
+        result = None
+    with _speculation_lock:
+        speculation_stats["hits" if result is not None else "misses"] += 1
+    return result
+
+
+def speculation_report():
+    with _speculation_lock:
+        return {
+            **speculation_stats,
+            "cached_jobs": len(_speculations),
+            "pending": sum(not f.done() for entry in _speculations.values() for f in entry["futures"].values()),
+        }
@@ -0,0 +1,133 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+
+# === Structured Logging ===
+# Modules log through logging.getLogger(__name__). Records that pass the level
+# check go onto a bounded queue and a background listener writes them to stderr
+# as JSON lines, so request threads never wait on console I/O. Configured from
+# the environment and adjustable at runtime through /admin/logging:
+#   AFC_LOG_LEVEL=INFO                  default level
+#   AFC_LOG_LEVELS=util=DEBUG,app=INFO  per-module overrides
+#   AFC_LOG_DEBUG_SAMPLE=0.05           fraction of DEBUG records kept
+LOG_QUEUE_SIZE = 10_000
+
+log_stats = {"dropped": 0, "sampled_out": 0}
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_listener = None
+_handler = None
+_sampler = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        # Anything passed through extra= becomes a field of its own
+        entry.update({k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate:
+            return True
+        log_stats["sampled_out"] += 1
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # A full queue means the console can't keep up; drop rather than block
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_stats["dropped"] += 1
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def set_level(name, level):
+    logger = logging.getLogger(name or None)
+    logger.setLevel(level.upper())  # ValueError for unknown level names
+
+
+def set_debug_sample(rate):
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError("debug_sample must be between 0 and 1")
+    _sampler.rate = rate
+
+
+def configure():
+    global _handler, _sampler
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    root.setLevel(os.environ.get("AFC_LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_levels(os.environ.get("AFC_LOG_LEVELS", "")).items():
+        set_level(name, level)
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _sampler = SamplingFilter(float(os.environ.get("AFC_LOG_DEBUG_SAMPLE", "1.0")))
+    _handler.addFilter(_sampler)
+    root.addHandler(_handler)
+    _start_listener(output)
+    atexit.register(lambda: _listener.stop())
+
+
+def _start_listener(output):
+    global _listener
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread doesn't survive fork (gunicorn preload starts workers
+    # this way); the child gets a fresh queue, in case the parent's lock was
+    # held mid-fork, and a listener of its own
+    if _listener is not None:
+        _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _start_listener(*_listener.handlers)
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def logging_report():
+    loggers = {
+        name: logging.getLevelName(logger.level)
+        for name, logger in sorted(logging.root.manager.loggerDict.items())
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET
+    }
+    return {
+        "root_level": logging.getLevelName(logging.getLogger().level),
+        "levels": loggers,
+        "debug_sample": _sampler.rate if _sampler else 1.0,
+        "queued": _listener.queue.qsize() if _listener else 0,
+        **log_stats,
+    }
@@ -0,0 +1,382 @@
+import ast
+import keyword
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+
+# === Takeoff Definitions ===
+# Each fence type (wood is keyed per style) lists intermediate variables and the
+# materials to order. Formulas are plain arithmetic over the inputs below, may
+# use "a if cond else b", and the helpers round_up / ceil / min / max. Every
+# material is rounded per its rule after evaluation:
+#   cents_up - round up to the cent (the default, matches the original takeoffs)
+#   ceil     - round up to a whole unit
+#   none     - leave as computed (use when the formula rounds internally)
+# "when" makes a material conditional on a flag expression. There is no **:
+# an exponent chain like 9 ** 9 ** 9 would never finish evaluating.
+INPUTS = ("lf", "cp", "ep", "height", "top_rail", "with_chain_link", "bob")
+
+FENCE_DEFINITIONS = {
+    "chain link": {
+        "variables": [
+            ("terminal_posts", "cp + ep"),
+            ("line_posts", "(lf / 8) - cp - ep"),
+            ("tension_wire", "(lf + 10) + (cp * 5) + (ep * 5)"),
+            ("brace_bands", "(cp * 2) + ep"),
+            ("tension_bands", "(cp * 2) * (height - 1) + (ep * (height - 1))"),
+            ("nuts_and_bolts", "brace_bands + tension_bands"),
+            ("tension_bars", "(cp * 2) + ep"),
+            ("rail_ends", "(cp * 2) + ep"),
+            ("chain_link_ties", "(lf * 12 / 10) + (line_posts * height)"),
+            ("hog_rings", "(lf * 12) / 10"),
+            ("bags_of_concrete", "(terminal_posts + line_posts) * 1.75"),
+        ],
+        "materials": [
+            {"name": "chain_link", "formula": "lf"},
+            {"name": "terminal_posts", "formula": "terminal_posts"},
+            {"name": "line_posts", "formula": "line_posts"},
+            {"name": "terminal_post_caps", "formula": "terminal_posts"},
+            {"name": "tension_wire", "formula": "tension_wire if top_rail else tension_wire * 2"},
+            {"name": "tension_bands", "formula": "tension_bands"},
+            {"name": "nuts_and_bolts", "formula": "nuts_and_bolts if top_rail else tension_bands"},
+            {"name": "tension_bars", "formula": "tension_bars"},
+            {"name": "chain_link_ties", "formula": "chain_link_ties if top_rail else line_posts * (height + 1)"},
+            {"name": "hog_rings", "rounding": "none",
+             "formula": "round_up(hog_rings) if top_rail else round_up((tension_wire * 12) / 10) * 2"},
+            {"name": "bags_of_concrete", "formula": "bags_of_concrete"},
+            {"name": "cans_of_spray_paint", "formula": "terminal_posts"},
+            {"name": "top_rail", "formula": "lf", "when": "top_rail"},
+            {"name": "eye_tops", "formula": "line_posts", "when": "top_rail"},
+            {"name": "brace_bands", "formula": "brace_bands", "when": "top_rail"},
+            {"name": "rail_ends", "formula": "rail_ends", "when": "top_rail"},
+            {"name": "line_post_caps", "formula": "line_posts", "when": "not top_rail"},
+        ],
+    },
+    "vinyl": {
+        "variables": [
+            ("line_posts", "lf / 8 - cp - ep"),
+            ("rails", "(lf / 16) * 3"),
+            ("tension_bars", "(cp * 2) + ep"),
+        ],
+        "materials": [
+            {"name": "corner_posts", "formula": "cp"},
+            {"name": "end_posts", "formula": "ep"},
+            {"name": "line_posts", "formula": "line_posts"},
+            {"name": "rails", "formula": "rails"},
+            {"name": "post_caps", "formula": "cp + ep + line_posts"},
+            {"name": "bags_of_concrete", "formula": "(cp + ep + line_posts) * 1.75"},
+            {"name": "chain_link_roll", "formula": "lf", "when": "with_chain_link"},
+            {"name": "tension_bars", "formula": "tension_bars", "when": "with_chain_link"},
+            {"name": "tension_wire", "formula": "(lf + 10) + (cp * 5) + (ep * 5)", "when": "with_chain_link"},
+            {"name": "hog_rings", "formula": "(lf * 12) / 10", "when": "with_chain_link"},
+            {"name": 'screws (1-1/4" - smaller)', "formula": "line_posts * 4", "when": "with_chain_link"},
+            {"name": "steel_clips", "formula": "line_posts * 4", "when": "with_chain_link"},
+            {"name": 'screws (3/8" - bigger)', "formula": "(tension_bars * 5) + (rails * 2)", "when": "with_chain_link"},
+            {"name": "screws", "formula": "rails * 2", "when": "not with_chain_link"},
+        ],
+    },
+    "wood:dogeared": {
+        "variables": [
+            ("posts", "lf / 8"),
+            ("rails", "(lf / 8) * 2"),
+            ("boards", "lf * 12 / 5.5"),  # 5.5" wide boards
+        ],
+        "materials": [
+            {"name": "postmaster_posts", "formula": "posts"},
+            {"name": "horizontal_rails", "formula": "rails"},
+            {"name": "boards", "formula": "boards"},
+            {"name": "screws", "formula": "rails * 4"},
+            {"name": "nails", "formula": "boards * 4"},
+            {"name": "bags_of_concrete", "formula": "posts * 2"},
+        ],
+    },
+    "wood:good neighbor": {
+        "variables": [
+            ("posts", "lf / 8"),
+            ("rails", "(lf / 8) * 3"),
+            ("boards", "(lf * 12 / 5.5) if bob else (lf * 12 / 7.5)"),
+            ("caps", "lf / 8"),
+            ("trim_boards", "(lf / 8) * 4"),
+        ],
+        "materials": [
+            {"name": "postmaster_posts", "formula": "posts"},
+            {"name": "horizontal_rails", "formula": "rails"},
+            {"name": "boards", "formula": "boards"},
+            {"name": "caps", "formula": "caps"},
+            {"name": "trim_boards", "formula": "trim_boards"},
+            {"name": "screws", "formula": "(rails * 4) + (caps * 4)"},
+            {"name": "nails", "formula": "(boards * 3) + (trim_boards * 2)"},
+            {"name": "bags_of_concrete", "formula": "posts * 2"},
+        ],
+    },
+    "sp wrought iron": {
+        "variables": [
+            ("panel", "lf / 8"),
+            ("posts", "lf / 8"),
+            ("sliders", "panel * 4"),
+        ],
+        "materials": [
+            {"name": "panel", "formula": "panel"},
+            {"name": "posts", "formula": "posts"},
+            {"name": "post_caps", "formula": "posts"},
+            {"name": "sliders", "formula": "sliders"},
+            {"name": "screws", "formula": "sliders"},
+            {"name": "cans_spray_paint", "formula": "panel / 8"},
+            {"name": "bags_of_concrete", "formula": "posts * 1.75"},
+        ],
+    },
+}
+
+ROUNDING_RULES = ("cents_up", "ceil", "none")
+
+_compiled = {}
+_definitions_lock = threading.Lock()
+
+
+def definition_key(fence_type, style=None):
+    fence_type = str(fence_type or "").strip().lower().replace("_", " ")
+    if fence_type == "wood":
+        return f"wood:{str(style or '').strip().lower()}"
+    return fence_type
+
+
+def wood_styles():
+    return sorted(key.split(":", 1)[1] for key in FENCE_DEFINITIONS if key.startswith("wood:"))
+
+
+# === Formula Validation ===
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call,
+    ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.USub, ast.UAdd, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+_FUNCTIONS = ("round_up", "ceil", "min", "max")
+# Names the generated takeoff functions use themselves
+_RESERVED_NAMES = ("materials", "OrderedDict", "takeoff", "takeoff_batch")
+
+
+def _parse(formula, known_names):
+    try:
+        tree = ast.parse(formula, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid takeoff formula {formula!r}: {e.msg}")
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in takeoff formula {formula!r}: {type(node).__name__}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+                raise ValueError(f"Only {', '.join(_FUNCTIONS)} may be called in takeoff formula {formula!r}")
+        elif isinstance(node, ast.Name) and node.id not in known_names and node.id not in _FUNCTIONS:
+            raise ValueError(f"Unknown name {node.id!r} in takeoff formula {formula!r}")
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numeric constants are allowed in takeoff formula {formula!r}")
+    return tree.body
+
+
+class _Vectorize(ast.NodeTransformer):
+    # Rewrites Python control flow into NumPy calls so one formula serves both evaluators
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return ast.Call(ast.Name("_where", ast.Load()), [node.test, node.body, node.orelse], [])
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        func = "_and" if isinstance(node.op, ast.And) else "_or"
+        expr = node.values[0]
+        for value in node.values[1:]:
+            expr = ast.Call(ast.Name(func, ast.Load()), [expr, value], [])
+        return expr
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.Call(ast.Name("_not", ast.Load()), [node.operand], [])
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        node.func = ast.Name(f"_v_{node.func.id}", ast.Load())
+        return node
+
+
+def _source(node, vectorized):
+    if vectorized:
+        node = ast.fix_missing_locations(_Vectorize().visit(node))
+    return ast.unparse(node)
+
+
+# === Code Generation ===
+def _round_up(value):
+    return math.ceil(value * 100) / 100
+
+
+_scalar_globals = {
+    "__builtins__": {},
+    "OrderedDict": OrderedDict,
+    "round_up": _round_up,
+    "ceil": lambda value: float(math.ceil(value)),
+    "min": min,
+    "max": max,
+}
+
+_vector_globals = {
+    "__builtins__": {},
+    "_np": np,
+    "_where": np.where,
+    "_and": np.logical_and,
+    "_or": np.logical_or,
+    "_not": np.logical_not,
+    "_v_round_up": lambda v: np.ceil(v * 100) / 100,
+    "_v_ceil": np.ceil,
+    "_v_min": np.minimum,
+    "_v_max": np.maximum,
+}
+
+
+def _rounded(expr, rule, vectorized):
+    if rule == "none":
+        return expr
+    prefix = "_v_" if vectorized else ""
+    return f"{prefix}{'round_up' if rule == 'cents_up' else 'ceil'}({expr})"
+
+
+def compile_definition(definition):
+    known = set(INPUTS)
+    variables = []
+    for name, formula in definition.get("variables", []):
+        if (not name.isidentifier() or keyword.iskeyword(name) or name.startswith("_")
+                or name in INPUTS or name in _FUNCTIONS or name in _RESERVED_NAMES):
+            raise ValueError(f"Invalid takeoff variable name: {name!r}")
+        variables.append((name, _parse(formula, known)))
+        known.add(name)
+
+    materials = []
+    for material in definition["materials"]:
+        rule = material.get("rounding", "cents_up")
+        if rule not in ROUNDING_RULES:
+            raise ValueError(f"Unknown rounding rule {rule!r} for {material['name']!r}")
+        when = _parse(material["when"], known) if material.get("when") else None
+        materials.append((material["name"], _parse(material["formula"], known), rule, when))
+
+    args = ", ".join(INPUTS)
+
+    # Scalar: one straight-line function returning the ordered materials dict
+    lines = [f"def takeoff({args}):"]
+    lines += [f"    {name} = {_source(node, False)}" for name, node in variables]
+    lines.append("    materials = OrderedDict()")
+    for name, node, rule, when in materials:
+        assign = f"materials[{name!r}] = {_rounded(_source(node, False), rule, False)}"
+        if when is not None:
+            lines.append(f"    if {_source(when, False)}:")
+            lines.append(f"        {assign}")
+        else:
+            lines.append(f"    {assign}")
+    lines.append("    return materials")
+    scalar_namespace = dict(_scalar_globals)
+    exec(compile("\n".join(lines), "<takeoff>", "exec"), scalar_namespace)
+
+    # Vectorized: same formulas over arrays; conditional materials are NaN where absent
+    lines = [f"def takeoff_batch({args}):"]
+    lines += [f"    {name} = {_source(node, True)}" for name, node in variables]
+    lines.append("    materials = {}")
+    for name, node, rule, when in materials:
+        expr = _rounded(_source(node, True), rule, True)
+        if when is not None:
+            expr = f"_np.where({_source(when, True)}, {expr}, _np.nan)"
+        lines.append(f"    materials[{name!r}] = _np.broadcast_to({expr}, _np.shape(lf)).astype(_np.float64)")
+    lines.append("    return materials")
+    vector_namespace = dict(_vector_globals)
+    exec(compile("\n".join(lines), "<takeoff_batch>", "exec"), vector_namespace)
+
+    return scalar_namespace["takeoff"], vector_namespace["takeoff_batch"]
+
+
+# Inputs every new definition is tried on before it replaces the old one
+SAMPLE_INPUTS = (
+    (8.0, 0, 0, 4, False, False, False),
+    (150.0, 2, 2, 6, True, True, True),
+    (2000.0, 12, 4, 8, True, False, False),
+)
+
+
+def _check_samples(key, compiled):
+    scalar, vector = compiled
+    try:
+        for sample in SAMPLE_INPUTS:
+            for name, value in scalar(*sample).items():
+                if not math.isfinite(value):
+                    raise ValueError(f"{name!r} is {value}")
+        vector(*(np.asarray(column) for column in zip(*SAMPLE_INPUTS)))
+    except (ArithmeticError, TypeError, ValueError) as e:
+        raise ValueError(f"Takeoff definition for {key!r} fails on sample inputs: {e}")
+
+
+def register_fence_definition(key, definition):
+    if not key.startswith("wood:") and key not in FENCE_DEFINITIONS:
+        raise ValueError(f"Unsupported fence type: {key}")
+    compiled = compile_definition(definition)
+    _check_samples(key, compiled)
+    with _definitions_lock:
+        FENCE_DEFINITIONS[key] = definition
+        _compiled[key] = compiled
+    return key
+
+
+def compile_all():
+    # Compiles every registered definition up front (gunicorn preload does
+    # this in the master so workers inherit the compiled evaluators)
+    for key in list(FENCE_DEFINITIONS):
+        _evaluators(key)
+    return len(_compiled)
+
+
+def _evaluators(key):
+    compiled = _compiled.get(key)
+    if compiled is None:
+        if key not in FENCE_DEFINITIONS:
+            if key.startswith("wood:"):
+                styles = "' or '".join(wood_styles())
+                raise ValueError(f"Unsupported wood fence style. Use '{styles}'.")
+            raise ValueError(f"Unsupported fence type: {key}")
+        with _definitions_lock:
+            compiled = _compiled.setdefault(key, compile_definition(FENCE_DEFINITIONS[key]))
+    return compiled
+
+
+# === Evaluation ===
+def takeoff(fence_type, lf, cp=0, ep=0, height=6, top_rail=False, with_chain_link=False, style=None, bob=False):
+    scalar, _ = _evaluators(definition_key(fence_type, style))
+    with metrics.stage("takeoff"):
+        return scalar(lf, cp, ep, height, bool(top_rail), bool(with_chain_link), bool(bob))
+
+
+def takeoff_batch(fence_type, lf, cp=0, ep=0, height=6, top_rail=False, with_chain_link=False, style=None, bob=False):
+    _, vector = _evaluators(definition_key(fence_type, style))
+    lf, cp, ep, height, top_rail, with_chain_link, bob = np.broadcast_arrays(
+        np.asarray(lf, dtype=float),
+        np.asarray(cp, dtype=float),
+        np.asarray(ep, dtype=float),
+        np.asarray(height, dtype=float),
+        np.asarray(top_rail, dtype=bool),
+        np.asarray(with_chain_link, dtype=bool),
+        np.asarray(bob, dtype=bool),
+    )
+    return vector(lf, cp, ep, height, top_rail, with_chain_link, bob)
+
+
+def batch_rows(materials, count):
+    # Back to one ordered dict per row, dropping materials a row doesn't use
+    rows = [OrderedDict() for _ in range(count)]
+    for name, values in materials.items():
+        for i, value in enumerate(values.tolist()):
+            if value == value:  # NaN marks an absent conditional material
+                rows[i][name] = value
+    return rows
@@ -0,0 +1,321 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+# === Request Tracing ===
+# Lightweight spans with W3C trace context. A client that sends a
+# "traceparent" header gets its trace id carried through the request, into
+# the threadpool and speculative workers, and back out on the response.
+# Finished spans go to an in-memory collector (last TRACES_KEPT traces, served
+# from /admin/traces) and, when AFC_TRACE_FILE is set, to that file as one
+# OTLP/JSON span per line. AFC_TRACE_SAMPLE sets the fraction of new traces
+# recorded; an incoming traceparent's sampled flag is honoured as-is.
+TRACES_KEPT = 200
+MAX_SPANS_PER_TRACE = 1000  # a bulk import is one trace; keep it bounded
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+SERVICE_NAME = "afc-proposal"
+
+_current = contextvars.ContextVar("current_span", default=None)
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+_exporter = None
+_export_path = None
+_export_background = False
+tracing_stats = {"spans": 0, "dropped": 0}
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, trace_id, parent_id=None, kind="internal", attributes=None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": {"internal": 1, "server": 2, "client": 3}[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _new_trace_id():
+    return f"{random.getrandbits(128):032x}"
+
+
+# === Collecting ===
+def _finish(span):
+    span.end_ns = time.time_ns()
+    with _traces_lock:
+        spans = _traces.get(span.trace_id)
+        if spans is None:
+            spans = _traces[span.trace_id] = []
+            while len(_traces) > TRACES_KEPT:
+                _traces.popitem(last=False)
+        # The cap only limits what's held in memory; the file still gets everything
+        if len(spans) < MAX_SPANS_PER_TRACE:
+            spans.append(span)
+            tracing_stats["spans"] += 1
+        else:
+            tracing_stats["dropped"] += 1
+    if _exporter is not None:
+        _exporter(span.to_otlp())
+
+
+def _export_line(record):
+    return json.dumps({"resource": {"service.name": SERVICE_NAME, "pid": os.getpid()}, "span": record}) + "\n"
+
+
+def _write_spans(path, spans):
+    with open(path, "a", buffering=1) as f:
+        while True:
+            record = spans.get()
+            if record is None:
+                return
+            f.write(_export_line(record))
+
+
+def configure_file_export(path=None, background=True):
+    # background=False writes each span synchronously; used by pool workers,
+    # which exit without running atexit handlers, and replaces a background
+    # exporter inherited across fork
+    global _exporter, _export_path, _export_background
+    path = path or os.environ.get("AFC_TRACE_FILE")
+    if not path or (_exporter is not None and (background or not _export_background)):
+        return
+    _export_path, _export_background = path, background
+
+    if not background:
+        f = open(path, "a", buffering=1)
+        lock = threading.Lock()
+
+        def export(record):
+            with lock:
+                f.write(_export_line(record))
+        _exporter = export
+        return
+
+    spans = queue.SimpleQueue()
+    writer = threading.Thread(target=_write_spans, args=(path, spans), name="trace-export", daemon=True)
+    writer.start()
+    _exporter = spans.put
+
+    def flush():
+        spans.put(None)
+        writer.join(timeout=2)
+    atexit.register(flush)
+
+
+def _restart_after_fork():
+    # A forked child (gunicorn worker, pool process) gets the queue but not
+    # the thread draining it
+    global _exporter
+    if _exporter is not None and _export_background:
+        _exporter = None
+        configure_file_export(_export_path)
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+# === Creating Spans ===
+class span:
+    # Child of the current span; does nothing when no trace is active
+    __slots__ = ("name", "attributes", "kind", "span", "token")
+
+    def __init__(self, name, kind="internal", **attributes):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is None:
+            return None
+        self.span = Span(self.name, parent.trace_id, parent.span_id, self.kind, self.attributes)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return
+        if exc is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self.token)
+        _finish(self.span)
+
+
+def traced(func):
+    name = func.__qualname__ if func.__module__ in (None, "__main__") else f"{func.__module__}.{func.__qualname__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return func(*args, **kwargs)
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def start_trace(name, traceparent=None, kind="internal", sample_rate=None, **attributes):
+    # Root (or remote-parented) span for a request or a background job.
+    # Returns None when the trace isn't sampled.
+    match = TRACEPARENT.match(traceparent.strip().lower()) if traceparent else None
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        if not int(flags, 16) & 1:
+            return None
+    else:
+        if sample_rate is None:
+            sample_rate = float(os.environ.get("AFC_TRACE_SAMPLE", "1.0"))
+        if random.random() >= sample_rate:
+            return None
+        trace_id, parent_id = _new_trace_id(), None
+    return Span(name, trace_id, parent_id, kind, attributes)
+
+
+class activate:
+    # Makes a span current for the duration of a block and finishes it after
+    __slots__ = ("span", "token")
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        if self.span is not None:
+            self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return
+        if exc is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self.token)
+        _finish(self.span)
+
+
+def current_traceparent():
+    current = _current.get()
+    return current.traceparent if current is not None else None
+
+
+def bind(func):
+    # Carries the caller's current span into executor threads, which don't
+    # inherit contextvars on their own. Only the span: the request's other
+    # context (its Server-Timing stages, profiling session) stays behind so
+    # background work can't write into a response that is being sent.
+    context = contextvars.Context()
+    context.run(_current.set, _current.get())
+    return functools.partial(context.run, func)
+
+
+# === Reading Back ===
+def list_traces(limit=50):
+    with _traces_lock:
+        traces = list(_traces.items())[-limit:]
+    summaries = []
+    for trace_id, spans in reversed(traces):
+        root = min(spans, key=lambda s: s.start_ns)
+        end = max(s.end_ns for s in spans)
+        summaries.append({
+            "trace_id": trace_id,
+            "root": root.name,
+            "spans": len(spans),
+            "duration_ms": round((end - root.start_ns) / 1e6, 3),
+            "errors": sum(1 for s in spans if s.error),
+        })
+    return summaries
+
+
+def get_trace(trace_id):
+    with _traces_lock:
+        spans = list(_traces.get(trace_id, ()))
+    return [s.to_otlp() for s in sorted(spans, key=lambda s: s.start_ns)]
+
+
+# === ASGI Middleware ===
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        traceparent = headers.get(b"traceparent")
+        root = start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent.decode("latin-1") if traceparent else None,
+            kind="server",
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        )
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_traceparent(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                message = {**message, "headers": [*message.get("headers", []), (b"traceparent", root.traceparent.encode())]}
+            await send(message)
+
+        with activate(root):
+            try:
+                await self.app(scope, receive, send_with_traceparent)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    root.name = f"{scope['method']} {route.path}"
+                    root.set("http.route", route.path)
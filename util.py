@@ -1,7 +1,13 @@
+import logging
 import math
 import uuid
-from collections import OrderedDict
 
+import calibration
+import metrics
+import takeoff
+import tracing
+
+logger = logging.getLogger(__name__)
 
 # Default labor values
 default_labor_values = {
@@ -358,6 +364,110 @@ pricing_tables = {
     "Fence Specialties Pricing": fence_specialties_pricing
 }
 
+
+# === Catalog Version ===
+# Bumped every time a unit price or unit size changes so anything derived from
+# the pricing tables (price curves, cached estimates) can tell it is stale.
+catalog_version = 0
+catalog_listeners = []
+
+
+def register_catalog_listener(listener):
+    catalog_listeners.append(listener)
+
+
+def notify_catalog_changed():
+    global catalog_version
+    catalog_version += 1
+    for listener in list(catalog_listeners):
+        listener(catalog_version)
+    return catalog_version
+
+
+def resolve_price_table(
+    fence_type,
+    pricing_strategy=None,
+    height=None,
+    top_rail=True,
+    with_chain_link=False,
+    style=None,
+    bob=False
+):
+    # Same table selection calculate_total_costs uses for each fence type
+    fence_type = str(fence_type or "").strip().lower().replace("_", " ")
+
+    if fence_type == "vinyl":
+        vinyl_height = int(height) if height is not None else None
+        pricing_dict = VINYL_CHAINLINK_PRICING if with_chain_link else VINYL_PRICING
+        if vinyl_height not in pricing_dict:
+            raise ValueError(f"No vinyl pricing found for height {vinyl_height}")
+        return pricing_dict[vinyl_height]
+
+    if fence_type == "sp wrought iron":
+        iron_height = int(height) if height is not None else None
+        if iron_height not in SP_WROUGHT_IRON_PRICING:
+            raise ValueError(f"No SP Wrought Iron pricing found for height {iron_height}")
+        return SP_WROUGHT_IRON_PRICING[iron_height]
+
+    if fence_type == "wood":
+        key = (str(style).strip().lower(), int(height) if height is not None else 6, bool(bob))
+        if key not in WOOD_PRICING:
+            raise ValueError(f"No wood pricing found for style={key[0]}, height={key[1]}, bob={key[2]}")
+        return WOOD_PRICING[key]
+
+    if pricing_strategy not in pricing_tables:
+        raise ValueError(f"Unknown pricing strategy: {pricing_strategy}")
+    key = (str(height), bool(top_rail))
+    if key not in pricing_tables[pricing_strategy]:
+        raise ValueError(f"No {pricing_strategy} found for height {height}, top_rail={bool(top_rail)}")
+    return pricing_tables[pricing_strategy][key]
+
+
+def register_price_table(
+    fence_type,
+    price_table,
+    pricing_strategy=None,
+    height=None,
+    top_rail=True,
+    with_chain_link=False,
+    style=None,
+    bob=False
+):
+    fence_type = str(fence_type or "").strip().lower().replace("_", " ")
+
+    if fence_type == "vinyl":
+        pricing_dict = VINYL_CHAINLINK_PRICING if with_chain_link else VINYL_PRICING
+        pricing_dict[int(height)] = price_table
+    elif fence_type == "sp wrought iron":
+        SP_WROUGHT_IRON_PRICING[int(height)] = price_table
+    elif fence_type == "wood":
+        WOOD_PRICING[(str(style).strip().lower(), int(height) if height is not None else 6, bool(bob))] = price_table
+    elif fence_type == "chain link":
+        if pricing_strategy not in pricing_tables:
+            raise ValueError(f"Unknown pricing strategy: {pricing_strategy}")
+        pricing_tables[pricing_strategy][(str(height), bool(top_rail))] = price_table
+    else:
+        raise ValueError(f"Unsupported fence type: {fence_type}")
+    notify_catalog_changed()
+
+
+def register_takeoff_definition(fence_type, definition, style=None, price_table=None, **config):
+    # New styles are data: compile the formulas, then price them like any other table
+    key = takeoff.register_fence_definition(takeoff.definition_key(fence_type, style), definition)
+    if price_table is not None:
+        register_price_table(fence_type, price_table, style=style, **config)
+    return key
+
+
+def update_catalog_price(fence_type, material, unit_price, unit_size=None, **config):
+    price_table = resolve_price_table(fence_type, **config)
+    entry = price_table.setdefault(material, {"unit_size": 1, "unit_price": 0.0})
+    entry["unit_price"] = float(unit_price)
+    if unit_size is not None:
+        entry["unit_size"] = unit_size
+    notify_catalog_changed()
+    return dict(entry)
+
 def save_job_details(proposal_to, phone, email, job_address, job_name, notes=''):
     job_id = str(uuid.uuid4())
     job_data = {
@@ -424,6 +534,22 @@ def save_fence_details(job_id, fence_type, **kwargs):
 
     return materials_needed
 
+def save_cost_estimate(job_id, total_costs, crew_size, labor_inputs, pricing_inputs=None):
+    # Persist cost data for later summary, scheduling, calibration and repricing
+    job = job_database[job_id]
+    job["costs"] = {
+        "material_total":       total_costs["material_total"],
+        "material_tax":         total_costs["material_tax"],
+        "delivery_charge":      total_costs["delivery_charge"],
+        "labor_costs":          total_costs["labor_costs"],             # contains num_days, total_labor_cost, etc.
+        "price_per_linear_foot": total_costs["price_per_linear_foot"],
+    }
+    job["estimated_days"] = total_costs["labor_costs"]["num_days"]
+    job["crew_size"] = crew_size
+    job["labor_inputs"] = labor_inputs
+    if pricing_inputs is not None:
+        job["pricing_inputs"] = pricing_inputs
+
 def calculate_materials_router(fence_type, **kwargs):
     if fence_type.lower() == "chain link":
         return calculate_materials_chain_link(
@@ -460,161 +586,28 @@ def calculate_materials_router(fence_type, **kwargs):
     else:
         raise ValueError(f"Unsupported fence type: {fence_type}")
 
+@tracing.traced
 def calculate_materials_chain_link(lf, cp, ep, height, top_rail):
-    def round_up(value):
-        return math.ceil(value * 100) / 100
-
-    terminal_posts = cp + ep
-    line_posts = (lf / 8) - cp - ep
-    tension_wire = (lf + 10) + (cp * 5) + (ep * 5)
-    brace_bands = (cp * 2) + ep
-    tension_bands = (cp * 2) * (height - 1) + (ep * (height - 1))
-    nuts_and_bolts = brace_bands + tension_bands
-    tension_bars = (cp * 2) + ep
-    rail_ends = (cp * 2) + ep
-    chain_link_ties = (lf * 12 / 10) + (line_posts * height)
-    hog_rings = (lf * 12) / 10
-    bags_of_concrete = (terminal_posts + line_posts) * 1.75
-    cans_of_spray_paint = terminal_posts
-
-    materials = OrderedDict([
-        ("chain_link", round_up(lf)),
-        ("terminal_posts", round_up(terminal_posts)),
-        ("line_posts", round_up(line_posts)),
-        ("terminal_post_caps", round_up(terminal_posts)),
-        ("tension_wire", round_up(tension_wire if top_rail else tension_wire * 2)),
-        ("tension_bands", round_up(tension_bands)),
-        ("nuts_and_bolts", round_up(nuts_and_bolts if top_rail else tension_bands)),
-        ("tension_bars", round_up(tension_bars)),
-        ("chain_link_ties", round_up(chain_link_ties) if top_rail else round_up(line_posts * (height + 1))),
-        ("hog_rings", round_up(hog_rings) if top_rail else round_up((tension_wire * 12) / 10) * 2),
-        ("bags_of_concrete", round_up(bags_of_concrete)),
-        ("cans_of_spray_paint", round_up(cans_of_spray_paint)),
-    ])
-
-    if top_rail:
-        materials["top_rail"] = round_up(lf)
-        materials["eye_tops"] = round_up(line_posts)
-        materials["brace_bands"] = round_up(brace_bands)
-        materials["rail_ends"] = round_up(rail_ends)
-    else:
-        materials["line_post_caps"] = round_up(line_posts)
-
-    return materials
+    return takeoff.takeoff("chain link", lf, cp=cp, ep=ep, height=height, top_rail=top_rail)
 
+@tracing.traced
 def calculate_materials_vinyl(lf, cp, ep, height, with_chain_link):
-    def round_up(value):
-        return math.ceil(value * 100) / 100
-
-    # Base vinyl calculations
-    line_posts = lf / 8 - cp - ep
-    rails = (lf / 16) * 3
-    post_caps = cp + ep + line_posts
-    bags_of_concrete = (cp + ep + line_posts) * 1.75
-
-    materials = OrderedDict([
-        ("corner_posts", round_up(cp)),
-        ("end_posts", round_up(ep)),
-        ("line_posts", round_up(line_posts)),
-        ("rails", round_up(rails)),
-        ("post_caps", round_up(post_caps)),
-        ("bags_of_concrete", round_up(bags_of_concrete)),
-    ])
-
-    if with_chain_link:
-        tension_bars = (cp * 2) + ep
-        hog_rings = (lf * 12) / 10
-        tension_wire = (lf + 10) + (cp * 5) + (ep * 5)
-
-        materials["chain_link_roll"] = round_up(lf)
-        materials["tension_bars"] = round_up(tension_bars)
-        materials["tension_wire"] = round_up(tension_wire)
-        materials["hog_rings"] = round_up(hog_rings)
-        materials['screws (1-1/4" - smaller)'] = round_up(line_posts * 4)
-        materials["steel_clips"] = round_up(line_posts * 4)  # Equal to smaller screws
-        materials['screws (3/8" - bigger)'] = round_up((tension_bars * 5) + (rails * 2))
-    else:
-        materials["screws"] = round_up(rails * 2)
-
-    return materials
+    return takeoff.takeoff("vinyl", lf, cp=cp, ep=ep, height=height, with_chain_link=with_chain_link)
 
+@tracing.traced
 def calculate_materials_wood(lf, style, bob=False, height=6):
-    def round_up(value):
-        return math.ceil(value * 100) / 100
-
-    materials = OrderedDict()
-
-    if style.lower() == "dogeared":
-        posts = lf / 8
-        rails = (lf / 8) * 2
-        boards = (lf * 12 / 5.5)  # Assuming 5.5" wide boards
-        screws = (rails * 4)
-        nails = boards * 4
-        concrete = posts * 2
-
-        materials.update({
-            "postmaster_posts": round_up(posts),
-            "horizontal_rails": round_up(rails),
-            "boards": round_up(boards),
-            "screws": round_up(screws),
-            "nails": round_up(nails),
-            "bags_of_concrete": round_up(concrete)
-        })
-
-    elif style.lower() == "good neighbor":
-        posts = lf / 8
-        rails = (lf / 8) * 3
-        boards = (lf * 12 / 5.5) if bob else (lf * 12 / 7.5)
-        caps = lf / 8
-        trim_boards = (lf / 8) * 4
-        screws = (rails * 4) + (caps * 4)
-        nails = (boards * 3) + (trim_boards * 2)
-        concrete = posts * 2
-
-        materials.update({
-            "postmaster_posts": round_up(posts),
-            "horizontal_rails": round_up(rails),
-            "boards": round_up(boards),
-            "caps": round_up(caps),
-            "trim_boards": round_up(trim_boards),
-            "screws": round_up(screws),
-            "nails": round_up(nails),
-            "bags_of_concrete": round_up(concrete)
-        })
-
-    else:
-        raise ValueError("Unsupported wood fence style. Use 'dogeared' or 'good neighbor'.")
-
-    return materials
+    return takeoff.takeoff("wood", lf, height=height, style=style, bob=bob)
 
+@tracing.traced
 def calculate_materials_sp_wrought_iron(lf, height):
-    def round_up(value):
-        return math.ceil(value * 100) / 100
-
-    panel = lf / 8
-    posts = lf / 8
-    sliders = panel * 4
-    screws = sliders
-    bags_of_concrete = posts * 1.75
-    spray_paint = panel / 8
-
-    materials = OrderedDict({
-        "panel": round_up(panel),
-        "posts": round_up(posts),
-        "post_caps": round_up(posts),
-        "sliders": round_up(sliders),
-        "screws": round_up(screws),
-        "cans_spray_paint": round_up(spray_paint),
-        "bags_of_concrete": round_up(bags_of_concrete),
-    })
-
-    return materials
+    return takeoff.takeoff("sp wrought iron", lf, height=height)
 
 def add_notes_to_job(job_id, notes):
     if job_id not in job_database:
         raise ValueError(f"Job ID {job_id} does not exist.")
     job_database[job_id]["notes"] = notes
 
+@tracing.traced
 def calculate_material_costs(
     materials,
     custom_prices=None,
@@ -710,6 +703,7 @@ def calculate_material_costs(
     return detailed_costs, round(total_cost, 2)
 
 
+@tracing.traced
 def calculate_vinyl_material_costs(
     materials,
     custom_prices=None,
@@ -733,17 +727,14 @@ def calculate_vinyl_material_costs(
 
     pricing = pricing_dict[vinyl_height]
 
-    # === DEBUG START ===
-    print("==== MATERIALS KEYS:", list(materials.keys()))
-    print("==== PRICING KEYS:", list(pricing.keys()))
-
-    for mat in materials.keys():
-        if mat not in pricing.keys():
-            print(f"KEY NOT FOUND IN PRICING: '{mat}'")
-    for mat in pricing.keys():
-        if mat not in materials.keys():
-            print(f"KEY NOT FOUND IN MATERIALS: '{mat}'")
-    # === DEBUG END ===
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "vinyl pricing keys",
+            extra={
+                "not_in_pricing": sorted(set(materials) - set(pricing)),
+                "not_in_materials": sorted(set(pricing) - set(materials)),
+            }
+        )
 
     # Build lookup tables
     merged_prices = {k: v["unit_price"] for k, v in pricing.items()}
@@ -768,11 +759,12 @@ def calculate_vinyl_material_costs(
             }
             total_cost += material_total
         else:
-            print(f"WARNING: Material '{material}' is missing from merged_prices/pricing dictionary!")
+            logger.warning("Material %r is missing from the vinyl pricing table", material)
 
     # RETURN TWO VALUES!
     return detailed_costs, round(total_cost, 2)
 
+@tracing.traced
 def calculate_sp_wrought_iron_material_costs(
     materials,
     custom_prices=None,
@@ -782,11 +774,7 @@ def calculate_sp_wrought_iron_material_costs(
 ):
 
     import math
-    print("🛠️ DEBUG SP WROUGHT IRON MATERIAL COSTS")
-    print("  materials:", materials)
-    print("  height:", height)
-    print("  pricing dict keys:", SP_WROUGHT_IRON_PRICING.keys())
-    print("  pricing_strategy:", pricing_strategy)
+    logger.debug("sp wrought iron material costs: materials=%s height=%s pricing_strategy=%s", materials, height, pricing_strategy)
 
     custom_prices = custom_prices or {}
 
@@ -800,10 +788,6 @@ def calculate_sp_wrought_iron_material_costs(
 
     pricing = pricing_dict[iron_height]
 
-    # --- INSERT THIS PRINT STATEMENT HERE ---
-    print("🔎 Loaded pricing dict for height", iron_height, ":", pricing)
-    # ----------------------------------------
-
     # Build lookup tables for prices and unit sizes
     merged_prices = {k: v["unit_price"] for k, v in pricing.items()}
     unit_sizes = {k: v["unit_size"] for k, v in pricing.items()}
@@ -813,9 +797,7 @@ def calculate_sp_wrought_iron_material_costs(
     total_cost = 0
 
     for material, quantity in materials.items():
-        print(f"Material: {material}, Quantity: {quantity}")
         if material in merged_prices:
-            print(f"  Found in pricing! Unit price: {merged_prices[material]}, Unit size: {unit_sizes[material]}")
             unit_size = unit_sizes.get(material, 1)
             order_size = math.ceil(quantity / unit_size)
             unit_price = round(merged_prices.get(material, 0), 2)
@@ -831,6 +813,7 @@ def calculate_sp_wrought_iron_material_costs(
 
     return detailed_costs, round(total_cost, 2)
 
+@tracing.traced
 def calculate_wood_material_costs(
     materials,
     custom_prices=None,
@@ -838,8 +821,7 @@ def calculate_wood_material_costs(
     height=None,
     bob=False
 ):
-    print("WOOD LOOKUP DEBUG -- style:", style, "height:", height, "bob:", bob)
-    print("WOOD LOOKUP KEY:", (style, int(height), bool(bob)))
+    logger.debug("wood price lookup", extra={"style": style, "height": height, "bob": bob})
     import math
 
     custom_prices = custom_prices or {}
@@ -881,15 +863,20 @@ def calculate_wood_material_costs(
 
 
 
-# === Labor Duration (num_days) ===
-def calculate_num_days(
+# Labor and margin constants shared with the vectorized repricer (repricing.py)
+PANEL_LENGTH_FT = 8.0
+WORK_HOURS_PER_DAY = 6.0
+PROFIT_MARGINS = (0.2, 0.3, 0.4, 0.5)
+
+
+# === Adjusted Labor Hours (whole crew, before splitting into days) ===
+def calculate_adjusted_labor_hours(
     linear_feet: float,
-    crew_size: int = 3,
     panel_install_time_min: float = 106.25,
-    panel_length_ft: float = 8.0,
-    work_hours_per_day: float = 6.0,
+    panel_length_ft: float = PANEL_LENGTH_FT,
     dirt_complexity: float = 1.0,
     grade_of_slope_complexity: float = 1.0,
+    productivity: float = 1.0
 ) -> float:
     panel_install_time_hr = panel_install_time_min / 60.0
     time_per_linear_foot = panel_install_time_hr / panel_length_ft
@@ -897,7 +884,28 @@ def calculate_num_days(
 
     # Combined complexity logic: (dirt + slope) - 1
     complexity_multiplier = (dirt_complexity + grade_of_slope_complexity) - 1
-    adjusted_hours = total_hours * complexity_multiplier
+    return (total_hours * complexity_multiplier) / productivity
+
+
+# === Labor Duration (num_days) ===
+def calculate_num_days(
+    linear_feet: float,
+    crew_size: int = 3,
+    panel_install_time_min: float = 106.25,
+    panel_length_ft: float = PANEL_LENGTH_FT,
+    work_hours_per_day: float = WORK_HOURS_PER_DAY,
+    dirt_complexity: float = 1.0,
+    grade_of_slope_complexity: float = 1.0,
+    productivity: float = 1.0,
+) -> float:
+    adjusted_hours = calculate_adjusted_labor_hours(
+        linear_feet=linear_feet,
+        panel_install_time_min=panel_install_time_min,
+        panel_length_ft=panel_length_ft,
+        dirt_complexity=dirt_complexity,
+        grade_of_slope_complexity=grade_of_slope_complexity,
+        productivity=productivity
+    )
 
     adjusted_hours_per_crew = adjusted_hours / crew_size
     estimated_days = adjusted_hours_per_crew / work_hours_per_day
@@ -905,20 +913,26 @@ def calculate_num_days(
 
 
 # === Labor Cost ===
+@tracing.traced
 def calculate_labor_cost(
     linear_feet: float,
     crew_size: int = 3,
     daily_rate: float = None,
     dirt_complexity: float = 1.0,
-    grade_of_slope_complexity: float = 1.0
+    grade_of_slope_complexity: float = 1.0,
+    fence_type: str = None,
+    soil: str = None,
+    productivity: float = 1.0
 ) -> dict:
     daily_rate = daily_rate if daily_rate is not None else default_labor_values["daily_rate"]
 
     num_days = calculate_num_days(
         linear_feet=linear_feet,
         crew_size=crew_size,
+        panel_install_time_min=calibration.install_time_minutes(fence_type, soil),
         dirt_complexity=dirt_complexity,
-        grade_of_slope_complexity=grade_of_slope_complexity
+        grade_of_slope_complexity=grade_of_slope_complexity,
+        productivity=productivity
     )
 
     labor_cost_per_day = daily_rate * crew_size
@@ -932,15 +946,20 @@ def calculate_labor_cost(
 
 
 # === Duration Table (Crew Sizes 3–15) ===
+@tracing.traced
 def generate_labor_duration_options(
     linear_feet: float,
-    panel_install_time_min: float = 106.25,
-    panel_length_ft: float = 8.0,
-    work_hours_per_day: float = 6.0,
+    panel_install_time_min: float = None,
+    panel_length_ft: float = PANEL_LENGTH_FT,
+    work_hours_per_day: float = WORK_HOURS_PER_DAY,
     dirt_complexity: float = 1.0,
     grade_of_slope_complexity: float = 1.0,
-    productivity: float = 1.0  # <-- new parameter
+    productivity: float = 1.0,  # <-- new parameter
+    fence_type: str = None,
+    soil: str = None
 ) -> list[dict]:
+    if panel_install_time_min is None:
+        panel_install_time_min = calibration.install_time_minutes(fence_type, soil)
     panel_install_time_hr = panel_install_time_min / 60.0
     time_per_linear_foot = panel_install_time_hr / panel_length_ft
     total_hours = linear_feet * time_per_linear_foot
@@ -948,25 +967,23 @@ def generate_labor_duration_options(
     complexity_multiplier = (dirt_complexity + grade_of_slope_complexity) - 1
     adjusted_hours = (total_hours * complexity_multiplier) / productivity  # <-- updated line
 
-    print("🔍 Labor Estimator Debug:")
-    print(f"Linear Feet: {linear_feet}")
-    print(f"Panel Install Time (min): {panel_install_time_min}")
-    print(f"Panel Length (ft): {panel_length_ft}")
-    print(f"Time per LF (hr): {time_per_linear_foot}")
-    print(f"Total Raw Labor Hours: {total_hours}")
-    print(f"Dirt Complexity: {dirt_complexity}")
-    print(f"Slope Complexity: {grade_of_slope_complexity}")
-    print(f"Productivity: {productivity}")
-    print(f"Complexity Multiplier: {complexity_multiplier}")
-    print(f"Adjusted Labor Hours: {adjusted_hours}")
+    logger.debug(
+        "labor estimate",
+        extra={
+            "linear_feet": linear_feet,
+            "panel_install_time_min": panel_install_time_min,
+            "raw_hours": total_hours,
+            "dirt_complexity": dirt_complexity,
+            "slope_complexity": grade_of_slope_complexity,
+            "productivity": productivity,
+            "adjusted_hours": adjusted_hours,
+        }
+    )
 
     options = []
     for crew_size in range(3, 16, 3):
         adjusted_crew_hours = adjusted_hours / crew_size
         estimated_days = adjusted_crew_hours / work_hours_per_day
-
-        print(f"Crew Size: {crew_size}, Estimated Days: {estimated_days}")
-
         options.append({
             "crew_size": crew_size,
             "estimated_days": round(estimated_days, 6)
@@ -985,7 +1002,122 @@ dirt_scores = {
 }
 
 
+# === Quiet Material Pricing (no debug output, used by precomputed curves) ===
+def price_materials(materials, pricing, custom_prices=None):
+    merged_prices = {k: v["unit_price"] for k, v in pricing.items()}
+    unit_sizes = {k: v["unit_size"] for k, v in pricing.items()}
+    merged_prices.update(custom_prices or {})
+
+    detailed_costs = {}
+    total_cost = 0
+
+    for material, quantity in materials.items():
+        if material in merged_prices:
+            unit_size = unit_sizes.get(material, 1)
+            order_size = math.ceil(quantity / unit_size)
+            unit_price = round(merged_prices.get(material, 0), 2)
+            material_total = round(order_size * unit_price, 2)
+            detailed_costs[material] = {
+                "quantity": quantity,
+                "unit_size": unit_size,
+                "order_size": order_size,
+                "unit_price": unit_price,
+                "total_cost": material_total
+            }
+            total_cost += material_total
+
+    return detailed_costs, round(total_cost, 2)
+
+
+# === Tax / Delivery ===
+# (tax rate, delivery charge) for strategies that don't use the defaults
+STRATEGY_TAX_AND_DELIVERY = {"Master Halo Pricing": (0.072, 100.00)}
+DEFAULT_TAX_AND_DELIVERY = (0.0825, 0.00)
+
+
+def tax_and_delivery_rates(pricing_strategy):
+    return STRATEGY_TAX_AND_DELIVERY.get(pricing_strategy, DEFAULT_TAX_AND_DELIVERY)
+
+
+def known_pricing_strategies():
+    return set(pricing_tables) | set(STRATEGY_TAX_AND_DELIVERY)
+
+
+def calculate_tax_and_delivery(material_total, pricing_strategy):
+    tax_rate, delivery_charge = tax_and_delivery_rates(pricing_strategy)
+    material_tax = round(material_total * tax_rate, 2)
+    return material_tax, delivery_charge
+
+
+# === Profit Margins ===
+def calculate_profit_margins(subtotal, linear_feet, margins=PROFIT_MARGINS):
+    profit_margins = {}
+    for margin in margins:
+        revenue = round(subtotal / (1 - margin), 2)
+        profit = round(revenue - subtotal, 2)
+        price_per_foot = round(revenue / linear_feet, 2) if linear_feet else 0
+        profit_margins[f"{int(margin * 100)}%"] = {
+            "revenue": revenue,
+            "profit": profit,
+            "price_per_linear_foot": price_per_foot
+        }
+    return profit_margins
+
+
+# === Material Costs For A Saved Fence ===
+def calculate_fence_material_costs(fence_details, material_prices, pricing_strategy):
+    materials_needed = fence_details["materials_needed"]
+    height = fence_details.get("height")
+    top_rail = fence_details.get("top_rail", False)
+    if isinstance(top_rail, str):
+        top_rail = top_rail.lower() == "true"
+    style = fence_details.get("style", None)
+    bob = fence_details.get("bob", False)
+
+    fence_type = fence_details.get("fence_type", "")
+    normalized_fence_type = fence_type.strip().lower().replace(" ", "_")
+    logger.debug("material costs for fence_type %r", normalized_fence_type)
+    if normalized_fence_type == "vinyl":
+        with_chain_link = fence_details.get("with_chain_link", False)
+        detailed_material_costs, material_total = calculate_vinyl_material_costs(
+            materials_needed,
+            custom_prices=material_prices,
+            pricing_strategy=pricing_strategy,
+            height=height,
+            top_rail=top_rail,
+            with_chain_link=with_chain_link  # <-- Pass the flag!
+        )
+
+    elif normalized_fence_type == "sp_wrought_iron":
+        detailed_material_costs, material_total = calculate_sp_wrought_iron_material_costs(
+            materials_needed,
+            custom_prices=material_prices,
+            pricing_strategy=pricing_strategy,
+            height=height,
+            top_rail=top_rail
+        )
+    elif normalized_fence_type == "wood":
+        detailed_material_costs, material_total = calculate_wood_material_costs(
+            materials_needed,
+            custom_prices=material_prices,
+            style=style,
+            height=height,
+            bob=bob
+        )
+    else:
+        detailed_material_costs, material_total = calculate_material_costs(
+            materials_needed,
+            custom_prices=material_prices,
+            pricing_strategy=pricing_strategy,
+            height=height,
+            top_rail=top_rail
+        )
+
+    return detailed_material_costs, material_total
+
+
 # === Total Cost Calculation ===
+@tracing.traced
 def calculate_total_costs(
     fence_details,
     material_prices,
@@ -996,138 +1128,70 @@ def calculate_total_costs(
     grade_of_slope_complexity,
     productivity=1.0
 ):
-    print("📊 Starting calculate_total_costs()")
-
+    stage = "unpacking fence_details"
+    clock = metrics.StageClock()
     try:
         materials_needed = fence_details["materials_needed"]
-        height = fence_details.get("height")
-        top_rail = fence_details.get("top_rail", False)
-        if isinstance(top_rail, str):
-            top_rail = top_rail.lower() == "true"
         linear_feet = fence_details.get("linear_feet")
-        style = fence_details.get("style", None)
-        bob = fence_details.get("bob", False)
-    except Exception as e:
-        print("❌ Error unpacking fence_details:", str(e))
-        raise
 
-    print(f"DEBUG RAW fence_type: [{fence_details.get('fence_type')}]")
-    print(f"DEBUG STRIPPED/LOWER fence_type: [{fence_details.get('fence_type', '').strip().lower()}]")
-
-    try:
-        fence_type = fence_details.get("fence_type", "")
-        normalized_fence_type = fence_type.strip().lower().replace(" ", "_")
-        print(f"DEBUG RAW fence_type: [{fence_type}]")
-        print(f"DEBUG NORMALIZED fence_type: [{normalized_fence_type}]")
-        if normalized_fence_type == "vinyl":
-            print("DEBUG: Entering VINYL block")
-            with_chain_link = fence_details.get("with_chain_link", False)
-            detailed_material_costs, material_total = calculate_vinyl_material_costs(
-                materials_needed,
-                custom_prices=material_prices,
-                pricing_strategy=pricing_strategy,
-                height=height,
-                top_rail=top_rail,
-                with_chain_link=with_chain_link  # <-- Pass the flag!
-            )
-
-        elif normalized_fence_type == "sp_wrought_iron":
-            print("DEBUG: calling calculate_sp_wrought_iron_material_costs")
-            detailed_material_costs, material_total = calculate_sp_wrought_iron_material_costs(
-                materials_needed,
-                custom_prices=material_prices,
-                pricing_strategy=pricing_strategy,
-                height=height,
-                top_rail=top_rail
-            )
-        elif normalized_fence_type == "wood":
-            print("DEBUG: calling calculate_wood_material_costs")
-            detailed_material_costs, material_total = calculate_wood_material_costs(
-                materials_needed,
-                custom_prices=material_prices,
-                style=style,
-                height=height,
-                bob=bob
-            )
-        else:
-            print("DEBUG: Entering DEFAULT block")
-            detailed_material_costs, material_total = calculate_material_costs(
-                materials_needed,
-                custom_prices=material_prices,
-                pricing_strategy=pricing_strategy,
-                height=height,
-                top_rail=top_rail
-            )
-        print("✅ Material costs calculated")
-    except Exception as e:
-        print("❌ Error in calculate_material_costs:", str(e))
-        raise
+        stage = "calculate_material_costs"
+        detailed_material_costs, material_total = calculate_fence_material_costs(
+            fence_details,
+            material_prices,
+            pricing_strategy
+        )
+        clock.lap("pricing")
 
-    try:
+        stage = "complexity scores"
         dirt_score = dirt_scores.get(str(dirt_complexity).lower(), 1.0)
         slope_score = calculate_slope_complexity_score(grade_of_slope_complexity)
-        print("✅ Complexity Scores:")
-        print("  dirt_score:", dirt_score)
-        print("  slope_score:", slope_score)
-    except Exception as e:
-        print("❌ Error calculating complexity scores:", str(e))
-        raise
 
-    try:
+        stage = "calculate_labor_cost"
         labor_costs = calculate_labor_cost(
             linear_feet=linear_feet,
             crew_size=num_employees,
             daily_rate=daily_rate,
             dirt_complexity=dirt_score,
-            grade_of_slope_complexity=slope_score
+            grade_of_slope_complexity=slope_score,
+            fence_type=fence_details.get("fence_type"),
+            soil=dirt_complexity
         )
-        print("✅ Labor cost calculated")
-    except Exception as e:
-        print("❌ Error in calculate_labor_cost:", str(e))
-        raise
 
-    try:
+        stage = "generate_labor_duration_options"
         labor_duration_options = generate_labor_duration_options(
             linear_feet=linear_feet,
             dirt_complexity=dirt_score,
             grade_of_slope_complexity=slope_score,
-            productivity=productivity
+            productivity=productivity,
+            fence_type=fence_details.get("fence_type"),
+            soil=dirt_complexity
         )
-        print("✅ Labor duration options calculated")
-    except Exception as e:
-        print("❌ Error in generate_labor_duration_options:", str(e))
-        raise
+        clock.lap("labor")
 
-    try:
-        tax_rate = 0.072 if pricing_strategy == "Master Halo Pricing" else 0.0825
-        delivery_charge = 100.00 if pricing_strategy == "Master Halo Pricing" else 0.00
-        material_tax = round(material_total * tax_rate, 2)
+        stage = "totals"
+        material_tax, delivery_charge = calculate_tax_and_delivery(material_total, pricing_strategy)
 
         subtotal = material_total + material_tax + delivery_charge + labor_costs["total_labor_cost"]
         price_per_linear_foot = round(subtotal / linear_feet, 2) if linear_feet else 0
 
-        print("✅ Totals calculated")
+        stage = "profit margins"
+        profit_margins = calculate_profit_margins(subtotal, linear_feet)
+        clock.lap("margins")
+        clock.finish()
     except Exception as e:
-        print("❌ Error calculating totals:", str(e))
+        logger.warning("calculate_total_costs failed in %s: %s", stage, e)
         raise
 
-    try:
-        profit_margins = {}
-        for margin in [0.2, 0.3, 0.4, 0.5]:
-            revenue = round(subtotal / (1 - margin), 2)
-            profit = round(revenue - subtotal, 2)
-            price_per_foot = round(revenue / linear_feet, 2) if linear_feet else 0
-            profit_margins[f"{int(margin * 100)}%"] = {
-                "revenue": revenue,
-                "profit": profit,
-                "price_per_linear_foot": price_per_foot
-            }
-        print("✅ Profit margins calculated")
-    except Exception as e:
-        print("❌ Error calculating profit margins:", str(e))
-        raise
-
-    print("✅ Finished calculate_total_costs()\n")
+    logger.debug(
+        "total costs",
+        extra={
+            "fence_type": fence_details.get("fence_type"),
+            "dirt_score": dirt_score,
+            "slope_score": slope_score,
+            "material_total": material_total,
+            "subtotal": subtotal,
+        }
+    )
 
     return {
         "materials_needed": materials_needed,